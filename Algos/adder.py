@@ -1,7 +1,8 @@
+from functools import lru_cache
+
 from qiskit import QuantumCircuit
-from qiskit_aer import AerSimulator
-from qiskit.visualization import plot_histogram
-import matplotlib.pyplot as plt
+
+from transpile_cache import cached_transpile
 
 
 def create(nb_qbits:int, ignore_carry=False, draw=False) -> QuantumCircuit :
@@ -25,9 +26,16 @@ def create(nb_qbits:int, ignore_carry=False, draw=False) -> QuantumCircuit :
     Returns
     -------
     qc : QuantumCircuit
-        Quantum circuit of the adder
+        Quantum circuit of the adder (a copy of the cached template, free to modify)
     """
+    qc = _template(nb_qbits, bool(ignore_carry)).copy()
+    if draw : qc.draw('mpl')
+    return qc
 
+
+@lru_cache(maxsize=None)
+def _template(nb_qbits:int, ignore_carry:bool) -> QuantumCircuit :
+    """ Builds the adder once per (nb_qbits, ignore_carry) """
     n = nb_qbits
     add_carry = 0 if ignore_carry else 1
 
@@ -46,12 +54,46 @@ def create(nb_qbits:int, ignore_carry=False, draw=False) -> QuantumCircuit :
         
     
     qc.measure(range(2*n, 3*n+add_carry), range(n+add_carry))
-    if draw : qc.draw('mpl')
     return qc
 
 
+def isa_circuit(nb_qbits:int, backend, ignore_carry=False, cache_dir="isa_cache") -> QuantumCircuit :
+    """
+    Returns the adder transpiled for `backend` (optimization level 0).
+
+    The ISA circuit is cached in memory and in QPY files of `cache_dir` (see
+    `transpile_cache.cached_transpile`), keyed by the adder, the backend and its calibration,
+    so a sweep over adder widths only transpiles each width once per calibration.
+
+    Parameters
+    ----------
+    nb_qbits : int
+        Number of qubits to add
+
+    backend : BackendV2
+        Target backend
+
+    ignore_carry : bool, optional
+        See `create`
+
+    cache_dir : str, optional
+        Directory of the QPY files
+
+
+    Returns
+    -------
+    QuantumCircuit
+        The ISA circuit (a copy, free to modify)
+    """
+    return cached_transpile(_template(nb_qbits, bool(ignore_carry)), backend, cache_dir=cache_dir)
+
+
 
 if __name__ == "__main__":
+    from qiskit_aer import AerSimulator
+    from qiskit.visualization import plot_histogram
+    import matplotlib.pyplot as plt
+
     circuit = create(2, ignore_carry=False, draw=True)
 
     result = AerSimulator().run(circuit, shots=2**17).result()
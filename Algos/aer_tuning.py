@@ -0,0 +1,170 @@
+import argparse
+import json
+import math
+import os
+import time
+from datetime import datetime
+from functools import lru_cache
+
+
+# Cost table written by `calibrate`, specific to the host that produced it
+cost_table_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "aer_tuning.json")
+
+
+def candidates(nb_experiments: int, nb_workers: int = None) -> dict :
+    """
+    Parallelisation strategies of Aer compared by `calibrate`, as run options :
+        - serial      : a single thread
+        - state       : the threads share the statevector of each experiment (Aer default)
+        - experiments : one experiment per thread
+        - shots       : the shots of each experiment are split between threads (noisy circuits)
+    """
+    nb_workers = nb_workers or os.cpu_count() or 1
+    return {
+        "serial": {"max_parallel_threads": 1, "max_parallel_experiments": 1, "max_parallel_shots": 1},
+        "state": {"max_parallel_threads": nb_workers, "max_parallel_experiments": 1, "max_parallel_shots": 1, "statevector_parallel_threshold": 1},
+        "experiments": {"max_parallel_threads": nb_workers, "max_parallel_experiments": max(1, min(nb_experiments, nb_workers)), "max_parallel_shots": 1},
+        "shots": {"max_parallel_threads": nb_workers, "max_parallel_experiments": 1, "max_parallel_shots": nb_workers},
+    }
+
+
+def heuristic(nb_qbits: int, nb_experiments: int, shots: int, noisy: bool) -> str :
+    """ Strategy used when no cost table is available """
+    if (os.cpu_count() or 1) == 1 :
+        return "serial"
+    if nb_experiments > 1 and nb_qbits < 20 :
+        return "experiments"
+    if noisy and shots > 1 and nb_qbits < 20 :
+        return "shots"          # without noise, the shots are sampled from a single simulation
+    return "state"
+
+
+@lru_cache(maxsize=None)
+def load_cost_table(path: str = cost_table_path) -> tuple :
+    """ Entries of the cost table, empty if it does not exist or was calibrated on another host """
+    if not os.path.exists(path) :
+        return ()
+    with open(path) as f :
+        table = json.load(f)
+    if table.get("cpu_count") != os.cpu_count() :
+        return ()
+    return tuple(table["entries"])
+
+
+def _distance(entry: dict, nb_qbits: int, nb_experiments: int, shots: int) -> float :
+    return (abs(math.log2(entry["nb_qbits"] / nb_qbits))
+            + abs(math.log2(entry["nb_experiments"] / nb_experiments))
+            + abs(math.log2(entry["shots"] / shots)))
+
+
+def tune_options(nb_qbits: int, nb_experiments: int = 1, shots: int = 1024, noisy: bool = False, path: str = cost_table_path) -> dict :
+    """
+    Aer run options for a batch, from the closest calibrated batch of the cost table
+    (see `calibrate`), or from `heuristic` without table.
+
+    Parameters
+    ----------
+    nb_qbits : int
+        Number of Qbits of the widest circuit of the batch
+
+    nb_experiments : int, default=1
+        Number of circuits of the batch
+
+    shots : int, default=1024
+        Number of shots of each circuit
+
+    noisy : default=False
+        The simulator has a noise model
+
+    path : str, optional
+        Cost table
+
+
+    Returns
+    -------
+    dict
+        Options to pass to `simulator.run(..., **options)`
+    """
+    nb_qbits, nb_experiments, shots = max(nb_qbits, 1), max(nb_experiments, 1), max(shots, 1)
+
+    entries = [entry for entry in load_cost_table(path) if entry["noisy"] == noisy]
+    if entries :
+        strategy = min(entries, key=lambda entry : _distance(entry, nb_qbits, nb_experiments, shots))["best"]
+    else :
+        strategy = heuristic(nb_qbits, nb_experiments, shots, noisy)
+
+    return candidates(nb_experiments)[strategy]
+
+
+def simulator_options(simulator, circuits, shots: int) -> dict :
+    """ `tune_options` for running `circuits` (a circuit or a list) on the AerSimulator `simulator` """
+    circuits = circuits if isinstance(circuits, list) else [circuits]
+    noise_model = simulator.options.noise_model
+    noisy = noise_model is not None and not noise_model.is_ideal()
+    width = max((qc.num_qubits for qc in circuits), default=1)
+    if simulator.options.method == "density_matrix" :
+        width *= 2      # a density matrix costs as much as a statevector of twice the width
+    return tune_options(width, len(circuits), shots, noisy)
+
+
+def calibrate(path: str = cost_table_path, widths=(4, 6, 10, 15, 20), batch_sizes=(1, 8, 32), shots=(256, 4096), nb_gates: int = 30, repetitions: int = 3, verbose=True) -> dict :
+    """
+    One-time local benchmark : times every strategy of `candidates` on random circuits
+    for each (width, batch size, shots, noisy or ideal) and saves the fastest in `path`.
+
+    The noisy batches use a local depolarizing noise model, so no IBM account is needed.
+
+    Returns
+    -------
+    dict
+        The cost table
+    """
+    import numpy as np
+    from qiskit import transpile
+    from qiskit_aer import AerSimulator
+    from qiskit_aer.noise import NoiseModel, depolarizing_error
+
+    from fuzzing import random_gate_arrays, build_circuit
+
+    noise_model = NoiseModel()
+    noise_model.add_all_qubit_quantum_error(depolarizing_error(1e-3, 1), ["h", "x", "sx", "rz"])
+    noise_model.add_all_qubit_quantum_error(depolarizing_error(1e-2, 2), ["cx"])
+    simulators = {False: AerSimulator(), True: AerSimulator(noise_model=noise_model)}
+
+    rng = np.random.default_rng(0)
+    entries = []
+    for nb_qbits in widths :
+        gate_ids, qbits = random_gate_arrays(rng, max(batch_sizes), nb_qbits, nb_gates)
+        circuits = [build_circuit(gate_ids[k], qbits[k], nb_qbits, random_init=True) for k in range(max(batch_sizes))]
+
+        for noisy, simulator in simulators.items() :
+            tqs = transpile(circuits, simulator, optimization_level=0)
+            for nb_experiments in batch_sizes :
+                for nb_shots in shots :
+                    times = {}
+                    for name, options in candidates(nb_experiments).items() :
+                        simulator.run(tqs[:nb_experiments], shots=nb_shots, **options).result()    # warmup
+                        start = time.perf_counter()
+                        for _ in range(repetitions) :
+                            simulator.run(tqs[:nb_experiments], shots=nb_shots, **options).result()
+                        times[name] = 1000 * (time.perf_counter() - start) / repetitions
+
+                    best = min(times, key=times.get)
+                    entries.append({"nb_qbits": nb_qbits, "nb_experiments": nb_experiments, "shots": nb_shots, "noisy": noisy, "times_ms": times, "best": best})
+                    if verbose : print(f"{nb_qbits} Qbits, {nb_experiments} circuits, {nb_shots} shots, {'noisy' if noisy else 'ideal'} : {best} ({times[best]:.2f} ms)")
+
+    table = {"cpu_count": os.cpu_count(), "created": datetime.now().isoformat(), "entries": entries}
+    with open(path, "w") as f :
+        json.dump(table, f, indent=1)
+    load_cost_table.cache_clear()
+    return table
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibre la table de coût des options de parallélisme d'Aer pour cette machine.")
+    parser.add_argument("--output", type=str, default=cost_table_path, help="Fichier de la table de coût.")
+    parser.add_argument("--repetitions", type=int, default=3, help="Nombre d'exécutions mesurées par configuration.")
+    args = parser.parse_args()
+
+    calibrate(args.output, repetitions=args.repetitions)
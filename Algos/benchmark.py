@@ -0,0 +1,209 @@
+import argparse
+import json
+import math
+import time
+from datetime import datetime
+
+import numpy as np
+
+
+class StreamingStats :
+    """
+    Statistics of a stream of positive durations, in constant memory.
+
+    Mean and standard deviation are exact (Welford). Median, MAD and percentiles come from
+    a histogram with logarithmic bins of `precision` relative width, so they are exact
+    up to that precision whatever the number of samples.
+    """
+
+    def __init__(self, low=1e-3, high=1e7, precision=0.01) :
+        """
+        Parameters
+        ----------
+        low, high : float
+            Range of the histogram (values outside are put in the first / last bin)
+
+        precision : float
+            Relative width of a bin
+        """
+        self.log_low = math.log(low)
+        self.log_step = math.log1p(precision)
+        self.histogram = np.zeros(int(math.ceil((math.log(high) - self.log_low) / self.log_step)) + 1, dtype=np.int64)
+        self.centers = np.exp(self.log_low + (np.arange(len(self.histogram)) + 0.5) * self.log_step)
+
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+
+    def add(self, value: float) :
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+        index = int((math.log(value) - self.log_low) // self.log_step) if value > 0 else 0
+        self.histogram[min(max(index, 0), len(self.histogram) - 1)] += 1
+
+
+    def quantile(self, q: float) -> float :
+        """ Quantile `q` (between 0 and 1), at the center of its bin """
+        if self.count == 0 :
+            return math.nan
+        index = int(np.searchsorted(np.cumsum(self.histogram), q * self.count, side="left"))
+        return float(min(max(self.centers[index], self.min), self.max))
+
+
+    def mad(self) -> float :
+        """ Median absolute deviation """
+        if self.count == 0 :
+            return math.nan
+        deviations = np.abs(self.centers - self.quantile(0.5))
+        order = np.argsort(deviations)
+        index = int(np.searchsorted(np.cumsum(self.histogram[order]), 0.5 * self.count, side="left"))
+        return float(deviations[order][index])
+
+
+    def summary(self) -> dict :
+        return {
+            "n": self.count,
+            "mean": self.mean,
+            "std": math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0,
+            "min": self.min,
+            "max": self.max,
+            "median": self.quantile(0.5),
+            "mad": self.mad(),
+            "p05": self.quantile(0.05),
+            "p25": self.quantile(0.25),
+            "p75": self.quantile(0.75),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+def benchmark_circuit(qc, simulator, repetitions=100, warmup=5, shots=1024) -> dict :
+    """
+    Times the simulation of `qc`, without keeping the samples.
+
+    Parameters
+    ----------
+    qc : QuantumCircuit
+        Circuit to simulate (transpiled here once)
+
+    simulator : AerSimulator
+        The simulator
+
+    repetitions : int, default=100
+        Number of timed runs
+
+    warmup : int, default=5
+        Number of untimed runs done first
+
+    shots : int, default=1024
+        Number of shots of each run
+
+
+    Returns
+    -------
+    dict
+        Statistics (see `StreamingStats.summary`) of the wall-clock time of
+        `run(...).result()` ("wall_ms") and of `result.time_taken` ("sim_ms"), in ms
+    """
+    from qiskit import transpile
+
+    tq = transpile(qc, simulator, optimization_level=0)
+
+    for _ in range(warmup) :
+        simulator.run(tq, shots=shots).result()
+
+    wall = StreamingStats()
+    sim = StreamingStats()
+    for _ in range(repetitions) :
+        start = time.perf_counter()
+        result = simulator.run(tq, shots=shots).result()
+        end = time.perf_counter()
+
+        wall.add(1000 * (end - start))
+        sim.add(1000 * result.time_taken)
+
+    return {"wall_ms": wall.summary(), "sim_ms": sim.summary()}
+
+
+def run_benchmark(circuits, output="benchmark.jsonl", simulator=None, repetitions=100, warmup=5, shots=1024, verbose=True) :
+    """
+    Benchmarks a stream of circuits, appending one JSON line per circuit to `output`.
+
+    Parameters
+    ----------
+    circuits : iterable of tuple[QuantumCircuit, str]
+        Circuits with their date, e.g. `fuzzing.fuzzing_stream(...)`
+
+    output : str, default="benchmark.jsonl"
+        File of results, appended and flushed after each circuit
+
+    simulator : AerSimulator, default=None
+        The simulator, the shared ideal simulator of `simulator_registry` if None
+
+    repetitions, warmup, shots :
+        See `benchmark_circuit`
+
+    verbose : default=True
+        Print one line per circuit
+
+
+    Yields
+    ------
+    dict
+        The record written for each circuit
+    """
+    if simulator is None :
+        from simulator_registry import get_simulator
+        simulator = get_simulator()
+
+    with open(output, "a") as file :
+        for i, (qc, date) in enumerate(circuits) :
+            record = {
+                "date": date,
+                "store_index": (qc.metadata or {}).get("store_index"),
+                "num_qubits": qc.num_qubits,
+                "size": qc.size(),
+                "depth": qc.depth(),
+                "simulator": simulator.name,
+                "shots": shots,
+                "repetitions": repetitions,
+                "warmup": warmup,
+                "benchmarked": datetime.now().isoformat(),
+            }
+            record.update(benchmark_circuit(qc, simulator, repetitions, warmup, shots))
+
+            file.write(json.dumps(record) + "\n")
+            file.flush()
+
+            if verbose :
+                wall = record["wall_ms"]
+                print(f"Circuit {i+1} : median {wall['median']:.3f} ms, MAD {wall['mad']:.3f} ms, p95 {wall['p95']:.3f} ms")
+            yield record
+
+
+
+if __name__ == "__main__":
+    from fuzzing import fuzzing_stream
+
+    parser = argparse.ArgumentParser(description="Benchmark du temps de simulation de circuits aléatoires (sans affichage).")
+    parser.add_argument("--nb_circuits", type=int, default=3, help="Nombre de circuits à générer.")
+    parser.add_argument("--nb_qbits", type=int, default=10, help="Nombre de qubits par circuit.")
+    parser.add_argument("--nb_gates", type=int, default=25, help="Nombre de portes par circuit.")
+    parser.add_argument("--repetitions", type=int, default=100, help="Nombre d'exécutions mesurées par circuit.")
+    parser.add_argument("--warmup", type=int, default=5, help="Nombre d'exécutions de chauffe par circuit.")
+    parser.add_argument("--shots", type=int, default=1024, help="Nombre de shots par exécution.")
+    parser.add_argument("--seed", type=int, default=None, help="Graine des circuits.")
+    parser.add_argument("--output", type=str, default="benchmark.jsonl", help="Fichier de résultats (JSON lines).")
+    args = parser.parse_args()
+
+    circuits = fuzzing_stream(args.nb_circuits, args.nb_qbits, args.nb_gates, random_init=True, rng=args.seed)
+    for _ in run_benchmark(circuits, args.output, repetitions=args.repetitions, warmup=args.warmup, shots=args.shots) :
+        pass
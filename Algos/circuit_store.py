@@ -0,0 +1,360 @@
+import contextlib
+import json
+import os
+import re
+from datetime import datetime
+from functools import lru_cache
+
+import numpy as np
+
+try :
+    import fcntl
+except ImportError :    # Windows : no lock, a single writer per store
+    fcntl = None
+
+
+# One record per circuit, written last so that a partially written batch is never visible
+circuit_dtype = np.dtype([
+    ("gate_offset", "<i8"),     # index of the first gate in gate_ids.u8
+    ("qbit_offset", "<i8"),     # index of the first Qbit in qbits.u16
+    ("nb_gates", "<i4"),
+    ("nb_qbits", "<i2"),
+    ("random_init", "u1"),
+    ("created", "<f8"),         # POSIX timestamp
+])
+
+timing_dtype = np.dtype([
+    ("circuit", "<i8"),         # index of the circuit in the store
+    ("exec_ms", "<f8"),
+    ("simul_ms", "<f8"),
+])
+
+date_format = "%Y-%m-%d %H-%M-%S-%f"
+
+
+class CircuitStore :
+    """
+    Append-only columnar store of fuzzed circuits.
+
+    A store is a directory holding :
+        - gates.json   : names of the gates, the position in the list is the gate id
+        - gate_ids.u8  : gate id of every gate of every circuit (uint8)
+        - qbits.u16    : Qbits of every gate, concatenated (uint16)
+        - circuits.bin : one `circuit_dtype` record per circuit (offsets and metadata)
+        - timings.bin  : one `timing_dtype` record per timing measurement
+        - .lock        : lock file of the writers
+
+    Everything is read through memory maps, so opening a store of millions of circuits is instantaneous.
+    Several processes can append to the same store (e.g. `fuzzing.fuzzing_parallel`) : each write
+    holds an exclusive lock on .lock (POSIX only, on Windows a store must have a single writer).
+    """
+
+    def __init__(self, path: str, gate_names: list[str] = None) :
+        """
+        Opens (or creates) the store in the directory `path`.
+
+        Parameters
+        ----------
+        path : str
+            Directory of the store
+
+        gate_names : list[str], optional
+            Gate table to use when the store is created
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+        names_file = self._file("gates.json")
+        if os.path.exists(names_file) :
+            with open(names_file) as f :
+                self.gate_names = json.load(f)
+        else :
+            self.gate_names = list(gate_names or [])
+            self._save_gate_names()
+
+        for name in ("gate_ids.u8", "qbits.u16", "circuits.bin", "timings.bin") :
+            open(self._file(name), "ab").close()
+
+
+    def _file(self, name: str) -> str :
+        return os.path.join(self.path, name)
+
+
+    @contextlib.contextmanager
+    def _locked(self) :
+        """ Exclusive lock of the store between writers """
+        with open(self._file(".lock"), "a") as lock :
+            if fcntl is not None :
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try :
+                yield
+            finally :
+                if fcntl is not None :
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+    def _save_gate_names(self) :
+        with open(self._file("gates.json"), "w") as f :
+            json.dump(self.gate_names, f)
+
+
+    def _read(self, name: str, dtype) -> np.ndarray :
+        """ Memory-maps a column of the store (empty files cannot be mapped) """
+        file = self._file(name)
+        if os.path.getsize(file) < np.dtype(dtype).itemsize :
+            return np.empty(0, dtype=dtype)
+        return np.memmap(file, dtype=dtype, mode="r")
+
+
+    def gate_id_map(self, names: list[str]) -> np.ndarray :
+        """
+        Returns the array translating ids of the table `names` into ids of the store,
+        adding the missing names to the store.
+        """
+        missing = list(dict.fromkeys(name for name in names if name not in self.gate_names))
+        if missing :
+            with self._locked() :
+                # Another writer may have added gates since the store was opened
+                with open(self._file("gates.json")) as f :
+                    self.gate_names = json.load(f)
+                missing = list(dict.fromkeys(name for name in names if name not in self.gate_names))
+                if len(self.gate_names) + len(missing) > 256 :
+                    raise ValueError("A store cannot hold more than 256 different gates")
+                if missing :
+                    self.gate_names += missing
+                    self._save_gate_names()
+
+        return np.array([self.gate_names.index(name) for name in names], dtype=np.uint8)
+
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def append(self, gate_ids: np.ndarray, qbits: np.ndarray, nb_qbits: int, random_init=False, created=None) -> np.ndarray :
+        """
+        Appends a batch of circuits drawn by `fuzzing.random_gate_arrays`.
+
+        Parameters
+        ----------
+        gate_ids : np.ndarray
+            Gate ids in the store table, shape (nb_circuits, nb_gates)
+
+        qbits : np.ndarray
+            Qbits of each gate, shape (nb_circuits, nb_gates, max_arity), padded with -1
+
+        nb_qbits : int
+            Number of Qbits of the circuits
+
+        random_init : default=False
+            The circuits start with a Hadamard gate on every Qbit
+
+        created : float or np.ndarray, optional
+            Creation timestamps, now by default
+
+
+        Returns
+        -------
+        np.ndarray
+            Indices of the new circuits in the store
+        """
+        gate_ids = np.asarray(gate_ids, dtype=np.uint8)
+        qbits = np.asarray(qbits)
+        nb_circuits, nb_gates = gate_ids.shape
+
+        # Padding is at the end of each gate, so the row-major order keeps the Qbits of a gate in order
+        used = qbits >= 0
+        qbits_per_circuit = used.reshape(nb_circuits, -1).sum(axis=1)
+
+        # The offsets are read and the columns written under the lock, so concurrent writers never interleave
+        with self._locked() :
+            start = len(self)
+            gate_start = os.path.getsize(self._file("gate_ids.u8"))
+            qbit_start = os.path.getsize(self._file("qbits.u16")) // 2
+
+            records = np.empty(nb_circuits, dtype=circuit_dtype)
+            records["gate_offset"] = gate_start + nb_gates * np.arange(nb_circuits)
+            records["qbit_offset"] = qbit_start + np.concatenate(([0], np.cumsum(qbits_per_circuit)[:-1]))
+            records["nb_gates"] = nb_gates
+            records["nb_qbits"] = nb_qbits
+            records["random_init"] = random_init
+            records["created"] = datetime.now().timestamp() if created is None else created
+
+            with open(self._file("gate_ids.u8"), "ab") as f :
+                gate_ids.tofile(f)
+            with open(self._file("qbits.u16"), "ab") as f :
+                qbits[used].astype(np.uint16).tofile(f)
+            with open(self._file("circuits.bin"), "ab") as f :
+                records.tofile(f)
+
+        return np.arange(start, start + nb_circuits)
+
+
+    def append_timing(self, circuit: int, exec_ms: float, simul_ms: float) :
+        """ Records the average execution and simulation times of the circuit `circuit` """
+        record = np.array([(circuit, exec_ms, simul_ms)], dtype=timing_dtype)
+        with self._locked(), open(self._file("timings.bin"), "ab") as f :
+            record.tofile(f)
+
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int :
+        return os.path.getsize(self._file("circuits.bin")) // circuit_dtype.itemsize
+
+
+    @property
+    def circuits(self) -> np.ndarray :
+        """ Records (offsets and metadata) of every circuit """
+        return self._read("circuits.bin", circuit_dtype)
+
+
+    @property
+    def gate_ids(self) -> np.ndarray :
+        """ Gate ids of every gate of every circuit """
+        return self._read("gate_ids.u8", np.uint8)
+
+
+    @property
+    def qbits(self) -> np.ndarray :
+        """ Qbits of every gate of every circuit """
+        return self._read("qbits.u16", np.uint16)
+
+
+    @property
+    def timings(self) -> np.ndarray :
+        """ Timing records """
+        return self._read("timings.bin", timing_dtype)
+
+
+    def gates_of(self, index: int) -> list[tuple[str, list[int]]] :
+        """
+        Returns the gates of the circuit `index` as (name, Qbits) pairs,
+        without the initial Hadamard layer.
+        """
+        record = self.circuits[index]
+        gate_start = int(record["gate_offset"])
+        gate_ids = self.gate_ids[gate_start : gate_start + int(record["nb_gates"])]
+
+        names = [self.gate_names[gate_id] for gate_id in gate_ids.tolist()]
+        arities = [_arity(name) for name in names]
+
+        qbit_start = int(record["qbit_offset"])
+        flat = self.qbits[qbit_start : qbit_start + sum(arities)].tolist()
+        bounds = np.concatenate(([0], np.cumsum(arities))).tolist()
+
+        return [(name, flat[bounds[k] : bounds[k+1]]) for k, name in enumerate(names)]
+
+
+    def circuit(self, index: int) :
+        """ Rebuilds the QuantumCircuit number `index` (measured on all Qbits) """
+        from qiskit import QuantumCircuit
+        from qiskit.circuit.library import get_standard_gate_name_mapping
+
+        mapping = get_standard_gate_name_mapping()
+        record = self.circuits[index]
+
+        qc = QuantumCircuit(int(record["nb_qbits"]))
+        qc.metadata = {"store_index": int(index), "date": datetime.fromtimestamp(record["created"]).strftime(date_format)[:-3]}
+        if record["random_init"] :
+            qc.h(range(qc.num_qubits))
+
+        for name, gate_qbits in self.gates_of(index) :
+            qc.append(mapping[name], gate_qbits)
+
+        qc.measure_all()
+        return qc
+
+
+@lru_cache(maxsize=None)
+def _arity(name: str) -> int :
+    from qiskit.circuit.library import get_standard_gate_name_mapping
+    return get_standard_gate_name_mapping()[name].num_qubits
+
+
+# ----------------------------------------------------------------------
+# Import of the former text logs of data/
+# ----------------------------------------------------------------------
+
+def import_text_logs(data_dir: str, store: CircuitStore) -> int :
+    """
+    Imports the text files written by the former `fuzzing(save=True)` and `execute()`.
+    A file whose creation date is already the one of a circuit of the store was imported
+    by a previous run and is skipped, so the import can be run again safely.
+
+    Parameters
+    ----------
+    data_dir : str
+        Directory of the text files (named by their creation date)
+
+    store : CircuitStore
+        Destination store
+
+
+    Returns
+    -------
+    int
+        Number of imported circuits
+    """
+    gate_line = re.compile(r"^(\w+) : \[([\d, ]*)\]$")
+    nb_imported = 0
+    imported = set(store.circuits["created"].tolist())
+
+    for file_name in sorted(os.listdir(data_dir)) :
+        file = os.path.join(data_dir, file_name)
+        try :
+            created = datetime.strptime(file_name.replace(".", "-"), date_format).timestamp()
+        except ValueError :
+            continue    # not a fuzzing log
+        if not os.path.isfile(file) or created in imported :
+            continue
+
+        header = {}
+        gate_list = []
+        times = {}
+        with open(file) as f :
+            for line in f :
+                line = line.strip()
+                if line.startswith("nb_") :
+                    key, value = line.split(" = ")
+                    header[key] = int(value)
+                elif line.startswith("Duree d'execution moyen") :
+                    times["exec_ms"] = float(line.split(":")[1].split()[0])
+                elif line.startswith("Temps simulation moyen") :
+                    times["simul_ms"] = float(line.split(":")[1].split()[0])
+                elif match := gate_line.match(line) :
+                    gate_list.append((match[1], [int(q) for q in match[2].split(",") if q.strip()]))
+
+        nb_qbits = header["nb_qbits"]
+
+        # With random_init, the first line is the Hadamard layer, on top of the nb_gates random gates
+        random_init = len(gate_list) == header["nb_gates"] + 1 and gate_list[0] == ("h", list(range(nb_qbits)))
+        if random_init :
+            gate_list = gate_list[1:]
+
+        id_map = store.gate_id_map([name for name, _ in gate_list])
+        qbits = np.full((1, len(gate_list), max([len(q) for _, q in gate_list], default=1)), -1, dtype=np.int16)
+        for k, (_, gate_qbits) in enumerate(gate_list) :
+            qbits[0, k, :len(gate_qbits)] = gate_qbits
+
+        index = store.append(id_map[None, :], qbits, nb_qbits, random_init, created)[0]
+        if times :
+            store.append_timing(index, times.get("exec_ms", np.nan), times.get("simul_ms", np.nan))
+        nb_imported += 1
+
+    return nb_imported
+
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Importe les anciens fichiers texte de data/ dans un store colonnaire.")
+    parser.add_argument("--data_dir", type=str, default="data", help="Dossier des fichiers texte.")
+    parser.add_argument("--store", type=str, default="data/store", help="Dossier du store.")
+    args = parser.parse_args()
+
+    store = CircuitStore(args.store)
+    print(f"{import_text_logs(args.data_dir, store)} circuits imported into {args.store} ({len(store)} in total)")
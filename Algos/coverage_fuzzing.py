@@ -0,0 +1,176 @@
+from datetime import datetime
+
+import numpy as np
+
+from fuzzing import random_gate_arrays, build_circuit, gates, gate_arity
+
+
+# Width of the bins of each feature : two circuits in the same bins cover the same region
+default_bins = {
+    "depth": 4,
+    "parallelism": 0.5,
+    "num_2q": 3,
+    "num_multi": 2,
+}
+
+gate_names = np.array([gate.name for gate in gates])
+
+
+def static_features(gate_ids: np.ndarray, qbits: np.ndarray, nb_qbits: int, random_init=False) -> dict :
+    """
+    Static features of the circuit built by `fuzzing.build_circuit`, computed from its arrays.
+
+    Same definitions as `static_metrics` (Features/static_features.py), the final
+    measurement layer included, plus the number of 2-Qbit and of larger gates.
+
+    Returns
+    -------
+    dict
+        depth, num_ops, parallelism, num_2q, num_multi, num_swap, num_h
+    """
+    level = np.full(nb_qbits, 1 if random_init else 0)
+    for gate_qbits in qbits.tolist() :
+        gate_qbits = [q for q in gate_qbits if q >= 0]
+        level[gate_qbits] = level[gate_qbits].max() + 1
+
+    arity = gate_arity[gate_ids]
+    names = gate_names[gate_ids]
+
+    depth = int(level.max()) + 1                                    # + measure layer
+    num_ops = len(gate_ids) + nb_qbits * (2 if random_init else 1)  # + Hadamard and measures
+
+    return {
+        "depth": depth,
+        "num_ops": num_ops,
+        "parallelism": round(num_ops / depth, 2),
+        "num_2q": int((arity == 2).sum()),
+        "num_multi": int((arity > 2).sum()),
+        "num_swap": int((names == "swap").sum()),
+        "num_h": int((names == "h").sum()) + (nb_qbits if random_init else 0),
+    }
+
+
+def coverage_bin(features: dict, bins: dict = None) -> tuple :
+    """ Cell of the feature space containing `features` """
+    bins = default_bins if bins is None else bins
+    return tuple(int(features[name] // width) for name, width in bins.items())
+
+
+def mutate(gate_ids: np.ndarray, qbits: np.ndarray, nb_qbits: int, rng, nb_mutations=1) -> tuple[np.ndarray, np.ndarray] :
+    """
+    Applies `nb_mutations` random mutations to a circuit :
+        - insert : adds a random gate at a random position
+        - delete : removes a random gate
+        - swap   : exchanges two gates
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        Arrays of the mutant (the inputs are not modified)
+    """
+    for _ in range(nb_mutations) :
+        mutation = rng.choice(["insert", "delete", "swap"]) if len(gate_ids) > 1 else "insert"
+        position = rng.integers(len(gate_ids) + (mutation == "insert"))
+
+        if mutation == "insert" :
+            new_id, new_qbits = random_gate_arrays(rng, 1, nb_qbits, 1)
+            gate_ids = np.insert(gate_ids, position, new_id[0], axis=0)
+            qbits = np.insert(qbits, position, new_qbits[0], axis=0)
+
+        elif mutation == "delete" :
+            gate_ids = np.delete(gate_ids, position, axis=0)
+            qbits = np.delete(qbits, position, axis=0)
+
+        else :
+            other = rng.integers(len(gate_ids))
+            order = np.arange(len(gate_ids))
+            order[[position, other]] = order[[other, position]]
+            gate_ids, qbits = gate_ids[order], qbits[order]
+
+    return gate_ids, qbits
+
+
+def coverage_fuzzing(nb_circuits: int, nb_qbits: int, nb_gates: int, rng = None, random_init = False, bins: dict = None, max_mutations = 3, max_iterations = None, features = None, verbose = False) :
+    """
+    Coverage-guided fuzzing : yields circuits that each reach an unseen cell of the feature space.
+
+    A corpus is seeded with random circuits, then random members of the corpus are mutated
+    (see `mutate`). A mutant is kept only if its static features fall in a new cell
+    (see `coverage_bin`), so every simulated circuit explores a new region.
+
+    Parameters
+    ----------
+    nb_circuits : int
+        Number of circuits to generate
+
+    nb_qbits : int
+        Number of Qbits in the circuit
+
+    nb_gates : int
+        Number of gates of the initial random circuits
+
+    rng : numpy.random.Generator or int, default=None
+        Seeded random generator (or seed), fresh entropy if None
+
+    random_init : default=False
+        Apply a Hadamard gate to all Qbits at the beginning of the circuit
+
+    bins : dict, default=None
+        Width of the bins of each feature, `default_bins` if None
+
+    max_mutations : default=3
+        Maximum number of mutations applied to a parent
+
+    max_iterations : int, default=None
+        Maximum number of mutants tried, 1000 * nb_circuits if None
+
+    features : callable, default=None
+        Function QuantumCircuit -> dict used instead of `static_features`
+        (e.g. `static_metrics`, with `bins` on its keys), slower since every mutant is then built
+
+    verbose : default=False
+        Print the progress of the coverage
+
+
+    Yields
+    ------
+    tuple[QuantumCircuit, str]
+        A circuit with its creation date, `qc.metadata["coverage_bin"]` is its cell
+    """
+    rng = np.random.default_rng(rng)
+    max_iterations = 1000 * nb_circuits if max_iterations is None else max_iterations
+
+    def cell(gate_ids, qbits) :
+        if features is None :
+            return coverage_bin(static_features(gate_ids, qbits, nb_qbits, random_init), bins)
+        return coverage_bin(features(build_circuit(gate_ids, qbits, nb_qbits, random_init)), bins)
+
+    corpus = []
+    seen = set()
+    seed_ids, seed_qbits = random_gate_arrays(rng, max(1, min(nb_circuits, 16)), nb_qbits, nb_gates)
+    candidates = iter(zip(seed_ids, seed_qbits))
+
+    for iteration in range(max_iterations) :
+        if len(corpus) >= nb_circuits :
+            break
+
+        candidate = next(candidates, None)
+        if candidate is None :
+            parent_ids, parent_qbits = corpus[rng.integers(len(corpus))] if corpus else (seed_ids[0], seed_qbits[0])
+            candidate = mutate(parent_ids, parent_qbits, nb_qbits, rng, rng.integers(1, max_mutations + 1))
+
+        gate_ids, qbits = candidate
+        circuit_cell = cell(gate_ids, qbits)
+        if circuit_cell in seen :
+            continue
+
+        seen.add(circuit_cell)
+        corpus.append((gate_ids, qbits))
+        if verbose : print(f"Iteration {iteration} : new cell {circuit_cell} ({len(corpus)} circuits)")
+
+        date = datetime.now().strftime("%Y-%m-%d %H-%M-%S-%f")[:-3]
+        qc = build_circuit(gate_ids, qbits, nb_qbits, random_init)
+        qc.metadata = {"date": date, "coverage_bin": circuit_cell}
+        yield qc, date
+
+    if verbose : print(f"{len(corpus)} circuits cover {len(seen)} cells")
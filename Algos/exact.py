@@ -0,0 +1,275 @@
+import numpy as np
+from qiskit import QuantumCircuit
+
+from method_selection import max_density_matrix_qbits, max_statevector_qbits, select_method
+from simulator_registry import get_simulator, noise_fingerprint
+from transpile_cache import cached_transpile
+
+
+def final_measurements(qc: QuantumCircuit) -> tuple[QuantumCircuit, dict] :
+    """
+    Separates the final measurements of `qc` from the rest of the circuit.
+
+    Returns
+    -------
+    tuple[QuantumCircuit, dict]
+        The circuit without its final measurements (and the barriers before them),
+        and the Qbit measured into each Clbit {clbit index: qbit index}
+    """
+    measured = {}
+    done = set()        # Qbits already measured, nothing can act on them anymore
+    cut = len(qc.data)
+
+    for k in range(len(qc.data) - 1, -1, -1) :
+        instruction = qc.data[k]
+        name = instruction.operation.name
+        qbits = [qc.find_bit(q).index for q in instruction.qubits]
+
+        if name == "measure" :
+            clbit = qc.find_bit(instruction.clbits[0]).index
+            if qbits[0] in done or clbit in measured :
+                break
+            measured[clbit] = qbits[0]
+            done.add(qbits[0])
+        elif name != "barrier" :
+            break
+        cut = k
+
+    body = qc.copy_empty_like()
+    for instruction in qc.data[:cut] :
+        body._append(instruction)
+    return body, measured
+
+
+def active_qubits(qc: QuantumCircuit) -> list[int] :
+    """ Qbits on which at least one instruction (other than a barrier) acts """
+    active = set()
+    for instruction in qc.data :
+        if instruction.operation.name != "barrier" :
+            active.update(qc.find_bit(q).index for q in instruction.qubits)
+    return sorted(active)
+
+
+_noise_dicts = {}          # noise fingerprint -> noise_model.to_dict()
+_readout_errors = {}       # noise fingerprint -> result of `readout_errors`
+_reduced_models = {}       # (noise fingerprint, Qbits) -> result of `reduced_noise_model`
+
+
+def _noise_dict(noise_model) -> dict :
+    """ `noise_model.to_dict()`, computed once per noise model content """
+    fingerprint = noise_fingerprint(noise_model)
+    if fingerprint not in _noise_dicts :
+        _noise_dicts[fingerprint] = noise_model.to_dict()
+    return _noise_dicts[fingerprint]
+
+
+def compact(qc: QuantumCircuit, qbits: list[int]) -> QuantumCircuit :
+    """ Copy of `qc` on the Qbits `qbits` only, renumbered 0, 1, ... in this order (the Clbits and their registers are kept) """
+    index = {q: k for k, q in enumerate(qbits)}
+    compacted = QuantumCircuit(len(qbits), global_phase=qc.global_phase)
+    compacted.add_bits(qc.clbits)
+    for register in qc.cregs :
+        compacted.add_register(register)
+    for instruction in qc.data :
+        if instruction.operation.name == "barrier" :
+            continue
+        compacted._append(instruction.replace(
+            qubits=[compacted.qubits[index[qc.find_bit(q).index]] for q in instruction.qubits],
+        ))
+    return compacted
+
+
+def reduced_noise_model(noise_model, qbits: list[int]) :
+    """
+    Noise model of `compact(qc, qbits)` : the errors of `noise_model` on the Qbits `qbits`,
+    renumbered like `compact`. Aer serialises the whole noise model at every run, which
+    costs seconds for a 127-Qbit backend, against milliseconds for the reduced one.
+    """
+    from qiskit_aer.noise import NoiseModel
+
+    key = (noise_fingerprint(noise_model), tuple(qbits))
+    if key not in _reduced_models :
+        index = {q: k for k, q in enumerate(qbits)}
+        errors = []
+        for error in _noise_dict(noise_model)["errors"] :
+            if "gate_qubits" not in error :
+                errors.append(error)
+                continue
+            gate_qubits = [[index[q] for q in gate] for gate in error["gate_qubits"] if all(q in index for q in gate)]
+            if gate_qubits :
+                errors.append({**error, "gate_qubits": gate_qubits})
+        reduced = NoiseModel.from_dict({"errors": errors})
+        reduced.add_basis_gates(noise_model.basis_gates)
+        _reduced_models[key] = reduced
+    return _reduced_models[key]
+
+
+def readout_errors(noise_model) -> tuple :
+    """
+    Single-Qbit readout errors of `noise_model` as confusion matrices M[true value, read value].
+
+    Returns
+    -------
+    tuple[np.ndarray, dict]
+        Matrix of every Qbit (None if there is none) and matrices of specific Qbits {qbit: matrix}
+    """
+    if noise_model is None or noise_model.is_ideal() :
+        return None, {}
+
+    fingerprint = noise_fingerprint(noise_model)
+    if fingerprint not in _readout_errors :
+        default, local = None, {}
+        for error in _noise_dict(noise_model)["errors"] :
+            if error["type"] != "roerror" or len(error["probabilities"]) != 2 :
+                continue    # correlated readout errors of several Qbits are not supported
+            matrix = np.array(error["probabilities"], dtype=float)
+            if "gate_qubits" in error :
+                for qbits in error["gate_qubits"] :
+                    local[qbits[0]] = matrix
+            else :
+                default = matrix
+        _readout_errors[fingerprint] = (default, local)
+    return _readout_errors[fingerprint]
+
+
+def apply_readout(probabilities: np.ndarray, measured: dict, noise_model) -> np.ndarray :
+    """
+    Applies the readout errors of `noise_model` to the exact `probabilities` of the Clbits,
+    `measured` giving the Qbit measured into each Clbit {clbit: qbit}.
+    """
+    default, local = readout_errors(noise_model)
+    nb_clbits = int(np.log2(len(probabilities)))
+    tensor = probabilities.reshape([2] * nb_clbits) if nb_clbits else probabilities
+
+    for clbit, qbit in measured.items() :
+        matrix = local.get(qbit, default)
+        if matrix is None :
+            continue
+        axis = nb_clbits - 1 - clbit    # Clbit 0 is the least significant bit, i.e. the last axis
+        tensor = np.moveaxis(np.tensordot(tensor, matrix, axes=([axis], [0])), -1, axis)
+
+    return tensor.reshape(-1)
+
+
+def format_outcomes(qc: QuantumCircuit, outcomes: np.ndarray) -> list[str] :
+    """ Counts keys of Clbit values `outcomes` (integers, Clbit 0 as least significant bit), registers separated by spaces """
+    keys = []
+    for outcome in outcomes.tolist() :
+        bits = format(outcome, f"0{qc.num_clbits}b")[::-1]
+        registers = []
+        for register in qc.cregs :
+            registers.append("".join(bits[qc.find_bit(clbit).index] for clbit in register)[::-1])
+        keys.append(" ".join(reversed(registers)) if qc.cregs else bits[::-1])
+    return keys
+
+
+def sample_counts(qc: QuantumCircuit, probabilities: np.ndarray, shots: int, rng = None) -> dict :
+    """
+    Draws `shots` outcomes from the distribution `probabilities` of the Clbits of `qc`
+    in one multinomial draw.
+    """
+    rng = np.random.default_rng(rng)
+    drawn = rng.multinomial(shots, probabilities / probabilities.sum())
+    outcomes = np.flatnonzero(drawn)
+    return dict(zip(format_outcomes(qc, outcomes), drawn[outcomes].tolist()))
+
+
+def execute(qc: QuantumCircuit, noise_model = None, shots: int = 1024, rng = None, max_exact_qbits: int = max_density_matrix_qbits, transpiled = False, backend = None) -> dict :
+    """
+    Runs one scenario (ideal or noisy) of `qc` once, saving its final state and the exact
+    probabilities of its measurements. The counts are then drawn from these probabilities,
+    with no shot-based simulation. The single-Qbit readout errors of `noise_model` are applied
+    to the exact probabilities as confusion matrices (see `apply_readout`).
+
+    Only the active Qbits count in the width (see `active_qubits`), so an ISA circuit
+    of a few Qbits on a large backend is simulated on its few Qbits.
+
+        - ideal circuit without reset nor mid-circuit measurement : statevector
+        - noisy, resets or mid-circuit measurements, up to `max_exact_qbits` Qbits : density matrix
+        - otherwise : shot-based simulation (see `method_selection.select_method`),
+          the probabilities are then the sampled frequencies
+
+    Parameters
+    ----------
+    qc : QuantumCircuit
+        Circuit ending with its measurements (e.g. measure_all)
+
+    noise_model : NoiseModel, default=None
+        Noise model of the scenario, None for the ideal scenario
+
+    shots : int, default=1024
+        Number of shots of the counts
+
+    rng : numpy.random.Generator or int, default=None
+        Generator of the counts
+
+    max_exact_qbits : int, optional
+        Widest noisy circuit (in active Qbits) simulated as a density matrix
+
+    transpiled : default=False
+        `qc` is already an ISA circuit of the backend of `noise_model` (e.g. `adder.isa_circuit`)
+
+    backend : BackendV2, default=None
+        Backend of `noise_model`. A circuit that is not `transpiled` is first transpiled for it
+        (layout, routing, native gates), otherwise its gates would not get the noise of the backend
+
+
+    Returns
+    -------
+    dict
+        state         : final state of the active Qbits (Statevector, DensityMatrix, or None for the shot-based simulation)
+        probabilities : probabilities of the Clbit values, indexed by the integer of the Clbits (Clbit 0 as least significant bit),
+                        None for a shot-based simulation with more than `max_statevector_qbits` Clbits
+        counts        : counts of `shots` shots
+        method        : simulation method used
+    """
+    if backend is not None and not transpiled :
+        qc = cached_transpile(qc, backend)
+        transpiled = True
+
+    body, measured = final_measurements(qc)
+    noisy = noise_model is not None and not noise_model.is_ideal()
+    non_unitary = any(instruction.operation.name in ("measure", "reset") for instruction in body.data)
+    clbits = sorted(measured)
+    active = sorted(set(active_qubits(body)) | set(measured.values()))
+
+    if noisy or non_unitary :
+        method = "density_matrix" if len(active) <= max_exact_qbits else None
+    else :
+        method = "statevector" if len(active) <= max_statevector_qbits else None
+
+    if method is not None :
+        # Only the active Qbits are simulated, with the noise of these Qbits
+        reduced = reduced_noise_model(noise_model, active) if noisy else None
+        simulator = get_simulator(method, reduced)
+        tq = compact(body, active)
+        tq = tq if transpiled else cached_transpile(tq, simulator)
+        if method == "statevector" :
+            tq.save_statevector()
+        else :
+            tq.save_density_matrix()
+        state = simulator.run(tq, shots=1).result().data(0)[method]
+
+        # Probabilities of the measured Qbits, spread over the Clbits they are measured into
+        marginal = state.probabilities([active.index(measured[c]) for c in clbits])
+        outcomes = np.zeros(len(marginal), dtype=np.int64)
+        for j, clbit in enumerate(clbits) :
+            outcomes |= ((np.arange(len(marginal)) >> j) & 1) << clbit
+        probabilities = np.zeros(2**qc.num_clbits)
+        np.add.at(probabilities, outcomes, marginal)
+        if noisy :
+            probabilities = apply_readout(probabilities, measured, noise_model)
+
+        return {"state": state, "probabilities": probabilities, "counts": sample_counts(qc, probabilities, shots, rng), "method": method}
+
+    method = select_method(qc, noise_model)
+    simulator = get_simulator(method, noise_model)
+    result = simulator.run(qc if transpiled else cached_transpile(qc, simulator), shots=shots).result()
+    counts = result.get_counts(0)
+    probabilities = None
+    if qc.num_clbits <= max_statevector_qbits :
+        probabilities = np.zeros(2**qc.num_clbits)
+        for key, value in result.data(0)["counts"].items() :
+            probabilities[int(key, 16)] = value / shots
+
+    return {"state": None, "probabilities": probabilities, "counts": counts, "method": method}
@@ -0,0 +1,333 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+from exact import active_qubits, compact, reduced_noise_model
+from job_manager import final_status
+from simulator_registry import backend_noise_model, noise_fingerprint
+
+
+_samplers = {}     # noise fingerprint -> Aer SamplerV2 with this noise model
+
+
+def _aer_sampler(noise_model) :
+    """
+    Aer SamplerV2 of `noise_model`, built once per noise model content (the local mode of
+    `qiskit_ibm_runtime.SamplerV2` deep-copies the simulator and its noise model at each run)
+    """
+    key = noise_fingerprint(noise_model)
+    if key not in _samplers :
+        from qiskit_aer.primitives import SamplerV2
+
+        _samplers[key] = SamplerV2(options={"backend_options": {"noise_model": noise_model}})
+    return _samplers[key]
+
+
+def _now() -> str :
+    """ Current time formatted like the timestamps of the Runtime service """
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+class FakeRuntimeJob :
+    """
+    Job of `FakeSamplerV2`, with the interface of a Runtime job (job_id, status, result,
+    metrics, error_message, cancel ...). Its status goes QUEUED -> RUNNING -> DONE (or ERROR).
+    """
+
+    def __init__(self, service, backend, pubs: list, shots: int) :
+        self._service = service
+        self._backend = backend
+        self._pubs = pubs
+        self._shots = shots
+        self._job_id = uuid.uuid4().hex[:20]
+        self._status = "QUEUED"
+        self._result = None
+        self._error = None
+        self._timestamps = {"created": _now(), "running": None, "finished": None}
+        self._quantum_seconds = 0.0
+        self._done = threading.Event()
+        self.creation_date = datetime.now(timezone.utc)
+
+    def job_id(self) -> str :
+        return self._job_id
+
+    def backend(self) :
+        return self._backend
+
+    def status(self) -> str :
+        return self._status
+
+    def done(self) -> bool :
+        return self._status == "DONE"
+
+    def running(self) -> bool :
+        return self._status == "RUNNING"
+
+    def in_final_state(self) -> bool :
+        return self._status in final_status
+
+    def error_message(self) -> str :
+        return self._error
+
+    def cancel(self) :
+        """ Cancels the job if it is still queued """
+        if self._status == "QUEUED" :
+            self._status = "CANCELLED"
+            self._timestamps["finished"] = _now()
+            self._done.set()
+
+    def result(self, timeout: float = None) :
+        """ Waits for the end of the job and returns its PrimitiveResult """
+        from qiskit_ibm_runtime.exceptions import RuntimeJobFailureError, RuntimeJobTimeoutError, RuntimeInvalidStateError
+
+        if not self._done.wait(timeout) :
+            raise RuntimeJobTimeoutError(f"Timed out waiting for job {self._job_id}")
+        if self._status == "ERROR" :
+            raise RuntimeJobFailureError(f"Unable to retrieve job result. {self._error}")
+        if self._status == "CANCELLED" :
+            raise RuntimeInvalidStateError(f"Unable to retrieve result for job {self._job_id}. Job was cancelled.")
+        return self._result
+
+    def wait_for_final_state(self, timeout: float = None) :
+        self._done.wait(timeout)
+
+    def usage(self) -> float :
+        return self._quantum_seconds
+
+    def metrics(self) -> dict :
+        """ Metrics shaped like those of the Runtime service, the timestamps being ISO str """
+        return {
+            "timestamps": dict(self._timestamps),
+            "bss": {"seconds": round(self._quantum_seconds)},
+            "usage": {"quantum_seconds": round(self._quantum_seconds), "seconds": round(self._quantum_seconds)},
+            "executions": self._shots * sum(int(np.prod(pub.shape)) for pub in self._pubs),
+            "num_circuits": sum(int(np.prod(pub.shape)) for pub in self._pubs),
+            "position_in_queue": self._service._position(self),
+        }
+
+
+    def _execute(self, queue_delay: float, fail: bool) :
+        """ Runs the job on Aer after its queue delay (called by the worker of the backend) """
+        from qiskit.primitives import PrimitiveResult
+        from qiskit.primitives.containers.sampler_pub import SamplerPub
+
+        # The queue delay starts at the submission, the jobs of a backend then run one at a time
+        created = self.creation_date.timestamp()
+        time.sleep(max(0.0, created + queue_delay - time.time()))
+        if self._status == "CANCELLED" :
+            return
+
+        self._status = "RUNNING"
+        self._timestamps["running"] = _now()
+        start = time.perf_counter()
+        try :
+            if fail :
+                raise RuntimeError("Error code 1517; Injected failure of the fake runtime service.")
+
+            # Each PUB is simulated on its active Qbits only, with the noise of these Qbits
+            noise_model = backend_noise_model(self._backend)
+            pub_results = []
+            for pub in self._pubs :
+                qbits = active_qubits(pub.circuit)
+                compacted = compact(pub.circuit, qbits)
+                sampler = _aer_sampler(reduced_noise_model(noise_model, qbits))
+                pub_results.append(sampler.run([SamplerPub(compacted, pub.parameter_values, pub.shots)]).result()[0])
+            if self._service.shot_time :
+                time.sleep(self._service.shot_time * self.metrics()["executions"])
+
+            self._result = PrimitiveResult(pub_results, metadata={"version": 2})
+            self._status = "DONE"
+        except Exception as error :
+            self._error = str(error)
+            self._status = "ERROR"
+
+        self._quantum_seconds = time.perf_counter() - start
+        self._timestamps["finished"] = _now()
+        self._done.set()
+
+
+
+class FakeSamplerV2 :
+    """
+    Stand-in for `qiskit_ibm_runtime.SamplerV2` : same `run(pubs, shots=None)` call, the job
+    is executed by the `FakeRuntimeService` of the backend.
+    """
+
+    def __init__(self, mode = None, options: dict = None) :
+        """
+        Parameters
+        ----------
+        mode : BackendV2
+            Backend of a `FakeRuntimeService` (see `FakeRuntimeService.backend`)
+
+        options : dict, optional
+            Only "default_shots" is used
+        """
+        self._backend = mode
+        self._service = getattr(mode, "_fake_service", None)
+        if self._service is None :
+            raise ValueError("The mode of a FakeSamplerV2 must be a backend of a FakeRuntimeService")
+        self._default_shots = (options or {}).get("default_shots", 4096)
+
+    def run(self, pubs, *, shots: int = None) -> FakeRuntimeJob :
+        from qiskit.primitives.containers.sampler_pub import SamplerPub
+        from qiskit_ibm_runtime.exceptions import IBMInputValueError
+
+        shots = shots or self._default_shots
+        coerced = [SamplerPub.coerce(pub, shots) for pub in pubs]
+        for pub in coerced :
+            if pub.circuit.num_qubits > self._backend.num_qubits :
+                raise IBMInputValueError(f"The circuit has {pub.circuit.num_qubits} Qbits but {self._backend.name} only has {self._backend.num_qubits}")
+        return self._service._submit(self._backend, coerced, shots)
+
+
+
+class FakeRuntimeService :
+    """
+    Offline stand-in for `QiskitRuntimeService`, to test and benchmark the hardware paths
+    without IBM credentials.
+
+    The backends are the fake backends of `qiskit_ibm_runtime.fake_provider` (their noise and
+    calibration are snapshots of the real devices). The jobs of `FakeSamplerV2` wait `queue_delay`
+    seconds from their submission, then run one at a time per backend on Aer with the NoiseModel
+    of the backend. Their `metrics()["timestamps"]` follow this schedule.
+    """
+
+    def __init__(self, queue_delay = 0.0, failure_rate: float = 0.0, shot_time: float = 0.0, seed: int = None, backends: list = None) :
+        """
+        Parameters
+        ----------
+        queue_delay : float or tuple[float, float], default=0
+            Queue delay of each job in seconds, or (min, max) to draw it uniformly
+
+        failure_rate : float, default=0
+            Probability that a job ends with the status ERROR
+
+        shot_time : float, default=0
+            Extra execution time per shot in seconds, to emulate the duration of a QPU
+
+        seed : int, optional
+            Seed of the queue delays and of the failures
+
+        backends : list[BackendV2], optional
+            Backends of the service, every fake backend of `qiskit_ibm_runtime.fake_provider` by default
+        """
+        if backends is None :
+            from qiskit_ibm_runtime.fake_provider import FakeProviderForBackendV2
+            backends = FakeProviderForBackendV2().backends()
+
+        self.queue_delay = queue_delay
+        self.failure_rate = failure_rate
+        self.shot_time = shot_time
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self._backends = {}
+        self._workers = {}
+        self._jobs = {}
+        for backend in backends :
+            backend._fake_service = self
+            self._backends[backend.name] = backend
+
+
+    @staticmethod
+    def _fake_name(name: str) -> str :
+        """ "ibm_sherbrooke" -> "fake_sherbrooke", so the scripts keep their backend names """
+        return "fake_" + name[len("ibm_"):] if name.startswith("ibm_") else name
+
+    def backend(self, name: str = None, **kwargs) :
+        """ Fake backend `name` (e.g. "ibm_sherbrooke" or "fake_sherbrooke") """
+        from qiskit.providers.exceptions import QiskitBackendNotFoundError
+
+        if name is None :
+            return self.least_busy()
+        backend = self._backends.get(self._fake_name(name))
+        if backend is None :
+            raise QiskitBackendNotFoundError(f"No backend matches the criteria : {name}")
+        return backend
+
+    def backends(self, name: str = None, min_num_qubits: int = None, simulator: bool = None, operational: bool = None, filters = None, **kwargs) -> list :
+        """ Backends matching the criteria of `QiskitRuntimeService.backends` (the fake backends are never simulators) """
+        backends = list(self._backends.values())
+        if name is not None :
+            backends = [backend for backend in backends if backend.name == self._fake_name(name)]
+        if min_num_qubits is not None :
+            backends = [backend for backend in backends if backend.num_qubits >= min_num_qubits]
+        if simulator :
+            backends = []
+        if filters is not None :
+            backends = [backend for backend in backends if filters(backend)]
+        return backends
+
+    def least_busy(self, min_num_qubits: int = None, filters = None, **kwargs) :
+        """ Backend with the fewest pending jobs of this service """
+        from qiskit.providers.exceptions import QiskitBackendNotFoundError
+
+        backends = self.backends(min_num_qubits=min_num_qubits, filters=filters, **kwargs)
+        if not backends :
+            raise QiskitBackendNotFoundError("No backend matches the criteria.")
+        return min(backends, key=self.pending_jobs)
+
+    def job(self, job_id: str) -> FakeRuntimeJob :
+        """ Job `job_id` submitted to this service """
+        from qiskit_ibm_runtime.exceptions import RuntimeJobNotFound
+
+        if job_id not in self._jobs :
+            raise RuntimeJobNotFound(f"Job not found : {job_id}")
+        return self._jobs[job_id]
+
+    def jobs(self, limit: int = 10, backend_name: str = None, pending: bool = None, **kwargs) -> list :
+        """ Last jobs submitted to this service, most recent first """
+        jobs = list(reversed(self._jobs.values()))
+        if backend_name is not None :
+            jobs = [job for job in jobs if job.backend().name == self._fake_name(backend_name)]
+        if pending is not None :
+            jobs = [job for job in jobs if job.in_final_state() != pending]
+        return jobs[:limit]
+
+    def pending_jobs(self, backend) -> int :
+        """ Number of jobs of `backend` not finished yet """
+        return sum(1 for job in self._jobs.values() if job.backend() is backend and not job.in_final_state())
+
+
+    def _position(self, job: FakeRuntimeJob) -> int :
+        """ Position of a queued job in the queue of its backend, None once it runs """
+        if job.status() != "QUEUED" :
+            return None
+        queued = [other for other in self._jobs.values() if other.backend() is job.backend() and other.status() == "QUEUED"]
+        return queued.index(job) + 1
+
+    def _draw_delay(self) -> float :
+        if isinstance(self.queue_delay, tuple) :
+            return float(self._rng.uniform(*self.queue_delay))
+        return float(self.queue_delay)
+
+    def _submit(self, backend, pubs: list, shots: int) -> FakeRuntimeJob :
+        """ Queues a job on the worker of `backend` """
+        with self._lock :
+            job = FakeRuntimeJob(self, backend, pubs, shots)
+            self._jobs[job.job_id()] = job
+            if backend.name not in self._workers :
+                self._workers[backend.name] = ThreadPoolExecutor(max_workers=1, thread_name_prefix=backend.name)
+            queue_delay, fail = self._draw_delay(), bool(self._rng.random() < self.failure_rate)
+        self._workers[backend.name].submit(job._execute, queue_delay, fail)
+        return job
+
+    def close(self) :
+        """ Stops the workers once their jobs are finished """
+        for worker in self._workers.values() :
+            worker.shutdown(wait=True)
+        self._workers.clear()
+
+
+
+def sampler(mode) :
+    """ `FakeSamplerV2` if `mode` is a backend of a `FakeRuntimeService`, `qiskit_ibm_runtime.SamplerV2` otherwise """
+    if getattr(mode, "_fake_service", None) is not None :
+        return FakeSamplerV2(mode=mode)
+
+    from qiskit_ibm_runtime import SamplerV2
+    return SamplerV2(mode=mode)
@@ -0,0 +1,278 @@
+import hashlib
+from itertools import permutations
+from math import factorial
+
+import numpy as np
+
+
+# Above this number of (permutation x gate) steps, the Qbits are relabelled by colour refinement instead
+# (see `_refined_labels`), which also explores at most this number of (relabelling x gate) steps
+max_permutation_work = 50_000
+
+
+def _canonical_order(ops: list[tuple]) -> list[tuple] :
+    """
+    Sorts the operations by ASAP layer, then by content.
+
+    Operations on disjoint wires that only differ by their order in the circuit
+    end up in the same layer, so they get the same canonical order.
+    """
+    last_layer = {}
+    layered = []
+    for name, qbits, clbits, params in ops :
+        wires = [("q", q) for q in qbits] + [("c", c) for c in clbits]
+        layer = 1 + max((last_layer.get(wire, -1) for wire in wires), default=-1)
+        for wire in wires :
+            last_layer[wire] = layer
+        layered.append((layer, name, qbits, clbits, params))
+
+    layered.sort()
+    return layered
+
+
+def _relabel(ops: list[tuple], qbit_map, clbit_map) -> list[tuple] :
+    return [(name, tuple(qbit_map[q] for q in qbits), tuple(clbit_map[c] for c in clbits), params) for name, qbits, clbits, params in ops]
+
+
+def _layers(ops: list[tuple]) -> list[int] :
+    """ ASAP layer of each operation, which does not depend on the labels of the wires """
+    last_layer = {}
+    layers = []
+    for _, qbits, clbits, _ in ops :
+        wires = [("q", q) for q in qbits] + [("c", c) for c in clbits]
+        layer = 1 + max((last_layer.get(wire, -1) for wire in wires), default=-1)
+        for wire in wires :
+            last_layer[wire] = layer
+        layers.append(layer)
+    return layers
+
+
+def _ranks(values: list) -> list[int] :
+    """ Rank of each value among the distinct values """
+    order = {value: k for k, value in enumerate(sorted(set(values)))}
+    return [order[value] for value in values]
+
+
+def _refine(ops: list[tuple], layers: list[int], colours: list[int], follow: bool) -> list[int] :
+    """
+    Colour refinement of the Qbits : the colour of a Qbit is refined with the layer, content
+    and position of each of its operations, and the colours of the other Qbits of these
+    operations, until the number of colours stops growing.
+    """
+    while True :
+        signatures = [[] for _ in colours]
+        for (name, qbits, clbits, params), layer in zip(ops, layers) :
+            others = tuple(colours[q] for q in qbits)
+            targets = tuple(colours[c] for c in clbits) if follow else clbits
+            for position, q in enumerate(qbits) :
+                signatures[q].append((layer, name, params, position, others, targets))
+        refined = _ranks([(colours[q], tuple(sorted(signatures[q]))) for q in range(len(colours))])
+        if len(set(refined)) == len(set(colours)) :
+            return refined
+        colours = refined
+
+
+def _refined_labels(ops: list[tuple], nb_qbits: int, nb_clbits: int, max_work: int) -> list[tuple] :
+    """
+    Canonical form of `ops` up to a relabelling of the Qbits, without trying every permutation.
+
+    The Qbits are told apart by colour refinement (see `_refine`). While some Qbits share a colour,
+    each of them is singled out in turn and the colours are refined again (individualisation-refinement),
+    keeping the smallest canonical form. Idle Qbits are interchangeable and are never branched on.
+
+    The result does not depend on the labels of the Qbits as long as the search explores less than
+    `max_work` (relabelling x gate) steps, which only highly symmetric circuits reach. Above, the
+    smallest form found so far is kept (best effort).
+    """
+    follow = nb_clbits == nb_qbits
+    identity = list(range(max(nb_qbits, nb_clbits)))
+    layers = _layers(ops)
+
+    used = set()
+    for _, qbits, clbits, _ in ops :
+        used.update(qbits)
+        if follow :
+            used.update(clbits)
+    idle = [q not in used for q in range(nb_qbits)]
+    leaves = []
+    budget = max(max_work // max(len(ops), 1), 1)
+
+    def search(colours) :
+        colours = _refine(ops, layers, colours, follow)
+        classes = {}
+        for q, colour in enumerate(colours) :
+            if not idle[q] :
+                classes.setdefault(colour, []).append(q)
+        ties = [members for _, members in sorted(classes.items()) if len(members) > 1]
+
+        if not ties :
+            # The idle Qbits get the last labels, in any order
+            labels = [0] * nb_qbits
+            for label, q in enumerate(sorted(range(nb_qbits), key=lambda q : (idle[q], colours[q], q))) :
+                labels[q] = label
+            leaves.append(_canonical_order(_relabel(ops, labels, labels if follow else identity)))
+            return
+
+        for q in ties[0] :
+            if len(leaves) >= budget :
+                return
+            search(_ranks([(colour, p != q) for p, colour in enumerate(colours)]))
+
+    search([int(flag) for flag in idle])
+    return min(leaves)
+
+
+def fingerprint_ops(ops: list[tuple], nb_qbits: int, nb_clbits: int, up_to_permutation=True, max_work: int = None) -> str :
+    """
+    Computes the fingerprint of a list of operations.
+
+    Parameters
+    ----------
+    ops : list[tuple]
+        Operations as (name, Qbit indices, Clbit indices, params) tuples
+
+    nb_qbits : int
+        Number of Qbits of the circuit
+
+    nb_clbits : int
+        Number of Clbits of the circuit
+
+    up_to_permutation : default=True
+        Give the same fingerprint to circuits that only differ by a relabelling of the Qbits.
+        When there are as many Clbits as Qbits (measure_all), the Clbits follow the Qbits.
+        Every permutation is tried while (nb_qbits! x nb_ops) <= `max_work`, above the Qbits are
+        relabelled by colour refinement (see `_refined_labels`), exact except for highly symmetric circuits
+
+    max_work : int, optional
+        Work limit of the canonical form, `max_permutation_work` by default
+
+
+    Returns
+    -------
+    str
+        Hexadecimal SHA-256 of the canonical form
+    """
+    ops = [(name, tuple(qbits), tuple(clbits), params) for name, qbits, clbits, params in ops]
+    identity = list(range(max(nb_qbits, nb_clbits)))
+    max_work = max_permutation_work if max_work is None else max_work
+
+    if not up_to_permutation :
+        canonical = _canonical_order(ops)
+
+    elif factorial(nb_qbits) * max(len(ops), 1) <= max_work :
+        # Exact class : smallest canonical form over all the relabellings
+        canonical = min(
+            _canonical_order(_relabel(ops, perm, perm if nb_clbits == nb_qbits else identity))
+            for perm in permutations(range(nb_qbits))
+        )
+
+    else :
+        canonical = _refined_labels(ops, nb_qbits, nb_clbits, max_work)
+
+    text = f"{nb_qbits};{nb_clbits};{up_to_permutation};" + repr(canonical)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _param_key(param) -> str :
+    """
+    Text of a gate parameter for the fingerprint. Arrays (unitary, initialize data...) are hashed
+    on their full data : their `str` is summarised above a few elements.
+    """
+    if isinstance(param, np.ndarray) :
+        return f"array{param.shape}{param.dtype}:{hashlib.sha256(np.ascontiguousarray(param).tobytes()).hexdigest()}"
+    if isinstance(param, np.generic) :
+        param = param.item()
+    return repr(param)
+
+
+def _condition_key(qc, condition) -> tuple[list[int], tuple] :
+    """
+    Clbits read by the classical `condition` of an operation (c_if), and the parameter
+    describing it. The Clbits are relabelled like the other Clbits of the operation.
+    """
+    if condition is None :
+        return [], ()
+    target, value = condition if isinstance(condition, tuple) else (None, condition)
+    if target is None :
+        return [], (f"condition({value!r})",)
+    bits = list(target) if hasattr(target, "size") else [target]
+    return [qc.find_bit(c).index for c in bits], (f"condition({len(bits)},{value!r})",)
+
+
+def circuit_fingerprint(qc, up_to_permutation=True, barriers=False, max_work: int = None) -> str :
+    """
+    Fingerprint of a QuantumCircuit, stable across runs and processes.
+
+    The order of operations acting on disjoint wires is ignored, and so are the barriers
+    unless `barriers` (they change the output of a transpilation, see `transpile_cache`).
+    The classical conditions (c_if) are part of the fingerprint.
+    See `fingerprint_ops` for `up_to_permutation` and `max_work`.
+    """
+    ops = []
+    for instruction in qc.data :
+        if instruction.operation.name == "barrier" and not barriers :
+            continue
+        # `_condition` : the public `condition` warns at every access since Qiskit 1.3, and is gone in 2.0
+        condition_clbits, condition = _condition_key(qc, getattr(instruction.operation, "_condition", None))
+        ops.append((
+            instruction.operation.name,
+            [qc.find_bit(q).index for q in instruction.qubits],
+            [qc.find_bit(c).index for c in instruction.clbits] + condition_clbits,
+            tuple(_param_key(p) for p in instruction.operation.params) + condition,
+        ))
+    return fingerprint_ops(ops, qc.num_qubits, qc.num_clbits, up_to_permutation, max_work)
+
+
+def array_fingerprint(gate_names: list[str], gate_ids: np.ndarray, qbits: np.ndarray, nb_qbits: int, random_init=False, up_to_permutation=True, max_work: int = None) -> str :
+    """
+    Fingerprint of a circuit described by one row of `fuzzing.random_gate_arrays`,
+    without building it. Equal to `circuit_fingerprint` of `fuzzing.build_circuit`.
+
+    Parameters
+    ----------
+    gate_names : list[str]
+        Name of each gate id
+    """
+    ops = [("h", [q], [], ()) for q in range(nb_qbits)] if random_init else []
+    for gate_id, gate_qbits in zip(gate_ids.tolist(), qbits.tolist()) :
+        ops.append((gate_names[gate_id], [q for q in gate_qbits if q >= 0], [], ()))
+    ops += [("measure", [q], [q], ()) for q in range(nb_qbits)]
+
+    return fingerprint_ops(ops, nb_qbits, nb_qbits, up_to_permutation, max_work)
+
+
+def deduplicate(circuits, seen: set = None, up_to_permutation=True, verbose=False) :
+    """
+    Filters a stream of (QuantumCircuit, date) tuples, skipping fingerprints already seen.
+
+    Parameters
+    ----------
+    circuits : iterable of tuple[QuantumCircuit, str]
+        Stream of circuits, e.g. `fuzzing.fuzzing_stream(...)`
+
+    seen : set, optional
+        Fingerprints already processed (updated in place), to share across streams or runs
+
+    up_to_permutation : default=True
+        See `fingerprint_ops`
+
+    verbose : default=False
+        Print the skipped circuits
+
+
+    Yields
+    ------
+    tuple[QuantumCircuit, str]
+        The new circuits, with `qc.metadata["fingerprint"]` set
+    """
+    seen = set() if seen is None else seen
+
+    for qc, date in circuits :
+        fingerprint = circuit_fingerprint(qc, up_to_permutation)
+        if fingerprint in seen :
+            if verbose : print(f"Skipping duplicate circuit {date} ({fingerprint[:12]})")
+            continue
+
+        seen.add(fingerprint)
+        qc.metadata = {**(qc.metadata or {}), "fingerprint": fingerprint}
+        yield qc, date
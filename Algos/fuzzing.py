@@ -1,40 +1,350 @@
 from qiskit import QuantumCircuit, transpile
-from qiskit_aer import AerSimulator
+from qiskit.circuit import CircuitInstruction, ParameterVector
 from qiskit.circuit.library import get_standard_gate_name_mapping
-from qiskit.visualization import plot_histogram
-from qiskit_ibm_runtime import QiskitRuntimeService, SamplerV2 as Sampler
 
-from qiskit_ibm_runtime import Options
+# qiskit_aer, qiskit_ibm_runtime, matplotlib and scipy are imported inside the functions that use them :
+# importing this module (e.g. in every worker process) only loads qiskit and numpy, and never touches the network
 # Pour affichage et outliers
 #from utils import remove_outliers, graph, graph3d
 
 import numpy as np
-import matplotlib.pyplot as plt
-from mpl_toolkits.mplot3d import Axes3D
-from scipy.stats import norm, gaussian_kde
 
-from random import sample, choice
+from itertools import islice
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
+import os
 import time
 from datetime import datetime
 
+from circuit_store import CircuitStore
+
 
 My_Key = "" # Put your token between the quotes
 
-QiskitRuntimeService.save_account(token=TOKEN, overwrite=True, channel="ibm_quantum")
+
+def init_account(token = My_Key) :
+    """
+    Saves the IBM Quantum credentials used by `QiskitRuntimeService()`.
+
+    Must be called explicitly once (it writes the credentials on disk).
+    """
+    from qiskit_ibm_runtime import QiskitRuntimeService
+    QiskitRuntimeService.save_account(token=token, overwrite=True, channel="ibm_quantum")
+
 
 # Ignoring gates with parameters for now
 gates = [gate for gate in get_standard_gate_name_mapping().values() if gate.params == [] and gate.num_clbits == 0]
 
+# Gates with parameters, used by `fuzzing_parametric` (global_phase and delay are not rotations)
+parametric_gates = [gate for gate in get_standard_gate_name_mapping().values() if gate.params != [] and gate.num_clbits == 0 and gate.name not in ("global_phase", "delay")]
+
+# Number of Qbits of each gate, indexed by gate id (position in `gates`)
+gate_arity = np.array([gate.num_qubits for gate in gates], dtype=np.uint8)
+max_arity = int(max(gate.num_qubits for gate in gates + parametric_gates))
+
+
+def random_gate_arrays(rng, nb_circuits: int, nb_qbits: int, nb_gates: int, table = None) -> tuple[np.ndarray, np.ndarray] :
+    """
+    Draws the gates and Qbits of `nb_circuits` random circuits at once.
+
+    Parameters
+    ----------
+    rng : numpy.random.Generator or int
+        Random generator (or seed) used for every draw
+
+    nb_circuits : int
+        Number of circuits to generate
+
+    nb_qbits : int
+        Number of Qbits in each circuit
+
+    nb_gates : int
+        Number of gates in each circuit
+
+    table : list[Gate], default=None
+        Gates to draw from, `gates` if None
+
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        Gate ids of shape (nb_circuits, nb_gates) indexing `table`, and
+        distinct Qbits of shape (nb_circuits, nb_gates, max_arity), padded with -1
+    """
+    rng = np.random.default_rng(rng)
+    table = gates if table is None else table
+    table_arity = gate_arity if table is gates else np.array([gate.num_qubits for gate in table], dtype=np.uint8)
+
+    gate_ids = rng.integers(0, len(table), size=(nb_circuits, nb_gates), dtype=np.uint8)
+    arity = table_arity[gate_ids]
+
+    if nb_gates > 0 and arity.max(initial=0) > nb_qbits :
+        too_big = table[int(gate_ids[arity > nb_qbits][0])]
+        raise ValueError(f"The required number of Qbits for the gate {too_big} is greater than the number of Qbits in the circuit ({nb_qbits})")
+
+    # Sampling without replacement : the j-th Qbit is drawn among the nb_qbits-j remaining ones,
+    # then shifted past the Qbits already chosen (kept sorted with elementwise min/max)
+    qbits = np.full((nb_circuits, nb_gates, max_arity), -1, dtype=np.int16)
+    chosen_sorted = []
+    for j in range(min(max_arity, nb_qbits)) :
+        draw = rng.integers(0, nb_qbits - j, size=(nb_circuits, nb_gates), dtype=np.int16)
+        for chosen in chosen_sorted :
+            draw += draw >= chosen
+
+        new = draw
+        for k, chosen in enumerate(chosen_sorted) :
+            chosen_sorted[k], new = np.minimum(chosen, new), np.maximum(chosen, new)
+        chosen_sorted.append(new)
+
+        qbits[..., j] = np.where(arity > j, draw, -1)
+
+    return gate_ids, qbits
+
+
+def build_circuit(gate_ids: np.ndarray, qbits: np.ndarray, nb_qbits: int, random_init = False) -> QuantumCircuit :
+    """
+    Builds the QuantumCircuit described by one row of `random_gate_arrays`.
+
+    Parameters
+    ----------
+    gate_ids : np.ndarray
+        Gate ids of the circuit, shape (nb_gates,)
+
+    qbits : np.ndarray
+        Qbits of each gate, shape (nb_gates, max_arity), padded with -1
+
+    nb_qbits : int
+        Number of Qbits in the circuit
+
+    random_init : default=False
+        Apply a Hadamard gate to all Qbits at the beginning of the circuit
+
+
+    Returns
+    -------
+    QuantumCircuit
+        The circuit, measured on all Qbits
+    """
+    qc = QuantumCircuit(nb_qbits)
+    if random_init :
+        qc.h(range(nb_qbits))
+
+    # The arrays are already valid, so the checks of qc.append are skipped
+    circuit_qbits = qc.qubits
+    for gate_id, gate_qbits in zip(gate_ids.tolist(), qbits.tolist()) :
+        gate = gates[gate_id]
+        qc._append(CircuitInstruction(gate, [circuit_qbits[q] for q in gate_qbits[:gate.num_qubits]]))
+
+    qc.measure_all()
+    return qc
+
+
+def fuzzing_batch(nb_circuits: int, nb_qbits: int, nb_gates: int, rng = None, random_init = False, build = False) :
+    """
+    Vectorized version of `fuzzing` : draws every circuit of the batch as integer arrays.
+
+    Parameters
+    ----------
+    nb_circuits : int
+        Number of circuits to generate
+
+    nb_qbits : int
+        Number of Qbits in the circuit
+
+    nb_gates : int
+        Number of gates in the circuit
+
+    rng : numpy.random.Generator or int, default=None
+        Seeded random generator (or seed), fresh entropy if None
+
+    random_init : default=False
+        Apply a Hadamard gate to all Qbits at the beginning of the circuit (only used with `build`)
+
+    build : default=False
+        Also build the QuantumCircuit objects
+
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray] or list[QuantumCircuit]
+        The arrays of `random_gate_arrays`, or the circuits if `build` is True
+    """
+    gate_ids, qbits = random_gate_arrays(rng, nb_circuits, nb_qbits, nb_gates)
+
+    if not build :
+        return gate_ids, qbits
+
+    return [build_circuit(gate_ids[i], qbits[i], nb_qbits, random_init) for i in range(nb_circuits)]
+
+
+def fuzzing_parametric(nb_qbits: int, nb_gates: int, rng = None, random_init = False) -> tuple[QuantumCircuit, ParameterVector] :
+    """
+    Generates a random circuit whose gates may have symbolic parameters.
+
+    The circuit can be transpiled once, then run on many parameter sets in a single job
+    (see `simulate.simulate_parameters`).
+
+    Parameters
+    ----------
+    nb_qbits : int
+        Number of Qbits in the circuit
+
+    nb_gates : int
+        Number of gates in the circuit
+
+    rng : numpy.random.Generator or int, default=None
+        Seeded random generator (or seed), fresh entropy if None
+
+    random_init : default=False
+        Apply a Hadamard gate to all Qbits at the beginning of the circuit
+
+
+    Returns
+    -------
+    tuple[QuantumCircuit, ParameterVector]
+        The circuit, measured on all Qbits, and its parameters
+    """
+    table = gates + parametric_gates
+    gate_ids, qbits = random_gate_arrays(rng, 1, nb_qbits, nb_gates, table)
+    drawn = [table[gate_id] for gate_id in gate_ids[0].tolist()]
+
+    params = ParameterVector("θ", sum(len(gate.params) for gate in drawn))
+
+    qc = QuantumCircuit(nb_qbits)
+    if random_init :
+        qc.h(range(nb_qbits))
+
+    k = 0
+    for gate, gate_qbits in zip(drawn, qbits[0].tolist()) :
+        if gate.params :
+            gate = type(gate)(*params[k : k + len(gate.params)])
+            k += len(gate.params)
+        qc.append(gate, gate_qbits[:gate.num_qubits])
+
+    qc.measure_all()
+    return qc, params
+
+
+def random_parameter_values(rng, nb_sets: int, nb_parameters: int) -> np.ndarray :
+    """
+    Draws `nb_sets` parameter sets uniformly in [0, 2π[.
+
+    Returns
+    -------
+    np.ndarray
+        Values of shape (nb_sets, nb_parameters)
+    """
+    rng = np.random.default_rng(rng)
+    return rng.uniform(0, 2*np.pi, size=(nb_sets, nb_parameters))
+
+
 def remove_outliers(data, upper_bound):
     """ Supprime les valeurs extrêmes basées sur l'IQR """
     return [x for x in data if x <= upper_bound]
 
 
-def fuzzing(nb_circuits: int, nb_qbits: int, nb_gates: int, save=False, verbose = False, random_init = False) -> list[QuantumCircuit, str] :
+def fuzzing_stream(nb_circuits: int, nb_qbits: int, nb_gates: int, save=False, verbose = False, random_init = False, chunk_size = 1024, rng = None, store_path = "data/store") :
+    """
+    Lazy version of `fuzzing` : yields the circuits one by one.
+
+    The gates are drawn `chunk_size` circuits at a time and each QuantumCircuit is only
+    built when it is requested, so memory stays bounded whatever `nb_circuits` is.
+
+    Parameters
+    ----------
+    nb_circuits : int
+        Number of circuits to generate
+
+    nb_qbits : int
+        Number of Qbits in the circuit
+
+    nb_gates : int
+        Number of gates in the circuit
+
+    save : default=False
+        Append the circuits to the CircuitStore at `store_path`
+
+    verbose : default=False
+        Print the circuits in the console
+
+    random_init : default=False
+        Apply a Hadamard gate to all Qbits at the beginning of the circuit
+
+    chunk_size : default=1024
+        Number of circuits drawn at once
+
+    rng : numpy.random.Generator or int, default=None
+        Seeded random generator (or seed), fresh entropy if None
+
+    store_path : default="data/store"
+        Directory of the CircuitStore used with `save`
+
+
+    Yields
+    ------
+    tuple[QuantumCircuit, str]
+        A circuit with its creation date. With `save`, `qc.metadata["store_index"]`
+        is the index of the circuit in the store
+    """
+    rng = np.random.default_rng(rng)
+
+    if save :
+        store = CircuitStore(store_path, [gate.name for gate in gates])
+        id_map = store.gate_id_map([gate.name for gate in gates])
+
+    for start in range(0, nb_circuits, chunk_size) :
+        size = min(chunk_size, nb_circuits - start)
+        gate_ids, qbits = random_gate_arrays(rng, size, nb_qbits, nb_gates)
+
+        if save :
+            indices = store.append(id_map[gate_ids], qbits, nb_qbits, random_init)
+
+        for i in range(size) :
+            date = datetime.now().strftime("%Y-%m-%d %H-%M-%S-%f")[:-3]
+
+            if verbose :
+                print(f"\nGenerating circuit {start+i+1}")
+                if random_init : print("Applied Hadamard gate to all Qbits")
+                for gate_id, rand_qbits in zip(gate_ids[i].tolist(), qbits[i].tolist()) :
+                    print(f"Added gate : {gates[gate_id].name.ljust(5)}\t on Qbits : {rand_qbits[:gate_arity[gate_id]]}")
+
+            qc = build_circuit(gate_ids[i], qbits[i], nb_qbits, random_init)
+            qc.metadata = {"date": date}
+            if save :
+                qc.metadata["store_index"] = int(indices[i])
+
+            yield qc, date
+
+
+def fuzzing_chunks(nb_circuits: int, nb_qbits: int, nb_gates: int, chunk_size = 64, **kwargs) :
+    """
+    Same as `fuzzing_stream`, but yields lists of at most `chunk_size` circuits.
+
+    Useful to feed batched simulations while keeping memory bounded.
+    The other keyword arguments are passed to `fuzzing_stream`.
+
+    Yields
+    ------
+    list[tuple[QuantumCircuit, str]]
+        Consecutive circuits with their creation date
+    """
+    yield from chunked(fuzzing_stream(nb_circuits, nb_qbits, nb_gates, **kwargs), chunk_size)
+
+
+def chunked(iterable, chunk_size: int) :
+    """ Cuts any stream (e.g. a deduplicated `fuzzing_stream`) into lists of at most `chunk_size` items """
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, chunk_size)) :
+        yield chunk
+
+
+def fuzzing(nb_circuits: int, nb_qbits: int, nb_gates: int, save=False, verbose = False, random_init = False, rng = None) -> list[QuantumCircuit, str] :
     """
     Generates a list of circuits with random gates and Qbits
 
+    Prefer `fuzzing_stream` for large sweeps : this function holds every circuit in memory.
+
     Parameters
     ----------
     nb_circuits : int
@@ -47,13 +357,16 @@ def fuzzing(nb_circuits: int, nb_qbits: int, nb_gates: int, save=False, verbose
         Number of gates in the circuit
 
     save : default=False
-        Save the circuits in a file
+        Save the circuits in the CircuitStore (data/store)
     
     verbose : default=False
         Print the circuits in the console
 
     random_init : default=False
         Apply a Hadamard gate to all Qbits at the beginning of the circuit
+
+    rng : numpy.random.Generator or int, default=None
+        Seeded random generator (or seed), fresh entropy if None
     
         
     Returns
@@ -63,49 +376,126 @@ def fuzzing(nb_circuits: int, nb_qbits: int, nb_gates: int, save=False, verbose
     """
 
     print(f"Generating {nb_circuits} circuits with {nb_qbits} Qbits and {nb_gates} gates")
-    circuits = []
-    for i in range(nb_circuits) :
-        date = datetime.now().strftime("%Y-%m-%d %H-%M-%S-%f")[:-3]
-        if save:
-            print("test")
-            fichier = open("data/" + date, "w")
-            fichier.write(f"nb_qbits = {nb_qbits}\n")
-            fichier.write(f"nb_gates = {nb_gates}\n")
-
-        if verbose : print(f"\nGenerating circuit {i+1}")
-        qc = QuantumCircuit(nb_qbits)
-
-        if random_init :
-            qc.h(range(nb_qbits))
-            if verbose : print("Applied Hadamard gate to all Qbits")
-            if save : fichier.write(f"h : {list(range(nb_qbits))}\n")
-
-        for _ in range(nb_gates) :
-            rand_gate = choice(gates)
-            qbits_needed = rand_gate.num_qubits
-
-            if qbits_needed > nb_qbits :
-                raise ValueError(f"The required number of Qbits for the gate {rand_gate} is greater than the number of Qbits in the circuit ({nb_qbits})")
-
-            # Generate a list of distinct random Qbits
-            rand_qbits = sample(range(nb_qbits), qbits_needed)
-
-            if verbose : print(f"Added gate : {rand_gate.name.ljust(5)}\t on Qbits : {rand_qbits}")
-            if save : fichier.write(f"{rand_gate.name} : {rand_qbits}\n")
-
-            qc.append(rand_gate, rand_qbits)  # Adds the gate to the circuit
-            
-        
-        qc.measure_all()
-        circuits.append((qc, date))
-        if save : fichier.close()
-
+    circuits = list(fuzzing_stream(nb_circuits, nb_qbits, nb_gates, save, verbose, random_init, rng=rng))
 
     print("All circuits generated\n")
     return circuits
 
 
+def seeded_gate_arrays(seed: int, block: int, nb_circuits: int, nb_qbits: int, nb_gates: int) -> tuple[np.ndarray, np.ndarray] :
+    """
+    Draws the block number `block` of a seeded campaign.
+
+    Each block has its own generator, derived from the master `seed` and the block number,
+    so a block is always the same whichever process draws it.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        The arrays of `random_gate_arrays`
+    """
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(block,)))
+    return random_gate_arrays(rng, nb_circuits, nb_qbits, nb_gates)
+
+
+def _parallel_block(seed, block, nb_circuits, nb_qbits, nb_gates, random_init, func) :
+    """ Work of one process : draws a block and optionally applies `func` to its circuits """
+    gate_ids, qbits = seeded_gate_arrays(seed, block, nb_circuits, nb_qbits, nb_gates)
+    if func is None :
+        return gate_ids, qbits
+
+    return [func(build_circuit(gate_ids[i], qbits[i], nb_qbits, random_init)) for i in range(nb_circuits)]
+
+
+def fuzzing_parallel(nb_circuits: int, nb_qbits: int, nb_gates: int, seed = None, nb_workers = None, random_init = False, block_size = 1024, func = None) :
+    """
+    Generates the circuits of a campaign on a pool of processes.
+
+    The campaign is cut in blocks of `block_size` circuits, each drawn from its own seed
+    derived from `seed` (see `seeded_gate_arrays`). The output only depends on
+    (`seed`, `block_size`) : it is bit-identical whatever the number of workers.
+
+    Parameters
+    ----------
+    nb_circuits : int
+        Number of circuits to generate
+
+    nb_qbits : int
+        Number of Qbits in the circuit
+
+    nb_gates : int
+        Number of gates in the circuit
+
+    seed : int, default=None
+        Master seed of the campaign, drawn (and printed) if None
+
+    nb_workers : int, default=None
+        Number of processes, all the cores if None. With 1, everything runs in this process
+
+    random_init : default=False
+        Apply a Hadamard gate to all Qbits at the beginning of the circuit
+
+    block_size : default=1024
+        Number of circuits drawn by a worker at once
+
+    func : callable, default=None
+        Picklable function applied to each circuit inside the workers (e.g. a simulation)
+
+
+    Yields
+    ------
+    tuple[QuantumCircuit, str] or Any
+        The circuits with their creation date in campaign order, or the results of `func`
+    """
+    if seed is None :
+        seed = np.random.SeedSequence().entropy
+        print(f"Fuzzing seed : {seed}")
+
+    blocks = [(block, min(block_size, nb_circuits - block*block_size)) for block in range(-(-nb_circuits // block_size))]
+    args = [(seed, block, size, nb_qbits, nb_gates, random_init, func) for block, size in blocks]
+
+    if nb_workers == 1 :
+        results = (_parallel_block(*arg) for arg in args)
+        yield from _unpack_blocks(results, nb_qbits, random_init, func)
+        return
+
+    nb_workers = nb_workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=nb_workers) as executor :
+        # Only a few blocks ahead of the consumer are kept in memory
+        window = 2 * nb_workers
+        pending = deque(executor.submit(_parallel_block, *arg) for arg in args[:window])
+        next_arg = window
+
+        def results() :
+            nonlocal next_arg
+            while pending :
+                result = pending.popleft().result()
+                if next_arg < len(args) :
+                    pending.append(executor.submit(_parallel_block, *args[next_arg]))
+                    next_arg += 1
+                yield result
+
+        yield from _unpack_blocks(results(), nb_qbits, random_init, func)
+
+
+def _unpack_blocks(results, nb_qbits, random_init, func) :
+    """ Turns the results of `_parallel_block` into a flat stream """
+    for result in results :
+        if func is not None :
+            yield from result
+            continue
+
+        gate_ids, qbits = result
+        for i in range(len(gate_ids)) :
+            date = datetime.now().strftime("%Y-%m-%d %H-%M-%S-%f")[:-3]
+            qc = build_circuit(gate_ids[i], qbits[i], nb_qbits, random_init)
+            qc.metadata = {"date": date}
+            yield qc, date
+
+
 def graph3d(circuit_list) :
+    import matplotlib.pyplot as plt
+
     fig = plt.figure(figsize=(10, 6))
     ax = fig.add_subplot(111, projection='3d')
 
@@ -136,6 +526,9 @@ def graph3d(circuit_list) :
     plt.show()
 
 def graph(time_list):
+    import matplotlib.pyplot as plt
+    from scipy.stats import norm, gaussian_kde
+
     # Calcul des stats
     mean_time = np.mean(time_list)
     std_time = np.std(time_list)
@@ -169,62 +562,26 @@ def graph(time_list):
     plt.show()
 
 
-def execute(repetition = 100, save = True) :
-    circuits = fuzzing(3, 10, 25, save, verbose=False, random_init = True)
-
-    time_list_list = []
-    for i in range(len(circuits)) :
-        qc, date = circuits[i]
-
-        
-        simulator = AerSimulator()
-        qc = transpile(qc, simulator, optimization_level=0)
-        # qc.draw('mpl')
-
-        total_exec_time = 0
-        total_simul_time = 0
-
-        time_list = []
-
-        for n in range(repetition) :
-            start = time.perf_counter()
-            result = simulator.run(qc).result()
-            end = time.perf_counter()
-
-            total_exec_time += (end - start)
-            total_simul_time += result.time_taken
-
-            time_list.append(1000*result.time_taken)  # Only simul time for now
-            if n%100 == 0 : print(n, time_list[-1])
+def execute(repetition = 100, save = True, warmup = 5, output = "benchmark.jsonl") :
+    """
+    Benchmarks the simulation time of 3 random circuits, without any window.
 
-        
-        average = 1000*total_exec_time/repetition
-        print(f"Duree d'execution moyen: {average} ms")
-        #print(f"Temps simulation moyen : {1000*total_simul_time/repetition} ms\n")
-        #print(f"Avant filtrage: {len(time_list)} valeurs, après filtrage: {len(time_list)} valeurs\n")
+    See `benchmark.run_benchmark` : the statistics (median, MAD, percentiles of the
+    wall-clock and simulated times) are appended to `output`. With `save`, the circuits and
+    their mean times are also stored in the CircuitStore (data/store).
+    """
+    from benchmark import run_benchmark
 
+    circuits = fuzzing_stream(3, 10, 25, save, verbose=False, random_init = True)
 
-        # Suppression des valeurs extrêmes
-        time_list = remove_outliers(time_list, 2*average)
-        graph(time_list)
-        time_list_list.append(time_list)
-        
-        
+    for record in run_benchmark(circuits, output, repetitions=repetition, warmup=warmup) :
         if save :
-            with open("data/" + date, "a") as fichier :
-                fichier.write(f"Duree d'execution moyen: {1000*total_exec_time/repetition} ms\n")
-                fichier.write(f"Temps simulation moyen : {1000*total_simul_time/repetition} ms\n")
-
-        counts = result.get_counts(qc)
-
-        # print(f"Results for circuit {i+1} :", counts)
-        # plot_histogram(counts)
-        plt.show()
-
-    graph3d(time_list_list)
+            CircuitStore("data/store").append_timing(record["store_index"], record["wall_ms"]["mean"], record["sim_ms"]["mean"])
 
 
 def calculate() :
+    from qiskit_ibm_runtime import QiskitRuntimeService, SamplerV2 as Sampler
+
     circuits = fuzzing(1, 10, 25, save=False, verbose=True, random_init = True)
 
     example_circuit, date = circuits[0]
@@ -248,6 +605,8 @@ def calculate() :
 
 
 def getResults(job_id) :
+    from qiskit_ibm_runtime import QiskitRuntimeService
+
     service = QiskitRuntimeService()
 
     job = service.job(job_id)
@@ -1,35 +1,133 @@
-from qiskit import QuantumCircuit, transpile
-from qiskit_aer import AerSimulator
-from qiskit.circuit.library import get_standard_gate_name_mapping
-from qiskit.visualization import plot_histogram
-from qiskit_ibm_runtime import QiskitRuntimeService, SamplerV2 as Sampler
-from qiskit.visualization import plot_histogram
-import matplotlib.pyplot as plt
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from job_ledger import JobLedger
+from job_manager import final_status
 
 
-service = QiskitRuntimeService()
 
-with open('job_id_list_past.txt', 'r') as fichier :
-    job_id = fichier.readline()[:20]
+def fetch(service, job_id: str) -> dict :
+    """
+    Downloads the result of a job without waiting for it.
 
-    while (job_id != "") :
-        print("Waiting for results")
-        job = service.job(job_id)
+    Returns
+    -------
+    dict
+        job_id, status, counts (of each PUB, None until the job is DONE), metrics and error
+    """
+    job = service.job(job_id)
+    status = job.status()
+    status = getattr(status, "name", status)
+    fetched = {"job_id": job_id, "status": status, "counts": None, "metrics": None, "error": None}
 
-        result = job.result()[0]
-        print(f"Got results for job : {job_id}")
+    if status in final_status :
+        try :
+            fetched["metrics"] = job.metrics()
+        except Exception :
+            pass
 
-        print(job.metrics())
-        print("\n\n")
+    if status == "DONE" :
+        fetched["counts"] = [pub_result.join_data().get_counts() for pub_result in job.result()]
+    elif status in final_status :
+        error_message = getattr(job, "error_message", None)
+        fetched["error"] = error_message() if callable(error_message) else status
 
-        try :
-            print(result.data.c.get_counts())
+    return fetched
 
-            plot_histogram(result.data.c.get_counts())
-            plt.show()
 
-        except :
-            pass
+def fetch_results(job_ids: list[str], ledger: JobLedger, service = None, max_workers: int = 8) -> dict :
+    """
+    Results of `job_ids`, read from the ledger when they were already downloaded, otherwise
+    downloaded concurrently by `max_workers` threads and saved once in the ledger.
+
+    Parameters
+    ----------
+    job_ids : list[str]
+        IDs of the jobs
+
+    ledger : JobLedger
+        Ledger and cache of the results (see `job_ledger.JobLedger.save_result`)
+
+    service : QiskitRuntimeService, optional
+        Service of the jobs, only created if a result is missing from the cache
+
+    max_workers : int, default=8
+        Maximum number of downloads at the same time
+
+
+    Returns
+    -------
+    dict
+        Counts of each PUB of each finished job {job_id: list[dict]}
+    """
+    results = {}
+    to_fetch = []
+    for job_id in dict.fromkeys(job_ids) :
+        counts = ledger.load_result(job_id)
+        if counts is not None :
+            results[job_id] = counts
+        else :
+            to_fetch.append(job_id)
+
+    print(f"{len(results)} results read from the cache, {len(to_fetch)} to download")
+    if not to_fetch :
+        return results
+
+    if service is None :
+        from qiskit_ibm_runtime import QiskitRuntimeService
+        service = QiskitRuntimeService()
+
+    # The ledger is only written by this thread, the downloads run in the pool
+    with ThreadPoolExecutor(max_workers=max_workers) as pool :
+        futures = {pool.submit(fetch, service, job_id): job_id for job_id in to_fetch}
+        for future in as_completed(futures) :
+            job_id = futures[future]
+            try :
+                fetched = future.result()
+            except Exception as error :
+                print(f"{job_id} : {error!r}")
+                continue
+
+            timestamps = (fetched["metrics"] or {}).get("timestamps")
+            ledger.update(job_id, fetched["status"], timestamps, fetched["error"])
+            if fetched["counts"] is not None :
+                ledger.save_result(job_id, fetched["counts"], fetched["metrics"])
+                results[job_id] = fetched["counts"]
+            print(f"{job_id} : {fetched['status']}")
+
+    return results
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Récupère les résultats des jobs du registre (et des anciens fichiers job_id_list_*.txt).")
+    parser.add_argument("--id_lists", type=str, nargs="*", default=["job_id_list_past.txt", "job_id_list_sherbrooke.txt"], help="Fichiers d'IDs de jobs à importer dans le registre.")
+    parser.add_argument("--backend", type=str, default=None, help="Ne récupère que les jobs de ce backend.")
+    parser.add_argument("--workers", type=int, default=8, help="Nombre de téléchargements simultanés.")
+    parser.add_argument("--plot", action="store_true", help="Affiche l'histogramme de chaque résultat.")
+    args = parser.parse_args()
+
+    ledger = JobLedger()
+    for path in args.id_lists :
+        if os.path.exists(path) :
+            print(f"{ledger.import_id_list(path)} new jobs imported from {path}")
+
+    start = time.perf_counter()
+    results = fetch_results(ledger.job_ids(args.backend), ledger, max_workers=args.workers)
+    print(f"{len(results)} results in {time.perf_counter() - start:.2f} seconds")
+
+    for job_id, counts in results.items() :
+        print(f"\n{job_id} :")
+        for pub_counts in counts :
+            print(pub_counts)
+
+    if args.plot :
+        from qiskit.visualization import plot_histogram
+        import matplotlib.pyplot as plt
 
-        job_id = fichier.readline()[:20]
\ No newline at end of file
+        for job_id, counts in results.items() :
+            for pub_counts in counts :
+                plot_histogram(pub_counts, title=job_id)
+        plt.show()
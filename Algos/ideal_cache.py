@@ -0,0 +1,83 @@
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from exact import execute
+from fingerprint import circuit_fingerprint
+
+
+# Maximum number of distributions kept in memory
+max_memory_entries = 1024
+
+# Above this fraction of non-zero outcomes, a distribution is stored as a dense array
+dense_fraction = 0.25
+
+# Probabilities below this value are numerical noise of the simulation
+min_probability = 1e-12
+
+_memory = OrderedDict()
+
+
+def ideal_distribution(qc, cache_dir="ideal_cache") -> tuple[np.ndarray, np.ndarray] :
+    """
+    Exact output distribution of `qc` without noise, computed once per circuit
+    (see `exact.execute`) and cached in memory and in `cache_dir`.
+
+    The key is the fingerprint of the circuit without Qbit permutation, so reruns,
+    every scenario and later comparisons with new hardware data read the same entry.
+
+    Parameters
+    ----------
+    qc : QuantumCircuit
+        Circuit ending with its measurements
+
+    cache_dir : str, default="ideal_cache"
+        Directory of the npz files, None to only cache in memory
+
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        Outcomes with a non-zero probability (integers of the Clbits, Clbit 0 as least
+        significant bit, sorted) and their probabilities
+    """
+    key = circuit_fingerprint(qc, up_to_permutation=False)
+
+    if key in _memory :
+        _memory.move_to_end(key)
+        return _memory[key]
+
+    path = None if cache_dir is None else os.path.join(cache_dir, key + ".npz")
+    if path is not None and os.path.exists(path) :
+        with np.load(path) as data :
+            if "dense" in data :
+                dense = data["dense"]
+                outcomes = np.flatnonzero(dense > min_probability)
+                distribution = (outcomes, dense[outcomes])
+            else :
+                distribution = (data["outcomes"], data["probabilities"])
+
+    else :
+        probabilities = execute(qc, shots=0)["probabilities"]
+        if probabilities is None :
+            raise ValueError(f"Circuit too wide ({qc.num_clbits} Clbits) for an exact distribution")
+        outcomes = np.flatnonzero(probabilities > min_probability)
+        distribution = (outcomes, probabilities[outcomes])
+
+        if path is not None :
+            os.makedirs(cache_dir, exist_ok=True)
+            if len(outcomes) > dense_fraction * len(probabilities) :
+                np.savez_compressed(path, dense=probabilities)
+            else :
+                np.savez_compressed(path, outcomes=outcomes, probabilities=probabilities[outcomes])
+
+    _memory[key] = distribution
+    while len(_memory) > max_memory_entries :
+        _memory.popitem(last=False)
+    return distribution
+
+
+def clear_memory() :
+    """ Empties the in-memory cache (the npz files are kept) """
+    _memory.clear()
@@ -0,0 +1,72 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+
+# Modules that must not be loaded by a plain import of the Algos modules
+heavy_modules = ["qiskit_aer", "qiskit_ibm_runtime", "matplotlib", "scipy.stats"]
+
+# Run in a fresh interpreter : network access raises, then the module is imported and timed
+child_code = """
+import socket, sys, time
+
+def no_network(*args, **kwargs) :
+    raise RuntimeError("network access during import")
+socket.socket.connect = no_network
+socket.create_connection = no_network
+
+start = time.perf_counter()
+import {module}
+duration = time.perf_counter() - start
+
+heavy = [name for name in {heavy} if name in sys.modules]
+print(duration, ",".join(heavy))
+"""
+
+
+def measure_import(module: str, repetitions: int = 5) -> tuple[list[float], list[str]] :
+    """
+    Imports `module` in `repetitions` fresh interpreters.
+
+    Parameters
+    ----------
+    module : str
+        Name of the module, importable from the Algos directory
+
+    repetitions : int, default=5
+        Number of fresh interpreters
+
+
+    Returns
+    -------
+    tuple[list[float], list[str]]
+        Import durations (s) and heavy modules loaded as a side effect
+    """
+    algos_dir = os.path.dirname(os.path.abspath(__file__))
+    code = child_code.format(module=module, heavy=heavy_modules)
+
+    durations = []
+    heavy = []
+    for _ in range(repetitions) :
+        output = subprocess.run([sys.executable, "-c", code], cwd=algos_dir, capture_output=True, text=True)
+        if output.returncode != 0 :
+            raise RuntimeError(f"Import of {module} failed :\n{output.stderr}")
+
+        fields = output.stdout.split()
+        durations.append(float(fields[0]))
+        heavy = fields[1].split(",") if len(fields) > 1 else []
+
+    return durations, heavy
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mesure le temps d'import des modules de Algos (sans réseau).")
+    parser.add_argument("modules", nargs="*", default=["circuit_store", "fingerprint", "fuzzing", "coverage_fuzzing", "adder", "simulate"], help="Modules à importer.")
+    parser.add_argument("--repetitions", type=int, default=5, help="Nombre d'interpréteurs neufs par module.")
+    args = parser.parse_args()
+
+    for module in args.modules :
+        durations, heavy = measure_import(module, args.repetitions)
+        print(f"{module.ljust(18)} median {1000*statistics.median(durations):8.1f} ms   min {1000*min(durations):8.1f} ms   heavy modules : {heavy or 'none'}")
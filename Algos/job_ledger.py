@@ -0,0 +1,255 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from job_manager import final_status
+
+
+_schema = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id      TEXT PRIMARY KEY,
+    backend     TEXT,
+    shots       INTEGER,
+    submitted   TEXT,
+    status      TEXT,
+    created     TEXT,
+    running     TEXT,
+    finished    TEXT,
+    error       TEXT,
+    result_path TEXT,
+    campaign    TEXT
+);
+CREATE TABLE IF NOT EXISTS pubs (
+    job_id      TEXT REFERENCES jobs(job_id),
+    pub_index   INTEGER,
+    circuit     TEXT,
+    label       TEXT,
+    repetition  INTEGER,
+    PRIMARY KEY (job_id, pub_index)
+);
+CREATE INDEX IF NOT EXISTS jobs_backend_status ON jobs(backend, status);
+CREATE INDEX IF NOT EXISTS pubs_circuit ON pubs(circuit, repetition);
+CREATE INDEX IF NOT EXISTS pubs_label ON pubs(label);
+"""
+
+# Backend of the jobs of each former job_id_list_<name>.txt file (job_id_list_past.txt mixes several backends)
+id_list_backends = {"sherbrooke": "ibm_sherbrooke", "brisbane": "ibm_brisbane"}
+
+
+class JobLedger :
+    """
+    SQLite record of the jobs sent to the calculators : backend, shots, submission time,
+    status, Runtime timestamps and result file of each job, and the circuit (fingerprint,
+    label, repetition) of each of its PUBs.
+
+    Every write is a transaction, so the ledger stays consistent if a campaign is interrupted,
+    and `plan` lets the campaign (identified by the name given at each submission) resume
+    without resubmitting what was already sent.
+    """
+
+    def __init__(self, path="job_ledger.sqlite", results_dir="job_results") :
+        """
+        Parameters
+        ----------
+        path : str, default="job_ledger.sqlite"
+            SQLite database, created if it does not exist
+
+        results_dir : str, default="job_results"
+            Directory of the result files (counts of each PUB of a job, in JSON)
+        """
+        self.path = path
+        self.results_dir = results_dir
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        with self._connection :
+            self._connection.executescript(_schema)
+            # Ledgers created before the campaigns were recorded
+            columns = [row["name"] for row in self._connection.execute("PRAGMA table_info(jobs)")]
+            if "campaign" not in columns :
+                self._connection.execute("ALTER TABLE jobs ADD COLUMN campaign TEXT")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS jobs_campaign ON jobs(campaign)")
+
+
+    def record_submission(self, job_id: str, backend: str, shots: int, pubs: list, campaign: str = None) :
+        """
+        Records a submitted job.
+
+        Parameters
+        ----------
+        pubs : list[tuple[str, str, int]]
+            (circuit fingerprint, label, repetition) of each PUB of the job, in order
+
+        campaign : str, optional
+            Campaign the job belongs to (see `plan`)
+        """
+        with self._lock, self._connection :
+            self._connection.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, backend, shots, submitted, status, campaign) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, backend, shots, datetime.now().isoformat(), "QUEUED", campaign))
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO pubs (job_id, pub_index, circuit, label, repetition) VALUES (?, ?, ?, ?, ?)",
+                [(job_id, k, circuit, label, repetition) for k, (circuit, label, repetition) in enumerate(pubs)])
+
+
+    def update(self, job_id: str, status: str = None, timestamps: dict = None, error: str = None) :
+        """ Updates the status, Runtime timestamps (see `job.metrics()`) or error of a job (recorded if it is not in the ledger yet) """
+        values = {"status": status, "error": error}
+        for key in ("created", "running", "finished") :
+            if timestamps and timestamps.get(key) is not None :
+                values[key] = str(timestamps[key])
+        values = {key: value for key, value in values.items() if value is not None}
+        if not values :
+            return
+        with self._lock, self._connection :
+            self._connection.execute("INSERT OR IGNORE INTO jobs (job_id) VALUES (?)", (job_id,))
+            self._connection.execute(
+                f"UPDATE jobs SET {', '.join(key + ' = ?' for key in values)} WHERE job_id = ?",
+                (*values.values(), job_id))
+
+
+    def save_result(self, job_id: str, counts: list[dict], metrics: dict = None) -> str :
+        """
+        Saves the counts of each PUB of a finished job (and its `job.metrics()`) and records where,
+        returns the path of the file. A job that is not in the ledger yet is recorded.
+        """
+        os.makedirs(self.results_dir, exist_ok=True)
+        path = os.path.join(self.results_dir, job_id + ".json")
+        with open(path, "w") as f :
+            json.dump({"counts": counts, "metrics": metrics}, f, default=str)
+        with self._lock, self._connection :
+            self._connection.execute("INSERT OR IGNORE INTO jobs (job_id) VALUES (?)", (job_id,))
+            self._connection.execute("UPDATE jobs SET result_path = ?, status = 'DONE' WHERE job_id = ?", (path, job_id))
+        return path
+
+
+    def _load(self, job_id: str) -> dict :
+        row = self._connection.execute("SELECT result_path FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None or row["result_path"] is None or not os.path.exists(row["result_path"]) :
+            return None
+        with open(row["result_path"]) as f :
+            return json.load(f)
+
+
+    def load_result(self, job_id: str) -> list[dict] :
+        """ Counts of each PUB of a job saved by `save_result`, None if there is none """
+        saved = self._load(job_id)
+        return None if saved is None else saved["counts"]
+
+
+    def load_metrics(self, job_id: str) -> dict :
+        """ Metrics of a job saved by `save_result`, None if there are none """
+        saved = self._load(job_id)
+        return None if saved is None else saved["metrics"]
+
+
+    def find(self, backend: str = None, label: str = None, circuit: str = None, status: str = None, shots: int = None, campaign: str = None) -> list[dict] :
+        """
+        PUBs matching every given criterion, with their job (e.g. every finished Sherbrooke
+        job of the adder n=2 : `find("ibm_sherbrooke", label="adder n=2", status="DONE")`).
+
+        Returns
+        -------
+        list[dict]
+            One row per PUB : job_id, pub_index, circuit, label, repetition and the columns of its job
+        """
+        criteria = {"jobs.backend": backend, "pubs.label": label, "pubs.circuit": circuit, "jobs.status": status, "jobs.shots": shots, "jobs.campaign": campaign}
+        criteria = {key: value for key, value in criteria.items() if value is not None}
+        where = " AND ".join(key + " = ?" for key in criteria) or "1"
+        rows = self._connection.execute(
+            f"SELECT * FROM pubs JOIN jobs USING (job_id) WHERE {where} ORDER BY jobs.submitted, pubs.pub_index",
+            tuple(criteria.values())).fetchall()
+        return [dict(row) for row in rows]
+
+
+    def pending(self, backend: str = None) -> list[str] :
+        """ Jobs not in a final state yet """
+        query = f"SELECT job_id FROM jobs WHERE (status IS NULL OR status NOT IN ({', '.join('?' * len(final_status))}))"
+        parameters = tuple(final_status)
+        if backend is not None :
+            query += " AND backend = ?"
+            parameters += (backend,)
+        return [row["job_id"] for row in self._connection.execute(query + " ORDER BY submitted", parameters)]
+
+
+    def job_ids(self, backend: str = None) -> list[str] :
+        """
+        Every job recorded, except those that failed or were cancelled. With `backend`,
+        the jobs whose backend is unknown (imported from job_id_list_past.txt) are kept too.
+        """
+        query = "SELECT job_id FROM jobs WHERE (status IS NULL OR status NOT IN ('ERROR', 'CANCELLED'))"
+        parameters = ()
+        if backend is not None :
+            query += " AND (backend = ? OR backend IS NULL)"
+            parameters = (backend,)
+        return [row["job_id"] for row in self._connection.execute(query + " ORDER BY submitted", parameters)]
+
+
+    def plan(self, backend: str, shots: int, pubs: list[tuple[str, int]], campaign: str = None) -> tuple[dict, dict, list] :
+        """
+        Splits the PUBs of a campaign between what is already done, what is still in flight
+        and what remains to submit. Only the jobs of `campaign` are reused : the same circuits
+        measured by another campaign (e.g. another calibration day) are measured again.
+
+        Parameters
+        ----------
+        pubs : list[tuple[str, int]]
+            (circuit fingerprint, repetition) of each PUB of the campaign
+
+        campaign : str, optional
+            Campaign to resume, None for a new campaign (everything is to submit)
+
+
+        Returns
+        -------
+        tuple[dict, dict, list]
+            done     : counts of the finished PUBs {(circuit, repetition): counts}
+            inflight : PUBs of the jobs submitted but not finished {job_id: {pub_index: (circuit, repetition)}}
+            missing  : PUBs to submit (their jobs failed, or were never submitted)
+        """
+        done, inflight = {}, {}
+        if campaign is None :
+            return done, inflight, list(pubs)
+        wanted = set(pubs)
+        results = {}
+
+        for row in self.find(backend, shots=shots, campaign=campaign) :
+            key = (row["circuit"], row["repetition"])
+            if key not in wanted :
+                continue
+            if row["status"] == "DONE" :
+                if row["job_id"] not in results :
+                    results[row["job_id"]] = self.load_result(row["job_id"])
+                if results[row["job_id"]] is not None :
+                    done[key] = results[row["job_id"]][row["pub_index"]]
+                    continue
+            if row["status"] not in final_status or row["status"] == "DONE" :
+                # Still in flight, or finished without a saved result : the job is fetched again
+                inflight.setdefault(row["job_id"], {})[row["pub_index"]] = key
+
+        inflight = {job_id: keys for job_id, keys in inflight.items() if not all(key in done for key in keys.values())}
+        waiting = {key for keys in inflight.values() for key in keys.values()}
+        missing = [key for key in pubs if key not in done and key not in waiting]
+        return done, inflight, missing
+
+
+    def import_id_list(self, path: str, backend: str = None) -> int :
+        """
+        Records the job IDs of a job_id_list_<name>.txt file (20 characters per line), returns the number of new jobs.
+        By default their backend is read from the file name (see `id_list_backends`).
+        """
+        if backend is None :
+            name = os.path.splitext(os.path.basename(path))[0].removeprefix("job_id_list_")
+            backend = id_list_backends.get(name)
+        with open(path) as f :
+            job_ids = [line.strip()[:20] for line in f if line.strip()]
+        with self._lock, self._connection :
+            before = self._connection.total_changes
+            self._connection.executemany("INSERT OR IGNORE INTO jobs (job_id, backend) VALUES (?, ?)", [(job_id, backend) for job_id in job_ids])
+            return self._connection.total_changes - before
+
+
+    def close(self) :
+        self._connection.close()
@@ -0,0 +1,200 @@
+import asyncio
+import time
+import weakref
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from phase_timing import PhaseTimer, aer_phases, runtime_phases
+
+
+# Status of a job that will not change anymore
+final_status = {"DONE", "ERROR", "CANCELLED"}
+
+
+@dataclass
+class JobOutcome :
+    """ A finished job, as delivered by `JobManager` """
+    tag: Any                    # identifier given with the submission
+    backend: str
+    job: Any = None
+    status: str = None          # final status (DONE, ERROR or CANCELLED), None if the submission, the polling or the result download failed
+    result: Any = None          # job.result() when the job is DONE
+    error: str = None
+    measured: float = None      # seconds from the submission to the final state
+    timestamps: dict = None     # metrics()["timestamps"] reported by the service
+    timer: PhaseTimer = field(default=None, repr=False)
+
+
+def status_name(job) -> str :
+    """ Status of a Runtime job (str) or of an Aer job (JobStatus), as a str """
+    status = job.status()
+    return getattr(status, "name", status)
+
+
+class JobManager :
+    """
+    Keeps many jobs in flight and delivers their results as they complete.
+
+    Each job is submitted then polled with an exponential backoff (`poll_interval` up to
+    `max_interval`), without rebuilding it from the service. At most `max_concurrent` jobs
+    are in flight per backend, so long queue waits overlap instead of being serialised.
+    The blocking calls (submission, status, result) run in threads.
+
+    The errors are handled per job : a failed poll is retried with the same backoff, and
+    whatever fails is recorded in the `JobOutcome.error` of its job, so one failing job
+    never loses the outcomes of the others.
+    """
+
+    def __init__(self, max_concurrent=5, poll_interval=0.1, max_interval=30.0, backoff=1.5, on_submit: Callable = None, on_status: Callable = None, max_poll_errors=5) :
+        """
+        Parameters
+        ----------
+        max_concurrent : int, default=5
+            Maximum number of jobs in flight on each backend
+
+        poll_interval : float, default=0.1
+            First delay between two polls of a job, in seconds
+
+        max_interval : float, default=30
+            Maximum delay between two polls
+
+        backoff : float, default=1.5
+            Factor applied to the delay after each poll without change of status
+
+        on_submit : callable, optional
+            Called as on_submit(tag, job) once a job is submitted (e.g. to save its id)
+
+        on_status : callable, optional
+            Called as on_status(tag, status) at each change of status of a job
+
+        max_poll_errors : int, default=5
+            Number of polls of a job failing in a row before giving up on it
+        """
+        self.max_concurrent = max_concurrent
+        self.poll_interval = poll_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.on_submit = on_submit
+        self.on_status = on_status
+        self.max_poll_errors = max_poll_errors
+        self._semaphores = weakref.WeakKeyDictionary()     # event loop -> {backend: semaphore}
+
+
+    def _semaphore(self, backend: str) -> asyncio.Semaphore :
+        """ Semaphore of `backend` in the running event loop (a semaphore cannot be shared between loops) """
+        semaphores = self._semaphores.setdefault(asyncio.get_running_loop(), {})
+        if backend not in semaphores :
+            semaphores[backend] = asyncio.Semaphore(self.max_concurrent)
+        return semaphores[backend]
+
+
+    @staticmethod
+    def _notify(callback: Callable, *args) :
+        """ Calls `callback(*args)` if it is set, an error of the callback does not stop the job """
+        if callback is None :
+            return
+        try :
+            callback(*args)
+        except Exception as error :
+            print(f"{getattr(callback, '__name__', callback)}{args} failed : {error!r}")
+
+
+    async def run_job(self, tag, backend: str, submit: Callable) -> JobOutcome :
+        """
+        Submits a job with `submit()` (e.g. `lambda : sampler.run(pubs)`), waits for its
+        final state and fetches its result.
+        """
+        outcome = JobOutcome(tag, backend, timer=PhaseTimer(backend))
+        timer = outcome.timer
+
+        async with self._semaphore(backend) :
+            try :
+                with timer.phase("submit") :
+                    outcome.job = await asyncio.to_thread(submit)
+            except Exception as error :
+                outcome.error = repr(error)
+                return outcome
+            self._notify(self.on_submit, tag, outcome.job)
+
+            interval = self.poll_interval
+            previous = None
+            errors = 0
+            start = time.perf_counter()
+            with timer.phase("wait") :
+                while True :
+                    try :
+                        status = await asyncio.to_thread(status_name, outcome.job)
+                        errors = 0
+                    except Exception as error :
+                        # Transient error of the service : polled again after the usual delay
+                        errors += 1
+                        if errors >= self.max_poll_errors :
+                            outcome.error = repr(error)
+                            return outcome
+                        status = previous
+                    if status != previous :
+                        self._notify(self.on_status, tag, status)
+                        previous = status
+                        interval = self.poll_interval
+                    if status in final_status :
+                        break
+                    await asyncio.sleep(interval)
+                    interval = min(interval * self.backoff, self.max_interval)
+            outcome.measured = timer.durations["submit"] / 1000 + time.perf_counter() - start
+
+        if status == "DONE" :
+            try :
+                with timer.phase("result") :
+                    outcome.result = await asyncio.to_thread(outcome.job.result)
+            except Exception as error :
+                outcome.error = repr(error)
+                return outcome
+            outcome.status = status
+        else :
+            outcome.status = status
+            error_message = getattr(outcome.job, "error_message", None)
+            outcome.error = error_message() if callable(error_message) else status
+
+        # Split of the waiting between queue and execution, from what the backend reports
+        try :
+            metrics = await asyncio.to_thread(outcome.job.metrics)
+        except Exception :
+            metrics = None
+        if metrics is None and outcome.result is not None and hasattr(outcome.result, "time_taken") :
+            aer_phases(timer, outcome.result)
+        else :
+            outcome.timestamps = runtime_phases(timer, metrics)
+        return outcome
+
+
+    async def as_completed(self, submissions) :
+        """
+        Runs every submission concurrently, yielding the outcomes in their order of completion.
+
+        Parameters
+        ----------
+        submissions : iterable of tuple[Any, str, callable]
+            (tag, backend name, submit function), see `run_job`
+
+
+        Yields
+        ------
+        JobOutcome
+        """
+        tasks = [asyncio.create_task(self.run_job(tag, backend, submit)) for tag, backend, submit in submissions]
+        for task in asyncio.as_completed(tasks) :
+            yield await task
+
+
+    def run_all(self, submissions) -> list[JobOutcome] :
+        """ Synchronous version of `as_completed`, the outcomes (one per submission) are returned in the order of the submissions """
+        submissions = list(submissions)
+
+        async def gather() :
+            return await asyncio.gather(*(self.run_job(tag, backend, submit) for tag, backend, submit in submissions), return_exceptions=True)
+
+        outcomes = asyncio.run(gather())
+        return [
+            JobOutcome(tag, backend, error=repr(outcome), timer=PhaseTimer(backend)) if isinstance(outcome, BaseException) else outcome
+            for (tag, backend, _), outcome in zip(submissions, outcomes)
+        ]
@@ -0,0 +1,84 @@
+from simulator_registry import noise_fingerprint
+
+
+# Clifford gates, simulated exactly in polynomial time by the stabilizer method
+clifford_gates = {
+    "id", "x", "y", "z", "h", "s", "sdg", "sx", "sxdg",
+    "cx", "cy", "cz", "swap", "iswap", "dcx", "ecr",
+    "measure", "reset", "barrier", "delay",
+}
+
+# Errors the stabilizer method can apply (Pauli errors and resets)
+stabilizer_errors = {"id", "x", "y", "z", "pauli", "reset"}
+
+# Above this width, a statevector no longer fits in memory
+max_statevector_qbits = 24
+
+# Up to this width, a noisy circuit is simulated once as a density matrix instead of once per shot
+max_density_matrix_qbits = 10
+
+# Wide circuits with at most this many multi-Qbit gates per Qbit are barely entangled
+low_entanglement_ratio = 1.0
+
+_stabilizer_noise = {}     # noise fingerprint -> result of `stabilizer_noise`
+
+
+def is_clifford(qc) -> bool :
+    """ The circuit only uses Clifford gates (see `clifford_gates`) """
+    return all(instruction.operation.name in clifford_gates for instruction in qc.data)
+
+
+def stabilizer_noise(noise_model) -> bool :
+    """
+    The noise model only has Pauli errors, resets and readout errors, that the stabilizer method supports.
+    Errors given as Kraus or unitary matrices are not. The answer is cached per noise model content.
+    """
+    if noise_model is None or noise_model.is_ideal() :
+        return True
+
+    fingerprint = noise_fingerprint(noise_model)
+    if fingerprint not in _stabilizer_noise :
+        _stabilizer_noise[fingerprint] = all(
+            instruction["name"] in stabilizer_errors
+            for error in noise_model.to_dict(serializable=True)["errors"]
+            for instructions in error.get("instructions", [])
+            for instruction in instructions
+        )
+    return _stabilizer_noise[fingerprint]
+
+
+def select_method(qc, noise_model = None) -> str :
+    """
+    Chooses the Aer simulation method of a circuit from its gates and width :
+        - stabilizer            : Clifford circuit, with a compatible noise model
+        - matrix_product_state  : too wide for a statevector, or wide and barely entangled
+        - density_matrix        : small noisy circuit, simulated once for all the shots
+        - statevector           : otherwise
+
+    Parameters
+    ----------
+    qc : QuantumCircuit
+        Circuit to simulate (before transpilation)
+
+    noise_model : NoiseModel, default=None
+        Noise model of the simulator
+
+
+    Returns
+    -------
+    str
+        Name of the method
+    """
+    noisy = noise_model is not None and not noise_model.is_ideal()
+
+    if is_clifford(qc) and stabilizer_noise(noise_model) :
+        return "stabilizer"
+
+    nb_multi = sum(1 for instruction in qc.data if instruction.operation.num_qubits > 1)
+    if qc.num_qubits > max_statevector_qbits or (qc.num_qubits > max_density_matrix_qbits and nb_multi <= low_entanglement_ratio * qc.num_qubits) :
+        return "matrix_product_state"
+
+    if noisy and qc.num_qubits <= max_density_matrix_qbits :
+        return "density_matrix"
+
+    return "statevector"
@@ -0,0 +1,108 @@
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+
+# Phases of an execution, in order
+phases = ("transpile", "submit", "queue", "execute", "result", "features")
+
+
+class PhaseTimer :
+    """
+    Durations of the phases of one execution (see `phases`), in ms.
+
+    The phases measured on our side use a monotonic clock (`time.perf_counter`). The waiting
+    for the job is then split into queue and execute from what the backend reports
+    (`aer_phases` and `runtime_phases`), since only the backend knows when it started running.
+    """
+
+    def __init__(self, backend: str = None) :
+        self.backend = backend
+        self.durations = {}
+        self.source = "wall"     # origin of the execute phase : "wall", "simulator" or "runtime"
+
+
+    @contextmanager
+    def phase(self, name: str) :
+        """ Times the block as phase `name` (added to the previous duration of the phase) """
+        start = time.perf_counter()
+        try :
+            yield
+        finally :
+            self.durations[name] = self.durations.get(name, 0.0) + 1000 * (time.perf_counter() - start)
+
+
+    def split_wait(self, execute_ms: float, source: str) :
+        """
+        Splits the "wait" phase (from the submission to the end of the job) into
+        queue and execute, `execute_ms` being the execution time reported by the backend.
+        """
+        wait = self.durations.pop("wait", None)
+        if wait is None or execute_ms is None :
+            if wait is not None :
+                self.durations["execute"] = wait
+            return
+        self.durations["execute"] = execute_ms
+        self.durations["queue"] = max(wait - execute_ms, 0.0)
+        self.source = source
+
+
+    def amortized(self, nb: int, execute_ms: float = None) -> "PhaseTimer" :
+        """
+        Share of one of the `nb` circuits of a batch : the durations are divided by `nb`,
+        except the execute phase when the backend reports it per circuit (`execute_ms`).
+        """
+        share = PhaseTimer(self.backend)
+        share.durations = {name: duration / nb for name, duration in self.durations.items()}
+        share.source = self.source
+        if execute_ms is not None :
+            share.durations["execute"] = execute_ms
+        return share
+
+
+    def record(self) -> dict :
+        """ Structured record of the timings, to attach to a feature row """
+        record = {"backend": self.backend, "execute_source": self.source}
+        for name in phases :
+            record[f"{name}_ms"] = self.durations.get(name)
+        record["total_ms"] = sum(self.durations.get(name) or 0.0 for name in phases)
+        return record
+
+
+def aer_phases(timer: PhaseTimer, result) :
+    """
+    Splits the waiting of an Aer job with the time reported by the simulator (`result.time_taken`).
+    What remains is the hand-off to the worker thread and the construction of the Result.
+    """
+    time_taken = getattr(result, "time_taken", None)
+    timer.split_wait(1000 * time_taken if time_taken is not None else None, "simulator")
+
+
+def parse_timestamp(value) -> datetime :
+    """ Timestamp of `job.metrics()` : an ISO str from the service, already a datetime in local mode """
+    if isinstance(value, datetime) :
+        return value
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def runtime_phases(timer: PhaseTimer, metrics: dict) -> dict :
+    """
+    Splits the waiting of a Runtime job with its timestamps (created, running, finished),
+    from `metrics = job.metrics()` : queue is created -> running and execute is running -> finished.
+
+    Returns
+    -------
+    dict
+        The timestamps reported by the service (empty if unavailable)
+    """
+    timestamps = (metrics or {}).get("timestamps") or {}
+
+    if timestamps.get("running") and timestamps.get("finished") :
+        execute_ms = 1000 * (parse_timestamp(timestamps["finished"]) - parse_timestamp(timestamps["running"])).total_seconds()
+        timer.split_wait(execute_ms, "runtime")
+        if timestamps.get("created") :
+            timer.durations["queue"] = 1000 * (parse_timestamp(timestamps["running"]) - parse_timestamp(timestamps["created"])).total_seconds()
+    else :
+        timer.split_wait(None, "wall")
+
+    return timestamps
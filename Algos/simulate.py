@@ -1,19 +1,24 @@
-from qiskit_aer import AerSimulator
-from qiskit.transpiler import generate_preset_pass_manager
-from qiskit_ibm_runtime import SamplerV2 as Sampler, QiskitRuntimeService
-from qiskit.visualization import plot_histogram
-import matplotlib.pyplot as plt
+# qiskit_aer, qiskit_ibm_runtime and matplotlib are imported where they are used, to keep this module fast to import
 
 
 import fuzzing
 import adder
+import fake_runtime
+from transpile_cache import cached_transpile
+from phase_timing import PhaseTimer, parse_timestamp
+from job_manager import JobManager
+from job_ledger import JobLedger
+from fingerprint import circuit_fingerprint
+from exact import execute, active_qubits
+from simulator_registry import backend_noise_model
 import argparse
+import contextlib
 import time
 import datetime
 
 
 
-def simulate(circuit, backend, shots: int, nb_simulations=1) -> tuple[list[dict], list[dict]] :
+def simulate(circuit, backend, shots: int, nb_simulations=1, transpiled=False) -> tuple[list[dict], list[dict]] :
     """
     Simulates the quantum `circuit` on a given backend.
 
@@ -31,55 +36,53 @@ def simulate(circuit, backend, shots: int, nb_simulations=1) -> tuple[list[dict]
     nb_simulations : int
         Number of simulations to run
 
+    transpiled : default=False
+        `circuit` is already an ISA circuit of `backend` (e.g. `adder.isa_circuit`)
+
         
     Returns
     -------
     tuple[list[dict], list[dict]]
         List of counts and durations  
     """
-    pm = generate_preset_pass_manager(backend=backend, optimization_level=0)
-    isa_qc = pm.run(circuit)
+    from qiskit_ibm_runtime import SamplerV2 as Sampler
+    from qiskit.visualization import plot_histogram
+    import matplotlib.pyplot as plt
+
+    isa_qc = circuit if transpiled else cached_transpile(circuit, backend)
     sampler = Sampler(mode=backend)
 
+    # Every simulation is in flight at the same time, see `job_manager.JobManager`
+    manager = JobManager(on_status=lambda n, status : print(f"Simulation {n+1} : {status}"))
+    outcomes = manager.run_all([(n, backend.name, lambda : sampler.run([isa_qc], shots=shots)) for n in range(nb_simulations)])
+
 
     counts_list = []
     duration_list = []
 
-    for n in range(nb_simulations) :
+    for n, outcome in enumerate(outcomes) :
         print(f"\n\nSimulation {n+1}/{nb_simulations} :")
 
-        start = time.perf_counter()
-
-        #-----------------
-        job = sampler.run([isa_qc], shots=shots)
-        
-        # Waiting for the job to finish
-        while not job.in_final_state() :
-            print(job.status())
-            time.sleep(0.1)
-        #-----------------
-
-        end = time.perf_counter() 
-        duration = end - start
+        duration = outcome.measured
         duration_list.append(duration)
 
-        print(job.status())
+        print(outcome.status)
 
         # If the simulation failed
-        if job.status() == 'ERROR' :
-            print(job.error_message())
+        if outcome.status != 'DONE' :
+            print(outcome.error)
             break
         
         # Print counts histogram
         # print(job.result())
-        result = job.result()[0]
-        counts = result.data.c.get_counts()
+        result = outcome.result[0]
+        counts = result.join_data().get_counts()
         counts_list.append(counts)
         print("\nCounts :\n", counts)
         plot_histogram(counts)
         plt.show()
 
-        timestamps = job.metrics()['timestamps']
+        timestamps = outcome.timestamps or {}
         print(f"\nTimestamps :")
         for key in timestamps :
             print(f"\t{key} : {timestamps[key]}")
@@ -95,7 +98,78 @@ def simulate(circuit, backend, shots: int, nb_simulations=1) -> tuple[list[dict]
 
 
 
-def calculate(circuit, service, backend, shots:int, nb_calculations=5) -> tuple[list[dict], list[dict], list[dict]] :
+def simulate_exact(circuit, backend, shots: int, exact_width=5, transpiled=False) -> dict :
+    """
+    Noisy counts of `circuit` on `backend` without a shot-based simulation : the exact noisy
+    distribution is computed with one density-matrix simulation with the NoiseModel of `backend`
+    (readout errors included), then `shots` shots are drawn from it (see `exact.execute`).
+
+    Parameters
+    ----------
+    circuit : QuantumCircuit
+        Circuit to simulate, with at most `exact_width` active Qbits
+
+    backend : BackendV2
+        The real backend whose noise is simulated
+
+    shots : int
+        Number of shots drawn
+
+    exact_width : int, default=5
+        Maximum number of active Qbits of a circuit simulated exactly
+
+    transpiled : default=False
+        `circuit` is already an ISA circuit of `backend` (e.g. `adder.isa_circuit`),
+        otherwise it is transpiled for `backend` first
+
+
+    Returns
+    -------
+    dict
+        See `exact.execute` (state, probabilities, counts, method)
+    """
+    return execute(circuit, backend_noise_model(backend), shots, max_exact_qbits=exact_width, transpiled=transpiled, backend=backend)
+
+
+
+def simulate_parameters(circuit, backend, values, shots: int) -> list[dict] :
+    """
+    Runs a parameterized `circuit` on many parameter sets with a single transpilation and a single job.
+
+    Parameters
+    ----------
+    circuit : QuantumCircuit
+        Circuit with symbolic parameters (see `fuzzing.fuzzing_parametric`)
+
+    backend : BackendV2
+        The simulation (or real) backend
+
+    values : np.ndarray
+        Parameter values of shape (nb_sets, nb_parameters), in the order of `circuit.parameters`
+
+    shots : int
+        Number of shots for each parameter set
+
+
+    Returns
+    -------
+    list[dict]
+        Counts of each parameter set
+    """
+    from qiskit_ibm_runtime import SamplerV2 as Sampler
+
+    isa_qc = cached_transpile(circuit, backend)
+    sampler = Sampler(mode=backend)
+
+    # One PUB holding every parameter set : the circuit is bound and run inside the same job
+    job = sampler.run([(isa_qc, values)], shots=shots)
+    bits = job.result()[0].join_data()
+
+    return [bits.get_counts(loc=i) for i in range(len(values))]
+
+
+
+def calculate(circuit, service, backend, shots:int, nb_calculations=5, transpiled=False, phase_records: list = None, max_concurrent=5, ledger: JobLedger = None, label: str = None) -> tuple[list[dict], list[dict], list[dict]] :
     """
     Simulates the quantum `circuit` on a real backend.
 
@@ -105,7 +179,7 @@ def calculate(circuit, service, backend, shots:int, nb_calculations=5) -> tuple[
         Quantum circuits to run on the calculator
 
     service : QiskitRuntimeService
-        The service to use for the calculation
+        The service to use for the calculation (or a `fake_runtime.FakeRuntimeService`)
 
     backend : BackendV2
         The backend to use for the calculation
@@ -116,15 +190,31 @@ def calculate(circuit, service, backend, shots:int, nb_calculations=5) -> tuple[
     nb_calculations : default=5
         Number of times to run the same calculation
 
+    transpiled : default=False
+        `circuit` is already an ISA circuit of `backend` (e.g. `adder.isa_circuit`)
+
+    phase_records : list, optional
+        If given, the timing record of each calculation (see `phase_timing.PhaseTimer.record`) is appended to it
+
+    max_concurrent : default=5
+        Maximum number of calculations in flight at the same time
+
+    ledger : JobLedger, optional
+        Ledger recording the jobs, `job_ledger.JobLedger()` by default
+
+    label : str, optional
+        Label of the circuit in the ledger (e.g. "adder n=2")
+
 
     Returns
     -------
     tuple[list[dict], list[dict], list[dict]]
         List of counts, measured durations and reported durations
     """
-    pm = generate_preset_pass_manager(backend=backend, optimization_level=0)
-    isa_qc = pm.run(circuit)
-    sampler = Sampler(mode=backend)
+    transpile_timer = PhaseTimer(backend.name)
+    with transpile_timer.phase("transpile") :
+        isa_qc = circuit if transpiled else cached_transpile(circuit, backend)
+    sampler = fake_runtime.sampler(backend)     # FakeSamplerV2 for the backends of a FakeRuntimeService
 
 
     counts_list = []
@@ -132,63 +222,68 @@ def calculate(circuit, service, backend, shots:int, nb_calculations=5) -> tuple[
     reported_duration_list = []
 
     file = open("adder_data/" + datetime.datetime.now().strftime("%Y-%m-%d %H-%M-%S-%f")[:-3] + " - " + backend.name, "w")
+
+    # Record each job in the ledger to access it later
+    ledger = ledger or JobLedger()
+    fingerprint = circuit_fingerprint(isa_qc, up_to_permutation=False)
+    job_ids = {}
+
+    def record_job(n, job) :
+        job_ids[n] = job.job_id()
+        ledger.record_submission(job_ids[n], backend.name, shots, [(fingerprint, label, n)])
+
+    def record_status(n, status) :
+        print(f"Calculation {n+1} : {status}")
+        ledger.update(job_ids[n], status)
+
+    # Every calculation is in flight at the same time (at most `max_concurrent`), their queue waits overlap
+    manager = JobManager(max_concurrent=max_concurrent, on_submit=record_job, on_status=record_status)
+    outcomes = manager.run_all([(n, backend.name, lambda : sampler.run([isa_qc], shots=shots)) for n in range(nb_calculations)])
     
-    for n in range(nb_calculations) :
+    for n, outcome in enumerate(outcomes) :
         print(f"Calculation {n+1}/{nb_calculations} :")
         file.write(f"Calculation {n+1}/{nb_calculations} :\n")
 
-        start = time.perf_counter()
-        #-----------------
-        job = sampler.run([isa_qc], shots=shots)
-        job = service.job(job.job_id())
-
-        # Save the job ID to a file to access it later
-        with open('job_id_list_sherbrooke.txt', 'a') as fichier:
-            fichier.write(job.job_id() + "\n")
-
-        # Waiting for the job to finish
-        while not job.in_final_state() :
-            print(job.status())
-            time.sleep(0.1)
-            job = service.job(job.job_id())
-        #-----------------
-        end = time.perf_counter()
-        measured_duration = end - start
+        # The transpilation is only paid by the first calculation
+        timer = outcome.timer
+        if n == 0 :
+            timer.durations.update(transpile_timer.durations)
+
+        measured_duration = outcome.measured
         measured_duration_list.append(measured_duration)
 
-        job = service.job(job.job_id())
-        print(job.status())
+        print(outcome.status)
+
+        if outcome.job is not None :
+            ledger.update(outcome.job.job_id(), outcome.status, outcome.timestamps, outcome.error)
 
         # If the calculation failed
-        if job.status() == 'ERROR' :
-            print(job.error_message())
+        if outcome.status != 'DONE' :
+            print(outcome.error)
             break
         
 
         # Print counts histogram
         # print(job.result())
-        result = job.result()[0]
-        counts = result.data.meas.get_counts()
+        result = outcome.result[0]
+        counts = result.join_data().get_counts()
         counts_list.append(counts)
+        ledger.save_result(outcome.job.job_id(), [counts])
         print("\nCounts :\n", counts)
         file.write(str(counts))
         # plot_histogram(counts, title="Counts")
         # plt.show()
 
 
-        metrics = job.metrics()
-        # print(f"\nMetrics :")
-        # for key in metrics :
-        #     print(f"\t{key} : {metrics[key]}")
-
-
-        timestamps = metrics['timestamps']
+        timestamps = outcome.timestamps
+        if phase_records is not None :
+            phase_records.append(timer.record())
         print(f"\nTimestamps :")
         for key in timestamps :
             print(f"\t{key} : {timestamps[key]}")
 
 
-        reported_duration = datetime.datetime.fromisoformat(timestamps['finished'].replace("Z", "+00:00")) - datetime.datetime.fromisoformat(timestamps['running'].replace("Z", "+00:00"))
+        reported_duration = parse_timestamp(timestamps['finished']) - parse_timestamp(timestamps['running'])
         reported_duration_list.append(reported_duration.total_seconds())
 
         print(f"\nMeasured duration : {measured_duration} seconds")
@@ -223,6 +318,173 @@ def calculate(circuit, service, backend, shots:int, nb_calculations=5) -> tuple[
 
 
 
+def _execution_mode(backend, mode: str) :
+    """ Batch or Session of `backend` (context managers), the backend itself without mode or for a fake backend """
+    if mode is None or getattr(backend, "_fake_service", None) is not None :
+        return contextlib.nullcontext(backend)
+
+    from qiskit_ibm_runtime import Batch, Session
+    return {"batch": Batch, "session": Session}[mode](backend=backend)
+
+
+
+def calculate_batch(circuits, service, backend, shots: int, nb_calculations=5, transpiled=False, mode="batch", pubs_per_job=100, phase_records: list = None, max_concurrent=5, ledger: JobLedger = None, labels: list[str] = None, campaign: str = None) -> tuple[list[list[dict]], list[float], list[float]] :
+    """
+    Runs every repetition of every circuit of `circuits` on a real backend, packed in a few
+    multi-PUB jobs : one PUB per (circuit, repetition), `pubs_per_job` PUBs per job. The jobs
+    are submitted together in a Batch (or Session), so the queue is paid once per job instead
+    of once per calculation.
+
+    Every job is recorded in `ledger` under `campaign`, so an interrupted campaign resumes when
+    called again with the same `campaign` : the finished calculations are read from the ledger,
+    the jobs still in flight are fetched from the service, and only the rest is submitted.
+
+    Parameters
+    ----------
+    circuits : list[QuantumCircuit]
+        Quantum circuits to run on the calculator
+
+    service : QiskitRuntimeService
+        The service to use for the calculation (or a `fake_runtime.FakeRuntimeService`)
+
+    backend : BackendV2
+        The backend to use for the calculation
+
+    shots : int
+        Number of shots of each calculation
+
+    nb_calculations : default=5
+        Number of times to run each circuit
+
+    transpiled : default=False
+        `circuits` are already ISA circuits of `backend` (e.g. `adder.isa_circuit`)
+
+    mode : default="batch"
+        Execution mode of the jobs : "batch", "session" or None (jobs sent to the backend directly)
+
+    pubs_per_job : default=100
+        Maximum number of PUBs of a job
+
+    phase_records : list, optional
+        If given, the timing record of each calculation is appended to it, in the order of `circuits`
+        then of the repetitions. The durations of a job are shared between its PUBs (see `phase_timing.PhaseTimer.amortized`)
+
+    max_concurrent : default=5
+        Maximum number of jobs in flight at the same time
+
+    ledger : JobLedger, optional
+        Ledger recording the jobs, `job_ledger.JobLedger()` by default
+
+    labels : list[str], optional
+        Label of each circuit in the ledger (e.g. "adder n=2")
+
+    campaign : str, optional
+        Name of the campaign to resume, a new campaign (named after the current date) by default
+
+
+    Returns
+    -------
+    tuple[list[list[dict]], list[float], list[float]]
+        Counts of each circuit and repetition (counts[circuit][repetition]), measured and reported durations of each job
+    """
+    transpile_timer = PhaseTimer(backend.name)
+    with transpile_timer.phase("transpile") :
+        isa_qcs = circuits if transpiled else cached_transpile(circuits, backend)
+
+    # One PUB per (circuit, repetition), identified in the ledger by the fingerprint of the circuit
+    ledger = ledger or JobLedger()
+    labels = labels or [None] * len(isa_qcs)
+    fingerprints = [circuit_fingerprint(qc, up_to_permutation=False) for qc in isa_qcs]
+    pubs = [(i, r) for i in range(len(isa_qcs)) for r in range(nb_calculations)]
+    positions = {}
+    for i, r in pubs :
+        positions.setdefault((fingerprints[i], r), []).append((i, r))
+
+    counts_list = [[None] * nb_calculations for _ in isa_qcs]
+    measured_duration_list = []
+    reported_duration_list = []
+    records = {}
+
+    # Resume : what the campaign already did is read from the ledger, its jobs in flight are fetched again
+    campaign = campaign or f"{backend.name} {datetime.datetime.now().isoformat()}"
+    done, inflight, missing = ledger.plan(backend.name, shots, list(positions), campaign)
+    for key, counts in done.items() :
+        for i, r in positions[key] :
+            counts_list[i][r] = counts
+    if done or inflight :
+        print(f"Resuming campaign {campaign} : {len(done)} calculations read from the ledger (not measured again), {len(inflight)} jobs in flight, {len(missing)} calculations to submit")
+
+    # Each job : its PUBs {pub index: (fingerprint, repetition)} and the job ID if it was already submitted
+    jobs = [(dict(enumerate(missing[k:k + pubs_per_job])), None) for k in range(0, len(missing), pubs_per_job)]
+    jobs += [(keys, job_id) for job_id, keys in inflight.items()]
+    job_ids = {}
+
+    file = open("adder_data/" + datetime.datetime.now().strftime("%Y-%m-%d %H-%M-%S-%f")[:-3] + " - " + backend.name + " - batch", "w")
+
+    def record_job(n, job) :
+        job_ids[n] = job.job_id()
+        keys, job_id = jobs[n]
+        if job_id is None :
+            ledger.record_submission(job_ids[n], backend.name, shots, [(fingerprint, labels[positions[(fingerprint, r)][0][0]], r) for fingerprint, r in keys.values()], campaign)
+
+    def record_status(n, status) :
+        print(f"Job {n+1}/{len(jobs)} : {status}")
+        ledger.update(job_ids[n], status)
+
+    def submit(keys, job_id) :
+        if job_id is not None :
+            return lambda : service.job(job_id)
+        return lambda : sampler.run([isa_qcs[positions[key][0][0]] for key in keys.values()], shots=shots)
+
+    with _execution_mode(backend, mode) as execution_mode :
+        sampler = fake_runtime.sampler(execution_mode)
+        manager = JobManager(max_concurrent=max_concurrent, on_submit=record_job, on_status=record_status)
+        outcomes = manager.run_all([(n, backend.name, submit(keys, job_id)) for n, (keys, job_id) in enumerate(jobs)])
+
+    for n, ((keys, _), outcome) in enumerate(zip(jobs, outcomes)) :
+        print(f"Job {n+1}/{len(jobs)} : {len(keys)} PUBs, {outcome.status}")
+        file.write(f"Job {n+1}/{len(jobs)} : {len(keys)} PUBs\n")
+
+        timer = outcome.timer
+        if n == 0 :
+            timer.durations.update(transpile_timer.durations)
+        measured_duration_list.append(outcome.measured)
+
+        if outcome.job is not None :
+            ledger.update(outcome.job.job_id(), outcome.status, outcome.timestamps, outcome.error)
+
+        if outcome.status != 'DONE' :
+            print(outcome.error)
+            file.write(f"{outcome.error}\n\n")
+            continue
+
+        # Results split back per circuit and repetition
+        job_counts = [pub_result.join_data().get_counts() for pub_result in outcome.result]
+        ledger.save_result(outcome.job.job_id(), job_counts)
+        for pub_index, key in keys.items() :
+            for i, r in positions[key] :
+                counts_list[i][r] = job_counts[pub_index]
+                records[(i, r)] = timer.amortized(len(job_counts)).record()
+                file.write(f"Circuit {i+1}, calculation {r+1} : {counts_list[i][r]}\n")
+
+        timestamps = outcome.timestamps
+        reported_duration = (parse_timestamp(timestamps['finished']) - parse_timestamp(timestamps['running'])).total_seconds()
+        reported_duration_list.append(reported_duration)
+
+        print(f"Measured duration : {outcome.measured} seconds")
+        file.write(f"\nMeasured duration : {outcome.measured} seconds\n")
+
+        print(f"Reported duration : {reported_duration} seconds\n")
+        file.write(f"Reported duration : {reported_duration} seconds\n\n\n")
+
+    file.close()
+
+    if phase_records is not None :
+        phase_records.extend(records[key] for key in pubs if key in records)
+    return counts_list, measured_duration_list, reported_duration_list
+
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Simulate quantum circuits with optional parameters.")
     parser.add_argument("--nb_circuits", type=int, default=1, help="Nombre de circuits à générer.")
@@ -232,26 +494,60 @@ if __name__ == "__main__":
     parser.add_argument("--backend", type=str, default="ibm_brisbane", help="Nom du backend (ibm_brisbane ou ibm_sherbrooke).")
     parser.add_argument("--calculate", action="store_true", help="Envoie la requête sur le calculateur.")
     parser.add_argument("--adder", action="store_true", help="Use an adder instead of fuzzing.")
+    parser.add_argument("--nb_parameter_sets", type=int, default=0, help="Circuits avec paramètres, exécutés sur ce nombre de jeux de paramètres.")
+    parser.add_argument("--batch", action="store_true", help="Avec --calculate, regroupe toutes les répétitions de tous les circuits dans quelques jobs multi-PUB.")
+    parser.add_argument("--campaign", type=str, default=None, help="Avec --batch, nom de la campagne à reprendre (une nouvelle campagne par défaut).")
+    parser.add_argument("--fake_queue_delay", type=float, default=None, help="Utilise le service Runtime simulé hors ligne (fake_runtime), avec ce délai de file d'attente en secondes.")
+    parser.add_argument("--exact_width", type=int, default=0, help="Calcule aussi la distribution bruitée exacte des circuits d'au plus ce nombre de qubits actifs (0 pour désactiver).")
     args = parser.parse_args()
 
 
+    from qiskit_aer import AerSimulator
+    from qiskit_ibm_runtime import QiskitRuntimeService
+
     My_Key = "" # Put your token between the quotes
 
  
     # Load simulator on backend
-    service = QiskitRuntimeService(channel='ibm_quantum', token=TOKEN)
+    if args.fake_queue_delay is not None :
+        service = fake_runtime.FakeRuntimeService(queue_delay=args.fake_queue_delay)
+    else :
+        service = QiskitRuntimeService(channel='ibm_quantum', token=My_Key)
     real_backend = service.backend(args.backend)
     simu_backend = AerSimulator.from_backend(real_backend)
 
-    if args.adder :
-        circuits = [(adder.create(args.nb_qbits), "")]
+    if args.nb_parameter_sets :
+        for _ in range(args.nb_circuits) :
+            circuit, params = fuzzing.fuzzing_parametric(args.nb_qbits, args.nb_gates, random_init=True)
+            values = fuzzing.random_parameter_values(None, args.nb_parameter_sets, len(params))
+            counts_list = simulate_parameters(circuit, simu_backend, values, args.shots)
+            print(f"{len(counts_list)} parameter sets simulated for {len(params)} parameters")
+        circuits = []
+
+    elif args.adder :
+        # Transpiled once per (width, backend, calibration), then read from isa_cache/
+        circuits = [(adder.isa_circuit(args.nb_qbits, real_backend), "")]
         
     else :
-        circuits = fuzzing.fuzzing(args.nb_circuits, args.nb_qbits, args.nb_gates, save=False, verbose=False, random_init=True)
+        circuits = fuzzing.fuzzing_stream(args.nb_circuits, args.nb_qbits, args.nb_gates, save=False, verbose=False, random_init=True)
     
 
+    batch = []
+    label = f"adder n={args.nb_qbits}" if args.adder else None
+
     for circuit, _ in circuits :
-        #simulate(circuit, simu_backend, args.shots)
+        #simulate(circuit, simu_backend, args.shots, transpiled=args.adder)
+
+        # Small circuits, on request : one density-matrix simulation instead of args.shots trajectories
+        if args.exact_width and len(active_qubits(circuit)) <= args.exact_width :
+            counts = simulate_exact(circuit, real_backend, args.shots, args.exact_width, transpiled=args.adder)["counts"]
+            print("\nExact noisy counts :\n", counts)
+
+        if args.calculate and args.batch :
+            batch.append(circuit)
+        elif args.calculate :
+            calculate(circuit, service, real_backend, args.shots, transpiled=args.adder, label=label)
 
-        if args.calculate :
-            calculate(circuit, service, real_backend, args.shots)
\ No newline at end of file
+    # Every repetition of every circuit in a few jobs (an interrupted campaign resumes from the ledger)
+    if batch :
+        calculate_batch(batch, service, real_backend, args.shots, transpiled=args.adder, labels=[label] * len(batch), campaign=args.campaign)
\ No newline at end of file
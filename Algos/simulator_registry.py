@@ -0,0 +1,98 @@
+import hashlib
+import json
+import weakref
+from collections import OrderedDict
+
+from transpile_cache import target_fingerprint
+
+
+# Maximum number of simulators kept alive
+max_simulators = 16
+
+_simulators = OrderedDict()
+_fingerprints = {}     # id(noise_model) -> (weak reference, fingerprint)
+_backend_noise_models = {}     # target fingerprint -> NoiseModel of the backend
+
+
+def noise_fingerprint(noise_model) -> str :
+    """
+    SHA-256 of the errors of `noise_model.to_dict()`, "ideal" for None.
+
+    Serialising a large NoiseModel takes about a second, so the fingerprint is computed
+    once per NoiseModel object (the object must not be modified afterwards).
+    """
+    if noise_model is None :
+        return "ideal"
+
+    entry = _fingerprints.get(id(noise_model))
+    if entry is not None and entry[0]() is noise_model :
+        return entry[1]
+
+    # Each error has a random id, different for two NoiseModel built from the same backend
+    errors = [{k: v for k, v in error.items() if k != "id"} for error in noise_model.to_dict(serializable=True)["errors"]]
+    description = json.dumps({"basis_gates": sorted(noise_model.basis_gates), "errors": errors}, sort_keys=True, default=str)
+    fingerprint = hashlib.sha256(description.encode()).hexdigest()
+
+    key = id(noise_model)
+    _fingerprints[key] = (weakref.ref(noise_model, lambda _ : _fingerprints.pop(key, None)), fingerprint)
+    return fingerprint
+
+
+def backend_noise_model(backend) :
+    """ `NoiseModel.from_backend(backend)`, built once per backend calibration (see `transpile_cache.target_fingerprint`) """
+    key = target_fingerprint(backend)
+    if key not in _backend_noise_models :
+        from qiskit_aer.noise import NoiseModel
+
+        _backend_noise_models[key] = NoiseModel.from_backend(backend)
+    return _backend_noise_models[key]
+
+
+def get_simulator(method: str = "automatic", noise_model = None, **options) :
+    """
+    Returns a configured AerSimulator, shared by every caller asking for the same
+    (method, noise model, options), so loops over circuits only set it up once per scenario.
+
+    Two NoiseModel objects with the same content share the same simulator. The simulators
+    are kept in a LRU of `max_simulators` entries.
+
+    Parameters
+    ----------
+    method : str, default="automatic"
+        Simulation method of the AerSimulator
+
+    noise_model : NoiseModel, default=None
+        Noise model, None for an ideal simulator
+
+    **options :
+        Other options of the AerSimulator (e.g. device, max_parallel_threads)
+
+
+    Returns
+    -------
+    AerSimulator
+        The shared simulator, its options must not be changed (use other `options` instead)
+    """
+    key = (method, noise_fingerprint(noise_model), repr(sorted(options.items())))
+
+    simulator = _simulators.get(key)
+    if simulator is None :
+        from qiskit_aer import AerSimulator
+
+        if noise_model is not None :
+            options["noise_model"] = noise_model
+        simulator = AerSimulator(method=method, **options)
+        _simulators[key] = simulator
+
+    _simulators.move_to_end(key)
+    while len(_simulators) > max_simulators :
+        _simulators.popitem(last=False)
+
+    return simulator
+
+
+def clear() :
+    """ Forgets every simulator, noise fingerprint and backend noise model """
+    _simulators.clear()
+    _fingerprints.clear()
+    _backend_noise_models.clear()
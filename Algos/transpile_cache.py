@@ -0,0 +1,181 @@
+import contextlib
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+
+import qiskit
+from qiskit import QuantumCircuit, qpy, transpile
+from qiskit.circuit import Gate, Instruction
+from qiskit.circuit.library import get_standard_gate_name_mapping
+
+from fingerprint import circuit_fingerprint
+
+
+# Maximum number of transpiled circuits kept in memory
+max_memory_entries = 256
+
+_memory = OrderedDict()
+
+
+def target_fingerprint(backend) -> str :
+    """
+    Identifies what a transpilation for `backend` depends on : its name and its calibration,
+    i.e. its last update date when the backend reports one, otherwise a hash of the
+    error and duration of every instruction of its target.
+    """
+    properties = backend.properties() if hasattr(backend, "properties") else None
+    date = getattr(properties, "last_update_date", None)
+    if date is not None :
+        return f"{backend.name}-{date.strftime('%Y%m%d-%H%M%S')}"
+
+    target = getattr(backend, "target", None)
+    if target is None :
+        return f"{backend.name}-none"
+
+    description = []
+    for name, qargs_properties in sorted(target.items(), key=lambda item : item[0]) :
+        for qargs, props in sorted((qargs_properties or {}).items(), key=lambda item : str(item[0])) :
+            description.append((name, qargs, getattr(props, "error", None), getattr(props, "duration", None)))
+    return f"{backend.name}-{hashlib.sha256(repr(description).encode()).hexdigest()[:16]}"
+
+
+def _definitions_key(qc: QuantumCircuit) -> str :
+    """
+    Describes the operations of `qc` that are not standard gates, which are only told apart
+    by their name and params in `circuit_fingerprint` : their class, and the content of
+    their definition for the custom gates (e.g. `QuantumCircuit.to_gate`).
+    """
+    standard = get_standard_gate_name_mapping()
+    described = {}
+    for instruction in qc.data :
+        operation = instruction.operation
+        if operation.name in standard and type(operation) is type(standard[operation.name]) :
+            continue
+        cls = type(operation)
+        key = f"{cls.__module__}.{cls.__qualname__}"
+        custom = cls in (Gate, Instruction) or not cls.__module__.startswith("qiskit.")
+        if custom and operation.definition is not None :
+            key += ":" + circuit_fingerprint(operation.definition, up_to_permutation=False, barriers=True) + _definitions_key(operation.definition)
+        described[(operation.name, key)] = None
+    return repr(sorted(described))
+
+
+def transpile_key(qc: QuantumCircuit, target: str, optimization_level=0, seed=None) -> str :
+    """
+    Key of the cache : (circuit hash, `target` fingerprint, optimization level, seed, Qiskit version).
+
+    The circuit hash also covers the barriers, the registers, the global phase and the
+    definition of the non-standard gates, which change the output of the transpilation
+    but not `circuit_fingerprint`.
+    """
+    registers = [(register.name, register.size) for register in qc.qregs + qc.cregs]
+    description = (f"{circuit_fingerprint(qc, up_to_permutation=False, barriers=True)};{_definitions_key(qc)};{registers};{qc.global_phase};"
+                   f"{target};{optimization_level};{seed};{qiskit.__version__}")
+    return hashlib.sha256(description.encode()).hexdigest()
+
+
+def cached_transpile(circuits, backend, optimization_level=0, seed=None, cache_dir="transpile_cache") :
+    """
+    Same as `transpile(circuits, backend, optimization_level, seed_transpiler=seed)`,
+    but each circuit is only transpiled once per target.
+
+    The results are kept in memory (LRU of `max_memory_entries` circuits) and as QPY files
+    in `cache_dir`, so reruns and repeated scenarios skip the transpilation entirely.
+
+    Parameters
+    ----------
+    circuits : QuantumCircuit or list[QuantumCircuit]
+        Circuit(s) to transpile
+
+    backend : BackendV2
+        Target backend (or simulator)
+
+    optimization_level : int, default=0
+        Optimization level of the transpilation
+
+    seed : int, default=None
+        Seed of the transpiler
+
+    cache_dir : str, default="transpile_cache"
+        Directory of the QPY files, None to only cache in memory
+
+
+    Returns
+    -------
+    QuantumCircuit or list[QuantumCircuit]
+        The transpiled circuit(s), copies that the caller is free to modify
+    """
+    single = isinstance(circuits, QuantumCircuit)
+    circuits = [circuits] if single else list(circuits)
+    target = target_fingerprint(backend)
+    keys = [transpile_key(qc, target, optimization_level, seed) for qc in circuits]
+
+    found = {}
+    missing = {}
+    for qc, key in zip(circuits, keys) :
+        if key in found :
+            continue
+        if key in _memory :
+            _memory.move_to_end(key)
+            found[key] = _memory[key]
+        elif (tq := _load(key, cache_dir)) is not None :
+            found[key] = tq
+        else :
+            missing.setdefault(key, qc)
+
+    # Every missing circuit is transpiled in a single call
+    if missing :
+        transpiled = transpile(list(missing.values()), backend, optimization_level=optimization_level, seed_transpiler=seed)
+        for key, tq in zip(missing, transpiled) :
+            found[key] = tq
+            _remember(key, tq)
+            if cache_dir is not None :
+                _save(key, tq, cache_dir)
+
+    outputs = []
+    for qc, key in zip(circuits, keys) :
+        tq = found[key].copy()
+        tq.name = qc.name
+        tq.metadata = dict(qc.metadata or {})
+        outputs.append(tq)
+
+    return outputs[0] if single else outputs
+
+
+def _remember(key: str, tq: QuantumCircuit) :
+    _memory[key] = tq
+    _memory.move_to_end(key)
+    while len(_memory) > max_memory_entries :
+        _memory.popitem(last=False)
+
+
+def _save(key: str, tq: QuantumCircuit, cache_dir: str) :
+    """ Writes the QPY file of `key` through a temporary file, so an interrupted run never leaves a truncated file """
+    os.makedirs(cache_dir, exist_ok=True)
+    with tempfile.NamedTemporaryFile("wb", dir=cache_dir, suffix=".tmp", delete=False) as f :
+        qpy.dump(tq, f)
+    os.replace(f.name, os.path.join(cache_dir, key + ".qpy"))
+
+
+def _load(key: str, cache_dir) :
+    """ Loads the QPY file of `key` in memory, None if it does not exist or cannot be read (the file is then removed) """
+    if cache_dir is None :
+        return None
+    path = os.path.join(cache_dir, key + ".qpy")
+    if not os.path.exists(path) :
+        return None
+    try :
+        with open(path, "rb") as f :
+            tq = qpy.load(f)[0]
+    except Exception :
+        with contextlib.suppress(OSError) :
+            os.remove(path)
+        return None
+    _remember(key, tq)
+    return tq
+
+
+def clear_memory() :
+    """ Empties the in-memory cache (the QPY files are kept) """
+    _memory.clear()
@@ -12,7 +12,7 @@ Pipeline unique pour extraire toutes les features d'un circuit quantique :
 import os
 import pickle
 import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
 import numpy as np
 import pandas as pd
@@ -20,20 +20,24 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 
 from qiskit import QuantumCircuit, transpile
-from qiskit_aer import AerSimulator
 from qiskit_aer.noise import NoiseModel
 from qiskit_ibm_runtime import QiskitRuntimeService
 
 from static_features import static_metrics
-from execution_features import run_timing
+from execution_features import run_timing, run_timing_batch
 from count_features import *
-# from hardware_features import get_backend_error_metrics
+from calibration import get_snapshot, layout_features
 
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../Algos')))
-from fuzzing import fuzzing
+from fuzzing import fuzzing_stream, chunked
+from fingerprint import deduplicate
 from tokens import get_token_for
 from simulate import calculate 
+from simulator_registry import get_simulator
+from method_selection import select_method
+from ideal_cache import ideal_distribution
+from transpile_cache import cached_transpile
 
 def list_physical_backends(token: str, min_qubits: int = 5) -> list:
     """
@@ -68,7 +72,7 @@ def get_noise_model(backend_name: str, token: str, cache_dir: str = "noise_model
 def extract_features(
     qc: QuantumCircuit,
     shots: int = 1024,
-    noise_model: Optional[NoiseModel] = get_noise_model('ibm_sherbrooke', get_token_for('Baptiste')),
+    noise_model: Optional[NoiseModel] = None,
     ideal_counts: Optional[Dict[str, int]] = None,
     backend_name: Optional[str] = None,
     token: Optional[str] =None) -> Dict[str, Any]:
@@ -77,23 +81,61 @@ def extract_features(
     """
     features: Dict[str, Any] = {}
 
-    # Static features
-    features.update(static_metrics(qc))
-
     # Temporal and Count-based features
-    sim = AerSimulator(noise_model=noise_model) if noise_model else AerSimulator()
-    tq = transpile(qc, sim, optimization_level=0)
-    timing, counts = run_timing(tq, sim, shots=shots)
+    # Méthode de simulation choisie selon le circuit (stabilizer, matrix_product_state, ...)
+    method = select_method(qc, noise_model)
+    sim = get_simulator(method, noise_model)
+    timing, counts = run_timing(qc, sim, shots=shots)
+    timer = timing.pop('phases')
     features.update(timing)
+    features['method'] = method
 
-    # Update features
-    features['counts'] = counts
-    features['entropy_shannon'] = shannon_entropy(counts)
-    features['emd_uniform'] = emd_uniform(counts)
+    # Static features and update features
+    with timer.phase('features'):
+        features.update(static_metrics(qc))
+        features['counts'] = counts
+        features['entropy_shannon'] = shannon_entropy(counts)
+        features['emd_uniform'] = emd_uniform(counts)
 
+    # Durées de chaque phase (transpile, submit, queue, execute, result, features)
+    features['timing'] = timer.record()
     return features
 
 
+def extract_features_batch(
+    circuits: List[QuantumCircuit],
+    shots: int = 1024,
+    noise_model: Optional[NoiseModel] = None) -> List[Dict[str, Any]]:
+    """
+    Version groupée de extract_features : les circuits sont simulés en un seul job
+    (voir run_timing_batch), puis un dictionnaire de features est construit par circuit.
+    Les circuits sont regroupés par méthode de simulation (voir select_method) : un job par méthode.
+    """
+    methods = [select_method(qc, noise_model) for qc in circuits]
+    outputs = [None] * len(circuits)
+    for method in dict.fromkeys(methods):
+        indices = [i for i, m in enumerate(methods) if m == method]
+        sim = get_simulator(method, noise_model)
+        for i, output in zip(indices, run_timing_batch([circuits[i] for i in indices], sim, shots=shots)):
+            outputs[i] = output
+
+    all_features = []
+    for qc, method, (timing, counts) in zip(circuits, methods, outputs):
+        features: Dict[str, Any] = {}
+        timer = timing.pop('phases')
+        features.update(timing)
+        features['method'] = method
+        with timer.phase('features'):
+            features.update(static_metrics(qc))
+            features['counts'] = counts
+            features['entropy_shannon'] = shannon_entropy(counts)
+            features['emd_uniform'] = emd_uniform(counts)
+        features['timing'] = timer.record()
+        all_features.append(features)
+
+    return all_features
+
+
 def plot_features_scatter(data, x, y, label_key):
     """
     Trace un scatter plot de deux features, coloré par scénario.
@@ -175,44 +217,65 @@ if __name__ == '__main__':
     noise_model_brisbane = NoiseModel.from_backend(backend2)
 
 
-    # Générer des circuits
-    circuits = fuzzing(25, 4, 10)
+    # Générer les circuits au fil de l'eau : chaque circuit passe par tous les scénarios
+    # avant que le suivant ne soit construit (mémoire constante).
+    # Les circuits identiques (à permutation des qubits près) ne sont traités qu'une fois :
+    # pas de simulation ni de temps QPU payés deux fois.
+    scenarios = [('ideal', None), ('noisy_sherbrooke', noise_model_sherbrooke), ('noisy_brisbane', noise_model_brisbane), ('calculator_sherbrooke', backend1), ('calculator_brisbane', backend2)]
+
     # Extraire les features
+    # Les circuits sont traités par lots : un seul job de simulation par lot et par scénario
     all_features = []
     sim_counts = []
-    for scenario, nm in [('ideal', None), ('noisy_sherbrooke', noise_model_sherbrooke), ('noisy_brisbane', noise_model_brisbane), ('calculator_sherbrooke', backend1), ('calculator_brisbane', backend2)]:
-        for qc, _ in circuits:
-            print(f"Traitement du circuit {qc.name} avec le scénario {scenario}")
+    for chunk in chunked(deduplicate(fuzzing_stream(25, 4, 10), verbose=True), 25):
+        circuits = [qc for qc, _ in chunk]
+
+        # Distribution idéale exacte de chaque circuit, calculée une fois (et en cache sur disque)
+        # puis partagée par tous les scénarios pour les métriques de comparaison
+        ideals = [ideal_distribution(qc) for qc in circuits]
+
+        for scenario, nm in scenarios:
+            print(f"Traitement de {len(circuits)} circuits avec le scénario {scenario}")
 
             if (scenario == 'calculator_sherbrooke') or (scenario == 'calculator_brisbane'):
-                # Exécuter le circuit sur le backend
-                counts_list, measured_durations_list, reported_durations_list = calculate(qc, service, nm, shots=2**10, nb_calculations=1)
-                counts = counts_list[0]
-                measured_duration = measured_durations_list[0]
-                reported_duration = reported_durations_list[0]
-
-                feats: Dict[str, Any] = {}
-
-                # Static features
-                feats.update(static_metrics(qc))
-                feats["time_real_ms"] = measured_duration * 1000
-                feats["time_sim_ms"] = reported_duration * 1000
-                feats['counts'] = counts
-                feats['entropy_shannon'] = shannon_entropy(counts)
-                feats['emd_uniform'] = emd_uniform(counts)
+                feats_list = []
+                snapshot = get_snapshot(nm)
+                for qc in circuits:
+                    # Exécuter le circuit sur le backend
+                    phase_records = []
+                    counts_list, measured_durations_list, reported_durations_list = calculate(qc, service, nm, shots=2**10, nb_calculations=1, phase_records=phase_records)
+                    counts = counts_list[0]
+                    measured_duration = measured_durations_list[0]
+                    reported_duration = reported_durations_list[0]
+
+                    feats: Dict[str, Any] = {}
+
+                    # Static features
+                    start = time.perf_counter()
+                    feats.update(static_metrics(qc))
+                    feats["time_real_ms"] = measured_duration * 1000
+                    feats["time_sim_ms"] = reported_duration * 1000
+                    feats['counts'] = counts
+                    feats['entropy_shannon'] = shannon_entropy(counts)
+                    feats['emd_uniform'] = emd_uniform(counts)
+
+                    # Erreurs des qubits et arêtes utilisés par le circuit transpilé (déjà en cache)
+                    feats.update(layout_features(snapshot, cached_transpile(qc, nm)))
+
+                    # Durées de chaque phase, la queue et l'exécution viennent des timestamps du job
+                    feats['timing'] = phase_records[0]
+                    feats['timing']['features_ms'] = (time.perf_counter() - start) * 1000
+                    feats['timing']['total_ms'] += feats['timing']['features_ms']
+                    feats_list.append(feats)
 
             else :
-                feats = extract_features(
-                    qc,
-                    shots=256,
-                    noise_model=nm,
-                    ideal_counts=None,
-                    backend_name=_,
-                    token=token
-                )
-
-            feats['scenario'] = scenario
-            all_features.append(feats)
+                feats_list = extract_features_batch(circuits, shots=256, noise_model=nm)
+
+            for feats, ideal in zip(feats_list, ideals):
+                feats['classical_fidelity'] = classical_fidelity_ideal(feats['counts'], ideal)
+                feats['emd_ideal'] = emd_ideal(feats['counts'], ideal)
+                feats['scenario'] = scenario
+                all_features.append(feats)
 
     
 
@@ -3,7 +3,6 @@ from matplotlib import pyplot as plt
 from qiskit_ibm_runtime import QiskitRuntimeService
 from qiskit_aer.noise import NoiseModel
 from qiskit import QuantumCircuit, transpile,QuantumRegister, ClassicalRegister
-from qiskit_aer import AerSimulator
 import pickle
 import os
 from tokens import get_token_for
@@ -11,6 +10,9 @@ from datetime import datetime
 from typing import Any, Dict, List
 import numpy as np
 from qiskit.quantum_info import state_fidelity
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../Algos')))
+from simulator_registry import get_simulator
 try:
     from qiskit.circuit.library.arithmetic import QFTAdder
 except ImportError:
@@ -85,8 +87,8 @@ def analyze_noise_on_adder(
     """
     Exécute qc en idéal et bruité, retourne counts et stats.
     """
-    sim_ideal = AerSimulator()
-    sim_noisy = AerSimulator(noise_model=noise_model)
+    sim_ideal = get_simulator()
+    sim_noisy = get_simulator(noise_model=noise_model)
 
     # Transpile une seule fois
     tq_ideal = transpile(qc, sim_ideal, optimization_level=0)
@@ -0,0 +1,212 @@
+# calibration.py
+
+"""
+Instantané de la calibration d'un QPU IBM sous forme de tableaux NumPy :
+ - par qubit : T1, T2, erreur et durée de mesure
+ - par porte et par qubit (ou par arête pour les portes à 2 qubits) : erreur et durée
+L'instantané est sauvegardé (npz) avec sa date de calibration et sa date de lecture, et relu au lieu de réinterroger le backend.
+"""
+
+import glob
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+import numpy as np
+from qiskit import QuantumCircuit
+
+
+# Conversion des unités des propriétés du backend en secondes
+_units = {"s": 1.0, "ms": 1e-3, "us": 1e-6, "µs": 1e-6, "ns": 1e-9}
+
+# Instantanés déjà chargés, par nom de backend
+_snapshots: Dict[str, "CalibrationSnapshot"] = {}
+
+
+@dataclass
+class CalibrationSnapshot:
+    """
+    Calibration d'un QPU à une date donnée. Les grandeurs inconnues valent NaN, les durées sont en secondes.
+    """
+    backend_name: str
+    last_update_date: str                   # date de la calibration (ISO)
+    t1: np.ndarray                          # (nb_qubits,)
+    t2: np.ndarray                          # (nb_qubits,)
+    readout_error: np.ndarray               # (nb_qubits,)
+    readout_length: np.ndarray              # (nb_qubits,)
+    gate_qubits: Dict[str, np.ndarray]      # porte -> (nb, arité) qubits de chaque entrée (arêtes pour 2 qubits)
+    gate_error: Dict[str, np.ndarray]       # porte -> (nb,)
+    gate_length: Dict[str, np.ndarray]      # porte -> (nb,)
+    fetched: Optional[str] = None           # date de la dernière lecture des propriétés du backend (ISO)
+    _tables: Dict[str, np.ndarray] = field(default_factory=dict, repr=False)
+
+    @property
+    def num_qubits(self) -> int:
+        return len(self.t1)
+
+    @classmethod
+    def from_backend(cls, backend) -> "CalibrationSnapshot":
+        """
+        Construit l'instantané à partir de backend.properties() (un seul parcours des propriétés).
+        """
+        props = backend.properties()
+        nb_qubits = len(props.qubits)
+        values = {name: np.full(nb_qubits, np.nan) for name in ("T1", "T2", "readout_error", "readout_length")}
+
+        for qubit, parameters in enumerate(props.qubits):
+            for param in parameters:
+                if param.name in values:
+                    values[param.name][qubit] = param.value * _units.get(param.unit, 1.0)
+
+        qubits: Dict[str, list] = {}
+        errors: Dict[str, list] = {}
+        lengths: Dict[str, list] = {}
+        for gate in props.gates:
+            entry = {param.name: param.value * _units.get(param.unit, 1.0) for param in gate.parameters}
+            qubits.setdefault(gate.gate, []).append(gate.qubits)
+            errors.setdefault(gate.gate, []).append(entry.get("gate_error", np.nan))
+            lengths.setdefault(gate.gate, []).append(entry.get("gate_length", np.nan))
+
+        return cls(
+            backend_name=backend.name,
+            last_update_date=props.last_update_date.isoformat(),
+            t1=values["T1"],
+            t2=values["T2"],
+            readout_error=values["readout_error"],
+            readout_length=values["readout_length"],
+            gate_qubits={name: np.array(q, dtype=np.int64) for name, q in qubits.items()},
+            gate_error={name: np.array(e, dtype=float) for name, e in errors.items()},
+            gate_length={name: np.array(l, dtype=float) for name, l in lengths.items()},
+            fetched=datetime.now(timezone.utc).isoformat(),
+        )
+
+    def save(self, cache_dir: str = "calibrations") -> str:
+        """
+        Sauvegarde l'instantané dans cache_dir, un fichier par backend et par date de calibration.
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        date = datetime.fromisoformat(self.last_update_date).astimezone(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        path = os.path.join(cache_dir, f"{self.backend_name}_{date}.npz")
+
+        arrays = {
+            "backend_name": np.array(self.backend_name),
+            "last_update_date": np.array(self.last_update_date),
+            "fetched": np.array(self.fetched or self.last_update_date),
+            "t1": self.t1, "t2": self.t2,
+            "readout_error": self.readout_error, "readout_length": self.readout_length,
+        }
+        for name in self.gate_qubits:
+            arrays[f"{name}__qubits"] = self.gate_qubits[name]
+            arrays[f"{name}__error"] = self.gate_error[name]
+            arrays[f"{name}__length"] = self.gate_length[name]
+        np.savez_compressed(path, **arrays)
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> "CalibrationSnapshot":
+        with np.load(path) as data:
+            names = [key[:-len("__qubits")] for key in data.files if key.endswith("__qubits")]
+            return cls(
+                backend_name=str(data["backend_name"]),
+                last_update_date=str(data["last_update_date"]),
+                t1=data["t1"], t2=data["t2"],
+                readout_error=data["readout_error"], readout_length=data["readout_length"],
+                gate_qubits={name: data[f"{name}__qubits"] for name in names},
+                gate_error={name: data[f"{name}__error"] for name in names},
+                gate_length={name: data[f"{name}__length"] for name in names},
+                fetched=str(data["fetched"]) if "fetched" in data.files else None,
+            )
+
+    def error_table(self, gate: str) -> np.ndarray:
+        """
+        Table dense des erreurs de la porte, indexée par les qubits : (nb_qubits,) pour une porte
+        à 1 qubit, (nb_qubits, nb_qubits) pour une porte à 2 qubits (NaN hors des arêtes).
+        Construite une fois par porte, pour des recherches vectorisées table[q0, q1].
+        """
+        if gate not in self._tables:
+            qubits = self.gate_qubits[gate]
+            table = np.full((self.num_qubits,) * qubits.shape[1], np.nan)
+            table[tuple(qubits.T)] = self.gate_error[gate]
+            self._tables[gate] = table
+        return self._tables[gate]
+
+
+def get_snapshot(backend, cache_dir: str = "calibrations", max_age_hours: float = 24) -> CalibrationSnapshot:
+    """
+    Instantané de calibration du backend :
+     - déjà chargé en mémoire, ou sauvegardé il y a moins de max_age_hours : relu sans interroger le backend
+     - sinon les propriétés sont interrogées, et l'instantané n'est reconstruit que si la calibration a changé
+       (sinon seule sa date de lecture est mise à jour)
+    """
+    now = datetime.now(timezone.utc)
+    snapshot = _snapshots.get(backend.name)
+
+    if snapshot is None:
+        paths = sorted(glob.glob(os.path.join(cache_dir, f"{backend.name}_*.npz")))
+        if paths:
+            snapshot = CalibrationSnapshot.load(paths[-1])
+
+    if snapshot is not None and now - datetime.fromisoformat(snapshot.fetched or snapshot.last_update_date) < timedelta(hours=max_age_hours):
+        _snapshots[backend.name] = snapshot
+        return snapshot
+
+    last_update_date = backend.properties().last_update_date.isoformat()
+    if snapshot is None or snapshot.last_update_date != last_update_date:
+        snapshot = CalibrationSnapshot.from_backend(backend)
+    else:
+        snapshot.fetched = now.isoformat()
+    snapshot.save(cache_dir)
+
+    _snapshots[backend.name] = snapshot
+    return snapshot
+
+
+def layout_features(snapshot: CalibrationSnapshot, isa_qc: QuantumCircuit) -> Dict[str, float]:
+    """
+    Features matérielles des qubits et arêtes réellement utilisés par un circuit transpilé (ISA) :
+     - T1 / T2 moyen et minimal des qubits utilisés
+     - erreur de mesure moyenne et maximale des qubits mesurés
+     - erreur moyenne des portes à 1 qubit, moyenne et maximale des portes à 2 qubits
+     - probabilité de succès estimée (produit des 1 - erreur de chaque porte et mesure)
+    """
+    # Qubits de chaque occurrence de chaque porte
+    occurrences: Dict[str, list] = {}
+    for instruction in isa_qc.data:
+        name = instruction.operation.name
+        if name == "barrier":
+            continue
+        occurrences.setdefault(name, []).append([isa_qc.find_bit(q).index for q in instruction.qubits])
+
+    used = np.unique(np.concatenate([np.ravel(q) for q in occurrences.values()])) if occurrences else np.array([], dtype=np.int64)
+    measured = np.array([q[0] for q in occurrences.get("measure", [])], dtype=np.int64)
+
+    errors_1q, errors_2q = [], []
+    for name, qubits in occurrences.items():
+        if name not in snapshot.gate_qubits:
+            continue
+        qubits = np.array(qubits, dtype=np.int64)
+        errors = snapshot.error_table(name)[tuple(qubits.T)]
+        (errors_1q if qubits.shape[1] == 1 else errors_2q).append(errors)
+
+    errors_1q = np.concatenate(errors_1q) if errors_1q else np.array([])
+    errors_2q = np.concatenate(errors_2q) if errors_2q else np.array([])
+    readout = snapshot.readout_error[measured]
+    all_errors = np.concatenate([errors_1q, errors_2q, readout])
+
+    def stat(function, values: np.ndarray) -> Optional[float]:
+        values = values[~np.isnan(values)]
+        return float(function(values)) if len(values) else None
+
+    return {
+        "hw_t1_mean":              stat(np.mean, snapshot.t1[used]),
+        "hw_t1_min":               stat(np.min, snapshot.t1[used]),
+        "hw_t2_mean":              stat(np.mean, snapshot.t2[used]),
+        "hw_t2_min":               stat(np.min, snapshot.t2[used]),
+        "hw_readout_error_mean":   stat(np.mean, readout),
+        "hw_readout_error_max":    stat(np.max, readout),
+        "hw_gate_error_1q_mean":   stat(np.mean, errors_1q),
+        "hw_gate_error_2q_mean":   stat(np.mean, errors_2q),
+        "hw_gate_error_2q_max":    stat(np.max, errors_2q),
+        "hw_success_probability":  float(np.prod(1 - all_errors[~np.isnan(all_errors)])),
+    }
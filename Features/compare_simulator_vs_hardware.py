@@ -5,7 +5,6 @@ import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 from qiskit import QuantumCircuit, transpile
-from qiskit_aer import AerSimulator
 from qiskit.visualization import plot_histogram
 from qiskit.quantum_info import state_fidelity
 from qiskit_aer.noise import NoiseModel
@@ -14,6 +13,11 @@ from scipy.stats import wasserstein_distance, entropy as shannon_entropy
 
 from tokens import get_token_for
 
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../Algos')))
+from exact import execute
+
 # 1) Setup IBM Runtime & récup token
 token = get_token_for("Baptiste")
 service = QiskitRuntimeService(channel="ibm_quantum", token=token)
@@ -49,29 +53,25 @@ def classical_fidelity(counts, ideal_counts):
     return float((np.sqrt(p*q).sum())**2)
 
 # 7) Boucle de collecte
+# Une seule exécution par scénario (voir exact.execute) : état final, probabilités exactes
+# et counts tirés de ces probabilités
 records = []
-sim_ideal = AerSimulator(method="statevector")
-sim_noisy = AerSimulator(method="statevector", noise_model=noise_model)
 
 for qc in [random_circuit(3,5) for _ in range(20)]:
-    tq_i = transpile(qc, sim_ideal, optimization_level=0)
-    tq_i.save_statevector()  
     t0 = time.perf_counter()
-    res_i = sim_ideal.run(tq_i, shots=1024).result()
+    ideal = execute(qc, shots=1024)
     t1 = time.perf_counter()
     rt_i = (t1 - t0)*1000
-    sv_i = res_i.get_statevector()
+    sv_i = ideal["state"]
 
     # ————————————————————————————————
-    # 2) SIMULATION BRUITÉE (STATEVECTOR)
+    # 2) SIMULATION BRUITÉE (DENSITY MATRIX)
     # ————————————————————————————————
-    tq_n = transpile(qc, sim_noisy, optimization_level=0)
-    tq_n.save_statevector()  
     t0n = time.perf_counter()
-    res_n = sim_noisy.run(tq_n, shots=1024).result()
+    noisy = execute(qc, noise_model, shots=1024)
     t1n = time.perf_counter()
     rt_n = (t1n - t0n)*1000
-    sv_n = res_n.get_statevector()
+    sv_n = noisy["state"]
 
     # ————————————————————————————————
     # 3) CALCUL DE LA STATE FIDELITY
@@ -92,7 +92,7 @@ for qc in [random_circuit(3,5) for _ in range(20)]:
     # ————————————————————————————————
     # 5) METRIQUES COUNTS (CLASSICAL FIDELITY, EMD)
     # ————————————————————————————————
-    classical_fid = classical_fidelity(counts_hw, res_i.get_counts())
+    classical_fid = classical_fidelity(counts_hw, ideal["counts"])
     emd_hw = wasserstein_distance(
         np.arange(len(counts_hw)), np.arange(len(counts_hw)),
         np.array(list(counts_hw.values()))/1024,
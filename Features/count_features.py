@@ -1,4 +1,4 @@
-from typing import Dict
+from typing import Dict, Tuple
 import numpy as np
 from scipy.stats import entropy, wasserstein_distance
 from qiskit.visualization import plot_histogram
@@ -71,6 +71,45 @@ def classical_fidelity(
 
 
 
+def counts_to_arrays(counts: Dict[str, int]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convertit des counts en (outcomes, fréquences) triés par outcome, l'outcome étant
+    l'entier des Clbits (les espaces entre registres sont ignorés).
+    """
+    outcomes = np.array([int(k.replace(" ", ""), 2) for k in counts], dtype=np.int64)
+    freqs = np.array(list(counts.values()), dtype=float)
+    order = np.argsort(outcomes)
+    return outcomes[order], freqs[order] / freqs.sum()
+
+
+def classical_fidelity_ideal(
+    counts: Dict[str, int],
+    ideal: Tuple[np.ndarray, np.ndarray]
+) -> float:
+    """
+    Fidélité classique F = (sum(sqrt(p_i * q_i)))^2 entre des counts et la distribution
+    idéale exacte `ideal` = (outcomes, probabilités), voir ideal_cache.ideal_distribution.
+    """
+    outcomes, freqs = counts_to_arrays(counts)
+    ideal_outcomes, probabilities = ideal
+    index = np.clip(np.searchsorted(ideal_outcomes, outcomes), 0, max(len(ideal_outcomes) - 1, 0))
+    q = np.where(ideal_outcomes[index] == outcomes, probabilities[index], 0.0) if len(ideal_outcomes) else np.zeros_like(freqs)
+    return float(np.sqrt(freqs * q).sum() ** 2)
+
+
+def emd_ideal(
+    counts: Dict[str, int],
+    ideal: Tuple[np.ndarray, np.ndarray]
+) -> float:
+    """
+    Earth Mover's Distance (Wasserstein-1) entre les counts et la distribution idéale
+    exacte `ideal` = (outcomes, probabilités), sur l'axe des outcomes.
+    """
+    outcomes, freqs = counts_to_arrays(counts)
+    ideal_outcomes, probabilities = ideal
+    return float(wasserstein_distance(outcomes, ideal_outcomes, freqs, probabilities))
+
+
 def plot_calculatorvssimulator(calc_counts, simul_counts, ideal_counts, name):
     """
     Affiche un histogramme pour calc_counts et simul_counts,
@@ -1,7 +1,14 @@
+import os
+import sys
 import time
-from typing import Dict, Any
-from qiskit import QuantumCircuit, transpile
+from typing import Dict, Any, List, Optional, Tuple
+from qiskit import QuantumCircuit
 from static_features import static_metrics
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../Algos')))
+from transpile_cache import cached_transpile
+from phase_timing import PhaseTimer, aer_phases
+from aer_tuning import simulator_options
 #############################
 # Execution Features
 #############################
@@ -9,31 +16,98 @@ from static_features import static_metrics
 def run_timing(
     qc: QuantumCircuit,
     simulator,
-    shots: int = 256
-) -> Dict[str, float]:
+    shots: int = 256,
+    timer: Optional[PhaseTimer] = None
+) -> Tuple[Dict[str, Any], Dict[str, int]]:
     """
-    Transpile le circuit pour le simulateur donné, exécute et mesure :
-      - time_real_ms : temps réel (wall-clock) en millisecondes
-      - time_sim_ms  : temps simulé retourné par le simulateur (job.time_taken) en ms, ou None
+    Transpile le circuit pour le simulateur donné (avec cache, voir cached_transpile), exécute et mesure :
+      - time_real_ms : temps réel (wall-clock) de la soumission jusqu'au résultat, en millisecondes
+      - time_sim_ms  : temps de simulation rapporté par le simulateur (result.time_taken) en ms, ou None
+
+    Les options de parallélisme d'Aer sont choisies selon le circuit (voir aer_tuning.tune_options).
+
+    Les phases (transpile, submit, queue, execute, result) sont enregistrées dans `timer`
+    (voir phase_timing.PhaseTimer), créé ici si None, et renvoyé dans timing['phases'] :
+    l'appelant peut y ajouter la phase "features" avant d'en faire un record.
     """
-    # Transpilation
-    tq = transpile(qc, simulator, optimization_level=0)
+    timer = PhaseTimer(simulator.name) if timer is None else timer
+
+    # Transpilation (déjà faite si le circuit a été vu pour ce simulateur)
+    with timer.phase("transpile"):
+        tq = cached_transpile(qc, simulator)
 
-    # Exécution et mesure du temps réel
-    start = time.perf_counter()
-    job = simulator.run(tq, shots=shots)
-    end = time.perf_counter()
+    # Soumission (asynchrone) puis attente du résultat
+    with timer.phase("submit"):
+        job = simulator.run(tq, shots=shots, **simulator_options(simulator, tq, shots))
+    with timer.phase("wait"):
+        result = job.result()
+    with timer.phase("result"):
+        counts = result.get_counts(0)
 
     # Calcul des métriques
-    time_real_ms = (end - start) * 1000
-    time_sim = getattr(job, "time_taken", None)
-    time_sim_ms = (time_sim * 1000) if time_sim is not None else None
+    time_real_ms = timer.durations["submit"] + timer.durations["wait"]
+    time_sim = getattr(result, "time_taken", None)
+    aer_phases(timer, result)
 
     timing = {
         "time_real_ms": time_real_ms,
-        "time_sim_ms": time_sim_ms
+        "time_sim_ms": (time_sim * 1000) if time_sim is not None else None,
+        "phases": timer
     }
-    return (timing, job.result().get_counts(qc))
+    return (timing, counts)
+
+
+def run_timing_batch(
+    circuits: List[QuantumCircuit],
+    simulator,
+    shots: int = 256
+) -> List[Tuple[Dict[str, Any], Dict[str, int]]]:
+    """
+    Version groupée de run_timing : tous les circuits sont transpilés ensemble puis
+    envoyés en un seul simulator.run, le coût fixe d'un job (préparation, noise model,
+    construction du résultat) est donc payé une seule fois pour tout le lot.
+    Les options de parallélisme d'Aer sont choisies selon la forme du lot (voir aer_tuning.tune_options).
+
+    Renvoie, pour chaque circuit, (timing, counts) avec :
+      - time_real_ms  : temps réel du lot (soumission + résultat) divisé par le nombre de circuits
+      - time_sim_ms   : temps de simulation de l'expérience (result.results[i].time_taken) en ms
+      - time_batch_ms : temps réel total du lot en millisecondes
+      - batch_size    : nombre de circuits du lot
+      - phases        : PhaseTimer du circuit (part du lot, sauf execute qui est celui de l'expérience)
+    """
+    if not circuits:
+        return []
+
+    timer = PhaseTimer(simulator.name)
+
+    # Transpilation du lot (seuls les circuits absents du cache sont transpilés)
+    with timer.phase("transpile"):
+        tqs = cached_transpile(list(circuits), simulator)
+
+    # Exécution du lot et mesure du temps réel (jusqu'au résultat)
+    with timer.phase("submit"):
+        job = simulator.run(tqs, shots=shots, **simulator_options(simulator, tqs, shots))
+    with timer.phase("wait"):
+        result = job.result()
+    with timer.phase("result"):
+        all_counts = [result.get_counts(i) for i in range(len(circuits))]
+
+    time_batch_ms = timer.durations["submit"] + timer.durations["wait"]
+    aer_phases(timer, result)
+
+    outputs = []
+    for i, experiment in enumerate(result.results):
+        time_sim = getattr(experiment, "time_taken", None)
+        time_sim_ms = (time_sim * 1000) if time_sim is not None else None
+        timing = {
+            "time_real_ms": time_batch_ms / len(circuits),
+            "time_sim_ms": time_sim_ms,
+            "time_batch_ms": time_batch_ms,
+            "batch_size": len(circuits),
+            "phases": timer.amortized(len(circuits), time_sim_ms)
+        }
+        outputs.append((timing, all_counts[i]))
+    return outputs
 
 
 # Exemple d'utilisation
@@ -51,8 +125,8 @@ if __name__ == "__main__":
     sim = AerSimulator()
 
     # Mesure des métriques temporelles
-    metrics = run_timing(qc, sim, shots=1024)
-    print(metrics)
+    timing, counts = run_timing(qc, sim, shots=1024)
+    print(timing.pop("phases").record(), timing, counts)
 def _example():
     from qiskit import QuantumCircuit
     qc = QuantumCircuit(3, 3)
@@ -3,7 +3,8 @@
 """
 Fonctions pour interroger les QPUs IBM Quantum et extraire leurs caractéristiques matérielles
 """
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+import numpy as np
 from qiskit_ibm_runtime import QiskitRuntimeService
 from qiskit_aer.noise import NoiseModel
 from qiskit import QuantumCircuit, transpile
@@ -13,11 +14,12 @@ import os
 from datetime import datetime
 
 from tokens import get_token_for
+from calibration import get_snapshot
 
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../Algos')))
 
-from fuzzing import fuzzing
+from fuzzing import fuzzing_stream
 from simulate import calculate
 
 
@@ -55,44 +57,31 @@ def get_noise_model(
 # ----------------------------------------------------------------------------
 
 def get_backend_error_metrics(
-    backend_name,
-    token: str
+    backend,
+    token: Optional[str] = None
 ) -> Dict[str, float]:
     """
     Extrait des propriétés matérielles d'un QPU IBM :
-      - T1 moyen (s)
-      - T2 moyen (s)
+      - T1 moyen (µs)
+      - T2 moyen (µs)
       - erreur de porte moyenne
       - erreur de mesure moyenne
+    à partir de son instantané de calibration (voir calibration.get_snapshot).
+    T1 et T2 restent en µs, l'unité des propriétés du backend, comme dans les CSV existants
+    (l'instantané les stocke en secondes).
     """
-    props = backend.properties()
-
-    t1_list = []
-    t2_list = []
-    readout_list = []
-    error_list = []
-
-    # Récupération T1, T2, readout_error par qubit
-    for qubit in props.qubits:
-        for param in qubit:
-            if param.name == "T1":
-                t1_list.append(param.value)
-            elif param.name == "T2":
-                t2_list.append(param.value)
-            elif param.name == "readout_error":
-                readout_list.append(param.value)
-
-    # Récupération du gate_error pour chaque porte
-    for gate in props.gates:
-        for param in gate.parameters:
-            if param.name == "gate_error":
-                error_list.append(param.value)
+    snapshot = get_snapshot(backend)
+    gate_errors = np.concatenate(list(snapshot.gate_error.values())) if snapshot.gate_error else np.array([])
+
+    def mean(values: np.ndarray) -> float:
+        values = values[~np.isnan(values)]
+        return float(values.mean()) if len(values) else 0.0
 
     return {
-        "avg_T1":            float(sum(t1_list)/len(t1_list)) if t1_list else 0.0,
-        "avg_T2":            float(sum(t2_list)/len(t2_list)) if t2_list else 0.0,
-        "avg_readout_error": float(sum(readout_list)/len(readout_list)) if readout_list else 0.0,
-        "avg_gate_error":    float(sum(error_list)/len(error_list)) if error_list else 0.0,
+        "avg_T1":            mean(snapshot.t1) * 1e6,
+        "avg_T2":            mean(snapshot.t2) * 1e6,
+        "avg_readout_error": mean(snapshot.readout_error),
+        "avg_gate_error":    mean(gate_errors),
     }
 
 # ----------------------------------------------------------------------------
@@ -120,6 +109,6 @@ if __name__ == '__main__':
     print("Hardware error metrics:", hw_metrics)
 
     # 4) Exécuter un circuit de test
-    circuits = fuzzing(1, 5, 10)
-    calculate(circuits, service, backend, 512)
+    for qc, _ in fuzzing_stream(1, 5, 10):
+        calculate(qc, service, backend, 512)
 
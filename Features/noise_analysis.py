@@ -16,8 +16,7 @@ from typing import Optional
 
 import matplotlib.pyplot as plt
 import numpy as np
-from qiskit import QuantumCircuit, transpile
-from qiskit_aer import AerSimulator
+from qiskit import QuantumCircuit
 from qiskit_aer.noise import NoiseModel
 from qiskit_ibm_runtime import QiskitRuntimeService
 from qiskit.quantum_info import state_fidelity
@@ -26,6 +25,10 @@ from scipy.stats import wasserstein_distance
 
 from tokens import get_token_for
 
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../Algos')))
+from exact import execute
+
 # ----------------------------------------------------------------------------
 
 def load_noise_model(
@@ -96,23 +99,31 @@ def generate_extremely_noisy_circuit(num_qubits: int = 5) -> QuantumCircuit:
 
 # ----------------------------------------------------------------------------
 
+def run_scenarios(
+    qc: QuantumCircuit,
+    noise_model: NoiseModel,
+    shots: int = 1024
+) -> tuple:
+    """
+    Exécute qc une seule fois par scénario (idéal puis bruité), voir exact.execute :
+    l'état final, ses probabilités exactes et des counts tirés de ces probabilités.
+    """
+    return execute(qc, shots=shots), execute(qc, noise_model, shots=shots)
+
+# ----------------------------------------------------------------------------
+
 def compute_state_fidelity(
     qc: QuantumCircuit,
     noise_model: NoiseModel,
-    method: str = "statevector"
+    executions: Optional[tuple] = None
 ) -> float:
     """
     Calcule la fidélité d'état entre version idéale et bruitée.
+    `executions` : résultat de run_scenarios, pour ne pas simuler qc une nouvelle fois.
     """
-    sim_i = AerSimulator(method=method)
-    sim_n = AerSimulator(method=method, noise_model=noise_model)
-    t_i = transpile(qc, sim_i, optimization_level=0)
-    t_n = transpile(qc, sim_n, optimization_level=0)
-    t_i.save_statevector(); t_n.save_statevector()
-    res_i = sim_i.run(t_i).result(); res_n = sim_n.run(t_n).result()
-    sv_i = res_i.get_statevector(); sv_n = res_n.get_statevector()
-    fidelity = state_fidelity(sv_i, sv_n)
-    print(f"Statevector fidelity: {fidelity:.6f}")
+    ideal, noisy = run_scenarios(qc, noise_model) if executions is None else executions
+    fidelity = state_fidelity(ideal["state"], noisy["state"])
+    print(f"State fidelity: {fidelity:.6f}")
     return fidelity
 
 # ----------------------------------------------------------------------------
@@ -120,23 +131,23 @@ def compute_state_fidelity(
 def compute_count_metrics(
     qc: QuantumCircuit,
     noise_model: NoiseModel,
-    shots: int = 1024
+    shots: int = 1024,
+    executions: Optional[tuple] = None
 ) -> dict:
     """
-    Exécute qc idéal et bruité en mode qasm, renvoie counts et métriques classiques.
+    Renvoie counts idéal et bruité et métriques classiques.
+    `executions` : résultat de run_scenarios, pour ne pas simuler qc une nouvelle fois.
     """
-    sim_i = AerSimulator()
-    sim_n = AerSimulator(noise_model=noise_model)
-    t_i = transpile(qc, sim_i, optimization_level=0)
-    t_n = transpile(qc, sim_n, optimization_level=0)
-    # Exécutions
-    res_i = sim_i.run(t_i, shots=shots).result(); counts_i = res_i.get_counts()
-    res_n = sim_n.run(t_n, shots=shots).result(); counts_n = res_n.get_counts()
+    ideal, noisy = run_scenarios(qc, noise_model, shots) if executions is None else executions
+    counts_i = ideal["counts"]; counts_n = noisy["counts"]
     # Metrics
-    # 1) Classical fidelity: (sum sqrt(p_i q_i))^2
+    # 1) Classical fidelity: (sum sqrt(p_i q_i))^2, sur les probabilités exactes si elles existent
     keys = set(counts_i) | set(counts_n)
-    p = np.array([counts_i.get(k,0)/shots for k in keys])
-    q = np.array([counts_n.get(k,0)/shots for k in keys])
+    if ideal["probabilities"] is not None and noisy["probabilities"] is not None:
+        p, q = ideal["probabilities"], noisy["probabilities"]
+    else:
+        p = np.array([counts_i.get(k,0)/shots for k in keys])
+        q = np.array([counts_n.get(k,0)/shots for k in keys])
     classical_fid = float((np.sqrt(p*q).sum())**2)
     # 2) EMD vs idéal
     obs = np.array([counts_n.get(k,0) for k in keys], dtype=float)
@@ -144,7 +155,7 @@ def compute_count_metrics(
     unif = np.ones_like(obs)/len(obs)
     emd = wasserstein_distance(np.arange(len(obs)), np.arange(len(obs)), obs, unif)
     # Print et plot
-    print(f"Classical fidelity (counts): {classical_fid:.6f}")
+    print(f"Classical fidelity (probabilities): {classical_fid:.6f}")
     print(f"EMD vs uniforme: {emd:.6f}")
     plot_histogram(counts_i, title="Counts ideal"); plot_histogram(counts_n, title="Counts noisy")
     plt.show()
@@ -163,8 +174,11 @@ if __name__ == "__main__":
     # Génération du circuit
     qc = generate_extremely_noisy_circuit()
 
-    # Fidelity sur état pur
-    compute_state_fidelity(qc, nm)
+    # Une seule simulation par scénario pour les deux analyses
+    executions = run_scenarios(qc, nm, shots=1024)
+
+    # Fidelity sur les états
+    compute_state_fidelity(qc, nm, executions)
 
     # Métriques de distribution (measurement)
-    compute_count_metrics(qc, nm, shots=1024)
+    compute_count_metrics(qc, nm, shots=1024, executions=executions)
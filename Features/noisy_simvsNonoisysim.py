@@ -1,17 +1,21 @@
 # compare_simulator_noise_features.py
 
+import os
 import time
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 from qiskit import QuantumCircuit, transpile
-from qiskit_aer import AerSimulator
 from qiskit_aer.noise import NoiseModel
 from qiskit_ibm_runtime import QiskitRuntimeService
 from qiskit.quantum_info import state_fidelity
 
 # Récupérer votre token IBM Quantum (ou remplacez par une string)
 from tokens import get_token_for
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../Algos')))
+from simulator_registry import get_simulator
+
 token = get_token_for("Baptiste")
 
 # Charger le modèle de bruit du backend IBM
@@ -41,8 +45,8 @@ num_circuits = 20
 circuits = [random_circuit(3, 5) for _ in range(num_circuits)]
 
 # Préparer les simulateurs
-sim_ideal = AerSimulator()
-sim_noisy = AerSimulator(noise_model=noise_model)
+sim_ideal = get_simulator()
+sim_noisy = get_simulator(noise_model=noise_model)
 
 # Collecte des features
 records = []
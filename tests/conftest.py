@@ -0,0 +1,13 @@
+import os
+import sys
+
+import pytest
+
+# The modules of Algos/ import each other by their bare names
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "Algos")))
+
+
+@pytest.fixture(autouse=True)
+def _working_directory(tmp_path, monkeypatch) :
+    """ The caches written in the working directory (transpile_cache/, job_ledger.sqlite ...) stay out of the tree """
+    monkeypatch.chdir(tmp_path)
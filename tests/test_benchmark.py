@@ -0,0 +1,42 @@
+import math
+
+import numpy as np
+import pytest
+
+from benchmark import StreamingStats
+
+
+def test_streaming_stats_matches_numpy() :
+    values = np.random.default_rng(0).lognormal(mean=2.0, sigma=0.8, size=20_000)
+    stats = StreamingStats(precision=0.01)
+    for value in values :
+        stats.add(float(value))
+    summary = stats.summary()
+
+    # Exact moments and extrema
+    assert summary["n"] == len(values)
+    assert summary["mean"] == pytest.approx(values.mean(), rel=1e-9)
+    assert summary["std"] == pytest.approx(values.std(ddof=1), rel=1e-9)
+    assert summary["min"] == values.min()
+    assert summary["max"] == values.max()
+
+    # Quantiles exact up to the width of a bin
+    for key, q in [("median", 0.5), ("p05", 0.05), ("p25", 0.25), ("p75", 0.75), ("p95", 0.95), ("p99", 0.99)] :
+        assert summary[key] == pytest.approx(np.quantile(values, q), rel=0.011)
+
+    median = np.median(values)
+    assert summary["mad"] == pytest.approx(np.median(np.abs(values - median)), rel=0.03)
+
+
+def test_streaming_stats_edge_cases() :
+    stats = StreamingStats()
+    assert math.isnan(stats.quantile(0.5))
+    assert math.isnan(stats.mad())
+
+    stats.add(5.0)
+    assert stats.summary()["std"] == 0.0
+    assert stats.quantile(0.5) == 5.0      # clipped to [min, max]
+
+    stats.add(1e9)                          # above the histogram range : counted in the last bin
+    assert stats.max == 1e9
+    assert stats.quantile(1.0) == pytest.approx(1e7, rel=0.02)
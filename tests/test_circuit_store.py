@@ -0,0 +1,67 @@
+import os
+import shutil
+
+import numpy as np
+
+import fuzzing
+from circuit_store import CircuitStore, import_text_logs
+
+
+def test_append_round_trip(tmp_path) :
+    store = CircuitStore(str(tmp_path / "store"))
+    gate_ids, qbits = fuzzing.random_gate_arrays(3, 10, 5, 40)
+    id_map = store.gate_id_map([gate.name for gate in fuzzing.gates])
+
+    indices = store.append(id_map[gate_ids], qbits, 5, random_init=True)
+    store.append_timing(int(indices[2]), 1.5, 2.5)
+
+    reopened = CircuitStore(str(tmp_path / "store"))
+    assert len(reopened) == 10
+    assert indices.tolist() == list(range(10))
+    for i in range(10) :
+        expected = [(fuzzing.gates[g].name, q[q >= 0].tolist()) for g, q in zip(gate_ids[i], qbits[i])]
+        assert reopened.gates_of(i) == expected
+        assert reopened.circuit(i) == fuzzing.build_circuit(gate_ids[i], qbits[i], 5, random_init=True)
+    assert reopened.timings.tolist() == [(2, 1.5, 2.5)]
+
+
+def test_import_text_logs_is_idempotent(tmp_path) :
+    data_dir = os.path.join(os.path.dirname(__file__), "..", "data")
+    logs = tmp_path / "data"
+    logs.mkdir()
+    names = sorted(name for name in os.listdir(data_dir) if os.path.isfile(os.path.join(data_dir, name)))[:3]
+    for name in names :
+        shutil.copy(os.path.join(data_dir, name), logs / name)
+
+    store = CircuitStore(str(tmp_path / "store"))
+    assert import_text_logs(str(logs), store) == 3
+    assert import_text_logs(str(logs), store) == 0
+    assert len(store) == 3
+    assert len(np.unique(store.circuits["created"])) == 3
+
+
+def _fill(path: str, seed: int) :
+    store = CircuitStore(path)
+    id_map = store.gate_id_map([gate.name for gate in fuzzing.gates])
+    for block in range(5) :
+        gate_ids, qbits = fuzzing.random_gate_arrays([seed, block], 20, 5, 30)
+        store.append(id_map[gate_ids], qbits, 5)
+
+
+def test_concurrent_writers(tmp_path) :
+    from concurrent.futures import ProcessPoolExecutor
+
+    path = str(tmp_path / "store")
+    with ProcessPoolExecutor(max_workers=2) as executor :
+        list(executor.map(_fill, [path, path], [0, 1]))
+
+    store = CircuitStore(path)
+    expected = set()
+    for seed in (0, 1) :
+        for block in range(5) :
+            gate_ids, qbits = fuzzing.random_gate_arrays([seed, block], 20, 5, 30)
+            for i in range(20) :
+                expected.add(tuple((fuzzing.gates[g].name, tuple(q[q >= 0].tolist())) for g, q in zip(gate_ids[i], qbits[i])))
+
+    assert len(store) == 200
+    assert {tuple((name, tuple(q)) for name, q in store.gates_of(i)) for i in range(200)} == expected
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+from qiskit import QuantumCircuit, transpile
+from qiskit_aer import AerSimulator
+from qiskit_aer.noise import NoiseModel, ReadoutError, depolarizing_error
+
+import fuzzing
+from exact import execute
+
+
+def tvd(probabilities: dict, counts: dict) -> float :
+    shots = sum(counts.values())
+    keys = set(probabilities) | set(counts)
+    return 0.5 * sum(abs(probabilities.get(key, 0.0) - counts.get(key, 0) / shots) for key in keys)
+
+
+def distribution(result: dict, qc: QuantumCircuit) -> dict :
+    """ Exact probabilities of `execute` keyed like counts """
+    outcomes = np.flatnonzero(result["probabilities"])
+    return {format(int(k), f"0{qc.num_clbits}b"): float(result["probabilities"][k]) for k in outcomes}
+
+
+def shot_counts(qc: QuantumCircuit, noise_model = None, shots = 2**16) -> dict :
+    simulator = AerSimulator(noise_model=noise_model, seed_simulator=1)
+    return simulator.run(transpile(qc, simulator, optimization_level=0), shots=shots).result().get_counts()
+
+
+def random_circuit(seed: int, nb_qbits = 3) -> QuantumCircuit :
+    gate_ids, qbits = fuzzing.random_gate_arrays(seed, 1, nb_qbits, 15)
+    return fuzzing.build_circuit(gate_ids[0], qbits[0], nb_qbits, random_init=True)
+
+
+@pytest.fixture(scope="module")
+def noise_model() :
+    model = NoiseModel()
+    model.add_all_qubit_quantum_error(depolarizing_error(0.02, 1), ["h", "x", "sx", "rz", "u"])
+    model.add_all_qubit_quantum_error(depolarizing_error(0.05, 2), ["cx"])
+    model.add_all_qubit_readout_error(ReadoutError([[0.97, 0.03], [0.05, 0.95]]))
+    return model
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_ideal_execute_matches_shots(seed) :
+    qc = random_circuit(seed)
+    result = execute(qc, shots=1000, rng=0)
+
+    # Resets make the state mixed, so they need a density matrix even without noise
+    has_reset = any(instruction.operation.name == "reset" for instruction in qc.data)
+    assert result["method"] == ("density_matrix" if has_reset else "statevector")
+    assert result["probabilities"].sum() == pytest.approx(1.0)
+    assert sum(result["counts"].values()) == 1000
+    assert tvd(distribution(result, qc), shot_counts(qc)) < 0.02
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_noisy_execute_matches_shots(seed, noise_model) :
+    qc = random_circuit(seed)
+    result = execute(qc, noise_model, shots=1000, rng=0)
+
+    assert result["method"] == "density_matrix"
+    assert result["probabilities"].sum() == pytest.approx(1.0)
+    assert tvd(distribution(result, qc), shot_counts(qc, noise_model)) < 0.02
+
+
+def test_noisy_execute_on_a_backend_matches_shots() :
+    from qiskit_ibm_runtime.fake_provider import FakeManilaV2
+
+    backend = FakeManilaV2()
+    noise_model = NoiseModel.from_backend(backend)
+    qc = random_circuit(3, nb_qbits=4)
+    result = execute(qc, noise_model, shots=1000, rng=0, backend=backend)
+
+    isa = transpile(qc, backend, optimization_level=0)
+    counts = AerSimulator(noise_model=noise_model, seed_simulator=1).run(isa, shots=2**16).result().get_counts()
+    assert tvd(distribution(result, qc), counts) < 0.02
+
+
+def test_ideal_bell_state_is_exact() :
+    qc = QuantumCircuit(2)
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.measure_all()
+    result = execute(qc, shots=100, rng=0)
+
+    assert result["method"] == "statevector"
+    assert distribution(result, qc) == pytest.approx({"00": 0.5, "11": 0.5})
+    assert set(result["counts"]) <= {"00", "11"}
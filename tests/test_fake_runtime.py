@@ -0,0 +1,86 @@
+import time
+
+import pytest
+from qiskit import QuantumCircuit, transpile
+from qiskit_ibm_runtime.exceptions import IBMInputValueError, RuntimeInvalidStateError, RuntimeJobFailureError, RuntimeJobNotFound
+
+import fake_runtime
+from fake_runtime import FakeRuntimeService, FakeSamplerV2
+
+
+def make_service(**kwargs) :
+    from qiskit_ibm_runtime.fake_provider import FakeManilaV2
+    return FakeRuntimeService(backends=[FakeManilaV2()], **kwargs)
+
+
+def isa_bell(backend) :
+    qc = QuantumCircuit(2)
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.measure_all()
+    return transpile(qc, backend, optimization_level=0)
+
+
+def test_job_runs_and_reports_metrics() :
+    service = make_service()
+    backend = service.backend("ibm_manila")
+    job = fake_runtime.sampler(backend).run([isa_bell(backend)], shots=200)
+
+    counts = job.result()[0].join_data().get_counts()
+    assert job.status() == "DONE"
+    assert sum(counts.values()) == 200
+    assert service.job(job.job_id()) is job
+    timestamps = job.metrics()["timestamps"]
+    assert timestamps["created"] <= timestamps["running"] <= timestamps["finished"]
+    service.close()
+
+
+def test_failed_job() :
+    service = make_service(failure_rate=1.0, seed=0)
+    backend = service.backend("fake_manila")
+    job = FakeSamplerV2(mode=backend).run([isa_bell(backend)], shots=10)
+
+    job.wait_for_final_state(timeout=30)
+    assert job.status() == "ERROR"
+    assert "Injected failure" in job.error_message()
+    with pytest.raises(RuntimeJobFailureError) :
+        job.result()
+    service.close()
+
+
+def test_cancelled_job() :
+    service = make_service(queue_delay=1.0)
+    backend = service.backend("fake_manila")
+    job = FakeSamplerV2(mode=backend).run([isa_bell(backend)], shots=10)
+
+    assert job.status() == "QUEUED"
+    assert job.metrics()["position_in_queue"] == 1
+    job.cancel()
+    assert job.status() == "CANCELLED"
+    with pytest.raises(RuntimeInvalidStateError) :
+        job.result(timeout=1)
+    service.close()
+
+
+def test_invalid_requests() :
+    service = make_service()
+    backend = service.backend("fake_manila")
+
+    with pytest.raises(RuntimeJobNotFound) :
+        service.job("unknown")
+    with pytest.raises(IBMInputValueError) :
+        FakeSamplerV2(mode=backend).run([QuantumCircuit(backend.num_qubits + 1)], shots=10)
+    with pytest.raises(ValueError) :
+        FakeSamplerV2(mode=object())
+    service.close()
+
+
+def test_queue_delay() :
+    service = make_service(queue_delay=0.3)
+    backend = service.backend("fake_manila")
+
+    start = time.perf_counter()
+    job = FakeSamplerV2(mode=backend).run([isa_bell(backend)], shots=10)
+    job.result()
+    assert time.perf_counter() - start >= 0.3
+    service.close()
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from qiskit import QuantumCircuit
+
+import fuzzing
+from fingerprint import array_fingerprint, circuit_fingerprint, deduplicate
+
+
+def permuted(qc: QuantumCircuit, perm: list[int]) -> QuantumCircuit :
+    """ Copy of `qc` with Qbit q (and Clbit q) renamed perm[q] """
+    copy = qc.copy_empty_like()
+    for instruction in qc.data :
+        copy.append(instruction.operation,
+                    [copy.qubits[perm[qc.find_bit(q).index]] for q in instruction.qubits],
+                    [copy.clbits[perm[qc.find_bit(c).index]] for c in instruction.clbits])
+    return copy
+
+
+@pytest.mark.parametrize("nb_qbits, nb_gates", [(4, 20), (10, 200)])
+def test_array_fingerprint_matches_circuit_fingerprint(nb_qbits, nb_gates) :
+    names = [gate.name for gate in fuzzing.gates]
+    gate_ids, qbits = fuzzing.random_gate_arrays(5, 3, nb_qbits, nb_gates)
+    for i in range(3) :
+        qc = fuzzing.build_circuit(gate_ids[i], qbits[i], nb_qbits, random_init=True)
+        for up_to_permutation in (True, False) :
+            assert array_fingerprint(names, gate_ids[i], qbits[i], nb_qbits, True, up_to_permutation) == circuit_fingerprint(qc, up_to_permutation)
+
+
+# (4, 20) tries every permutation, (10, 200) is above max_permutation_work (colour refinement)
+@pytest.mark.parametrize("nb_qbits, nb_gates", [(4, 20), (10, 200), (12, 60)])
+def test_fingerprint_is_invariant_under_qbit_permutation(nb_qbits, nb_gates) :
+    rng = np.random.default_rng(nb_qbits)
+    gate_ids, qbits = fuzzing.random_gate_arrays(rng, 3, nb_qbits, nb_gates)
+    for i in range(3) :
+        qc = fuzzing.build_circuit(gate_ids[i], qbits[i], nb_qbits)
+        copy = permuted(qc, rng.permutation(nb_qbits).tolist())
+        assert circuit_fingerprint(copy) == circuit_fingerprint(qc)
+        assert circuit_fingerprint(copy, up_to_permutation=False) != circuit_fingerprint(qc, up_to_permutation=False)
+
+
+def test_symmetric_circuit_above_the_threshold() :
+    qc = QuantumCircuit(10)
+    qc.h(range(10))
+    qc.cx(0, 1)
+    qc.measure_all()
+    assert circuit_fingerprint(permuted(qc, [5, 3, 0, 1, 2, 4, 6, 7, 8, 9])) == circuit_fingerprint(qc)
+
+
+def test_fingerprint_separates_different_circuits() :
+    gate_ids, qbits = fuzzing.random_gate_arrays(11, 20, 10, 100)
+    fingerprints = {circuit_fingerprint(fuzzing.build_circuit(gate_ids[i], qbits[i], 10)) for i in range(20)}
+    assert len(fingerprints) == 20
+
+
+def test_deduplicate_skips_permuted_copies() :
+    gate_ids, qbits = fuzzing.random_gate_arrays(2, 4, 10, 100)
+    circuits = [fuzzing.build_circuit(gate_ids[i], qbits[i], 10) for i in range(4)]
+    stream = [(qc, str(k)) for k, qc in enumerate(circuits)]
+    stream += [(permuted(qc, list(range(10))[::-1]), f"copy {k}") for k, qc in enumerate(circuits)]
+
+    assert [date for _, date in deduplicate(stream)] == ["0", "1", "2", "3"]
@@ -0,0 +1,49 @@
+import numpy as np
+
+import fuzzing
+
+
+def test_random_gate_arrays_is_deterministic() :
+    first = fuzzing.random_gate_arrays(42, 20, 6, 50)
+    second = fuzzing.random_gate_arrays(np.random.default_rng(42), 20, 6, 50)
+    other = fuzzing.random_gate_arrays(43, 20, 6, 50)
+
+    assert all(np.array_equal(a, b) for a, b in zip(first, second))
+    assert not np.array_equal(first[0], other[0])
+
+
+def test_random_gate_arrays_draws_valid_qbits() :
+    gate_ids, qbits = fuzzing.random_gate_arrays(0, 50, 5, 100)
+    arity = fuzzing.gate_arity[gate_ids]
+
+    assert gate_ids.shape == (50, 100)
+    assert qbits.shape == (50, 100, fuzzing.max_arity)
+    for j in range(fuzzing.max_arity) :
+        used = arity > j
+        assert np.all((qbits[..., j] >= 0) == used)
+        assert np.all(qbits[..., j][used] < 5)
+
+    # The Qbits of a gate are distinct
+    for gate_qbits, n in zip(qbits.reshape(-1, fuzzing.max_arity), arity.reshape(-1)) :
+        assert len(set(gate_qbits[:n].tolist())) == n
+
+
+def test_build_circuit_follows_the_arrays() :
+    gate_ids, qbits = fuzzing.random_gate_arrays(1, 1, 4, 30)
+    qc = fuzzing.build_circuit(gate_ids[0], qbits[0], 4, random_init=True)
+
+    gates = [instruction for instruction in qc.data if instruction.operation.name not in ("barrier", "measure")]
+    assert len(gates) == 4 + 30
+    for instruction, gate_id, gate_qbits in zip(gates[4:], gate_ids[0], qbits[0]) :
+        assert instruction.operation.name == fuzzing.gates[gate_id].name
+        assert [qc.find_bit(q).index for q in instruction.qubits] == gate_qbits[:instruction.operation.num_qubits].tolist()
+
+
+def test_fuzzing_parallel_does_not_depend_on_the_workers() :
+    serial = [qc for qc, _ in fuzzing.fuzzing_parallel(50, 4, 20, seed=7, nb_workers=1, block_size=16)]
+    parallel = [qc for qc, _ in fuzzing.fuzzing_parallel(50, 4, 20, seed=7, nb_workers=3, block_size=16)]
+    other = [qc for qc, _ in fuzzing.fuzzing_parallel(50, 4, 20, seed=8, nb_workers=1, block_size=16)]
+
+    assert len(serial) == 50
+    assert serial == parallel
+    assert serial != other
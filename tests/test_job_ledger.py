@@ -0,0 +1,92 @@
+import pytest
+
+from job_ledger import JobLedger
+
+
+@pytest.fixture
+def ledger(tmp_path) :
+    ledger = JobLedger(str(tmp_path / "ledger.sqlite"), str(tmp_path / "results"))
+    yield ledger
+    ledger.close()
+
+
+def test_plan_resumes_its_own_campaign(ledger) :
+    pubs = [("a", 0), ("a", 1), ("b", 0), ("b", 1)]
+    ledger.record_submission("job1", "fake_manila", 100, [("a", None, 0), ("a", None, 1)], campaign="day 1")
+    ledger.save_result("job1", [{"0": 100}, {"1": 100}])
+    ledger.record_submission("job2", "fake_manila", 100, [("b", None, 0)], campaign="day 1")
+    ledger.update("job2", "RUNNING")
+    ledger.record_submission("job3", "fake_manila", 100, [("b", None, 1)], campaign="day 1")
+    ledger.update("job3", "ERROR", error="failed")
+
+    done, inflight, missing = ledger.plan("fake_manila", 100, pubs, "day 1")
+    assert done == {("a", 0): {"0": 100}, ("a", 1): {"1": 100}}
+    assert inflight == {"job2": {0: ("b", 0)}}
+    assert missing == [("b", 1)]
+
+
+def test_plan_never_reuses_another_campaign(ledger) :
+    pubs = [("a", 0)]
+    ledger.record_submission("job1", "fake_manila", 100, [("a", None, 0)], campaign="day 1")
+    ledger.save_result("job1", [{"0": 100}])
+
+    assert ledger.plan("fake_manila", 100, pubs, "day 2") == ({}, {}, pubs)
+    assert ledger.plan("fake_manila", 100, pubs) == ({}, {}, pubs)
+    # Other shots or backend : not the same calculation
+    assert ledger.plan("fake_manila", 200, pubs, "day 1") == ({}, {}, pubs)
+    assert ledger.plan("fake_lima", 100, pubs, "day 1") == ({}, {}, pubs)
+
+
+def test_done_job_without_result_is_fetched_again(ledger) :
+    ledger.record_submission("job1", "fake_manila", 100, [("a", None, 0)], campaign="c")
+    ledger.update("job1", "DONE")
+
+    assert ledger.plan("fake_manila", 100, [("a", 0)], "c") == ({}, {"job1": {0: ("a", 0)}}, [])
+
+
+def test_calculate_batch_measures_each_campaign(ledger, tmp_path, monkeypatch) :
+    from qiskit import QuantumCircuit
+    from qiskit_ibm_runtime.fake_provider import FakeManilaV2
+
+    import simulate
+    from fake_runtime import FakeRuntimeService
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "adder_data").mkdir()
+    service = FakeRuntimeService(backends=[FakeManilaV2()])
+    backend = service.backend("fake_manila")
+    qc = QuantumCircuit(2)
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.measure_all()
+
+    def run(campaign) :
+        return simulate.calculate_batch([qc], service, backend, 100, nb_calculations=2, ledger=ledger, campaign=campaign)
+
+    counts, measured, _ = run("day 1")
+    assert len(measured) == 1 and all(sum(c.values()) == 100 for c in counts[0])
+
+    # Resumed : read from the ledger, nothing submitted
+    resumed, measured, _ = run("day 1")
+    assert resumed == counts and measured == []
+
+    # Another campaign (or none) measures again
+    assert len(run("day 2")[1]) == 1
+    assert len(run(None)[1]) == 1
+    service.close()
+
+
+def test_results_of_unknown_jobs_are_cached(ledger) :
+    ledger.save_result("outside", [{"0": 1}])
+    assert ledger.load_result("outside") == [{"0": 1}]
+    assert "outside" in ledger.job_ids()
+
+
+def test_import_id_list_reads_the_backend(ledger, tmp_path) :
+    (tmp_path / "job_id_list_sherbrooke.txt").write_text("a" * 20 + "\n")
+    (tmp_path / "job_id_list_past.txt").write_text("b" * 20 + "\n" + "a" * 20 + "\n")
+
+    assert ledger.import_id_list(str(tmp_path / "job_id_list_sherbrooke.txt")) == 1
+    assert ledger.import_id_list(str(tmp_path / "job_id_list_past.txt")) == 1
+    assert ledger.job_ids("ibm_sherbrooke") == ["a" * 20, "b" * 20]
+    assert ledger.job_ids("ibm_brisbane") == ["b" * 20]
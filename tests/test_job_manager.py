@@ -0,0 +1,64 @@
+import asyncio
+
+from job_manager import JobManager
+
+
+class Job :
+    """ Job whose status() fails every `flaky`-th call """
+
+    def __init__(self, flaky = 0, result_error = None) :
+        self.calls = 0
+        self.flaky = flaky
+        self.result_error = result_error
+
+    def status(self) :
+        self.calls += 1
+        if self.flaky and self.calls % self.flaky == 1 :
+            raise ConnectionError("transient")
+        return "DONE" if self.calls > 2 else "RUNNING"
+
+    def result(self) :
+        if self.result_error is not None :
+            raise self.result_error
+        return "result"
+
+    def metrics(self) :
+        return None
+
+
+class DeadJob(Job) :
+    def status(self) :
+        raise ConnectionError("unreachable")
+
+
+def test_errors_stay_in_their_job() :
+    def failing_callback(*args) :
+        raise RuntimeError("callback")
+
+    def failing_submit() :
+        raise ValueError("rejected")
+
+    manager = JobManager(poll_interval=0.001, max_poll_errors=3, on_status=failing_callback, on_submit=failing_callback)
+    outcomes = manager.run_all([
+        ("flaky", "b", lambda : Job(flaky=2)),
+        ("result", "b", lambda : Job(result_error=ConnectionError("download"))),
+        ("dead", "b", lambda : DeadJob()),
+        ("submit", "b", failing_submit),
+    ])
+
+    assert [outcome.tag for outcome in outcomes] == ["flaky", "result", "dead", "submit"]
+    assert (outcomes[0].status, outcomes[0].result) == ("DONE", "result")
+    assert outcomes[1].status is None and "download" in outcomes[1].error
+    assert outcomes[2].status is None and "unreachable" in outcomes[2].error
+    assert outcomes[3].status is None and "rejected" in outcomes[3].error
+
+
+def test_as_completed_in_several_event_loops() :
+    manager = JobManager(max_concurrent=1, poll_interval=0.001)
+
+    async def collect() :
+        return [outcome.tag async for outcome in manager.as_completed([(k, "b", Job) for k in range(3)])]
+
+    assert len(manager.run_all([(k, "b", Job) for k in range(3)])) == 3
+    assert sorted(asyncio.run(collect())) == [0, 1, 2]
+    assert sorted(asyncio.run(collect())) == [0, 1, 2]
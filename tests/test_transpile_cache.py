@@ -0,0 +1,87 @@
+import os
+import warnings
+
+import numpy as np
+import pytest
+from qiskit import QuantumCircuit
+from qiskit.circuit.library import UnitaryGate
+from qiskit_aer import AerSimulator
+
+import transpile_cache
+from transpile_cache import cached_transpile, target_fingerprint, transpile_key
+
+
+@pytest.fixture
+def simulator() :
+    transpile_cache.clear_memory()
+    return AerSimulator()
+
+
+def bell() -> QuantumCircuit :
+    qc = QuantumCircuit(2)
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.measure_all()
+    return qc
+
+
+def test_cached_transpile_reuses_the_qpy_files(tmp_path, simulator) :
+    first = cached_transpile(bell(), simulator, cache_dir=str(tmp_path))
+    assert len(os.listdir(tmp_path)) == 1
+
+    transpile_cache.clear_memory()
+    assert cached_transpile(bell(), simulator, cache_dir=str(tmp_path)) == first
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+
+def test_truncated_file_is_a_cache_miss(tmp_path, simulator) :
+    expected = cached_transpile(bell(), simulator, cache_dir=str(tmp_path))
+    (path,) = tmp_path.iterdir()
+    path.write_bytes(path.read_bytes()[:10])
+
+    transpile_cache.clear_memory()
+    assert cached_transpile(bell(), simulator, cache_dir=str(tmp_path)) == expected
+    assert len(path.read_bytes()) > 10      # removed, then written again
+
+
+def test_key_covers_conditions_barriers_and_array_params(simulator) :
+    target = target_fingerprint(simulator)
+
+    plain = QuantumCircuit(1, 1)
+    plain.x(0)
+    conditioned = QuantumCircuit(1, 1)
+    with warnings.catch_warnings() :
+        warnings.simplefilter("ignore", DeprecationWarning)
+        conditioned.x(0).c_if(0, 1)
+    assert transpile_key(plain, target) != transpile_key(conditioned, target)
+
+    barrier = QuantumCircuit(1, 1)
+    barrier.barrier()
+    barrier.x(0)
+    assert transpile_key(plain, target) != transpile_key(barrier, target)
+
+    # Two unitaries whose str() is identical (summarised by NumPy) but whose data differ
+    keys = []
+    for phase in (0.0, 1e-3) :
+        matrix = np.eye(64, dtype=complex)
+        matrix[-1, -1] = np.exp(1j * phase)
+        qc = QuantumCircuit(6)
+        qc.append(UnitaryGate(matrix), range(6))
+        keys.append(transpile_key(qc, target))
+    assert keys[0] != keys[1]
+
+
+def test_key_covers_the_definition_of_custom_gates(tmp_path, simulator) :
+    def circuit(angle) :
+        definition = QuantumCircuit(2, name="custom")
+        definition.rx(angle, 0)
+        definition.cx(0, 1)
+        qc = QuantumCircuit(2)
+        qc.append(definition.to_gate(), [0, 1])
+        qc.measure_all()
+        return qc
+
+    first = cached_transpile(circuit(0.1), simulator, cache_dir=str(tmp_path))
+    second = cached_transpile(circuit(0.2), simulator, cache_dir=str(tmp_path))
+    assert first != second
+    assert len(os.listdir(tmp_path)) == 2